@@ -0,0 +1,147 @@
+"""
+Калибровка бэкенда энкодера: насколько квантованный/ONNX/torch энкодер
+расходится с эталонным и сколько вердиктов MLGuard (векторная модель,
+порог PIPELINE_POLICY[1]) при этом меняется на benign и jailbreak датасетах.
+
+    python -m ML.calibrate_encoder --candidate onnx
+    python -m ML.calibrate_encoder --candidate torch -o quantize=true -o num_threads=4 --json report.json
+"""
+import os
+import json
+import time
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ML.dataset import DatasetLoader, _static_extractor
+from secure_prompt.core.preprocess import preprocess
+from secure_prompt.core.scoring import PIPELINE_POLICY
+from secure_prompt.guards.encoders import ENCODER_BACKENDS
+from secure_prompt.guards.ml_guard import MLGuard
+from secure_prompt.guards.vector_features import VectorFeatureExtractor
+
+
+def parse_options(pairs: List[str]) -> Dict[str, Any]:
+    """["quantize=true", "num_threads=4"] -> {"quantize": True, "num_threads": 4}"""
+    options = {}
+    for pair in pairs:
+        name, _, value = pair.partition("=")
+        try:
+            options[name] = json.loads(value)
+        except json.JSONDecodeError:
+            options[name] = value
+    return options
+
+
+def encode_timed(extractor: VectorFeatureExtractor, texts: List[str], batch_size: int) -> Tuple[np.ndarray, float]:
+    """Эмбеддинги мимо кэша и время кодирования в секундах (после прогрева)"""
+    encoder = extractor.model
+    encoder.encode(texts[:batch_size], batch_size, max_tokens=extractor.max_batch_tokens)
+    start = time.perf_counter()
+    embeddings = encoder.encode(texts, batch_size, max_tokens=extractor.max_batch_tokens)
+    return embeddings, time.perf_counter() - start
+
+
+def cosine_drift(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Статистики 1 - cos между эмбеддингами одних и тех же текстов"""
+    drift = 1.0 - np.einsum("ij,ij->i", reference, candidate)
+    return {
+        "mean": float(drift.mean()),
+        "p50": float(np.percentile(drift, 50)),
+        "p99": float(np.percentile(drift, 99)),
+        "max": float(drift.max()),
+    }
+
+
+def verdict_changes(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, int]:
+    """Сравнение булевых вердиктов BLOCK эталонного и кандидатного энкодера"""
+    return {
+        "blocked_reference": int(reference.sum()),
+        "blocked_candidate": int(candidate.sum()),
+        "allow_to_block": int((~reference & candidate).sum()),
+        "block_to_allow": int((reference & ~candidate).sum()),
+    }
+
+
+def calibrate(
+        datasets: Dict[str, List[str]],
+        reference: VectorFeatureExtractor,
+        candidate: VectorFeatureExtractor,
+        guard: MLGuard,
+        batch_size: int = 32
+) -> Dict[str, Any]:
+    report = {
+        "reference": reference.encoder_id,
+        "candidate": candidate.encoder_id,
+        "threshold": guard.threshold,
+        "datasets": {},
+    }
+    for name, texts in datasets.items():
+        # статические признаки считаются один раз, векторные перезаписываются для каждого энкодера
+        n_static = _static_extractor.n_features
+        features = np.empty((len(texts), n_static + reference.feature_dim), dtype=np.float32)
+        _static_extractor.extract_into(texts, features[:, :n_static])
+        result = {"n": len(texts)}
+        verdicts = {}
+        for role, extractor in (("reference", reference), ("candidate", candidate)):
+            embeddings, seconds = encode_timed(extractor, texts, batch_size)
+            extractor._features_from_embeddings(embeddings, out=features[:, n_static:])
+            _, scores = guard.score(features)
+            verdicts[role] = np.asarray(scores) >= guard.threshold
+            result[f"{role}_texts_per_s"] = len(texts) / max(seconds, 1e-9)
+            result[f"{role}_embeddings"] = embeddings
+
+        result["cosine_drift"] = cosine_drift(result.pop("reference_embeddings"), result.pop("candidate_embeddings"))
+        result["speedup"] = result["candidate_texts_per_s"] / result["reference_texts_per_s"]
+        result["verdicts"] = verdict_changes(verdicts["reference"], verdicts["candidate"])
+        report["datasets"][name] = result
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Сравнение бэкендов энкодера VectorFeatureExtractor")
+    parser.add_argument("--reference", default="sentence_transformers", choices=ENCODER_BACKENDS)
+    parser.add_argument("-r", "--reference-option", action="append", default=[], metavar="NAME=VALUE")
+    parser.add_argument("--candidate", default="onnx", choices=ENCODER_BACKENDS)
+    parser.add_argument("-o", "--candidate-option", action="append", default=[], metavar="NAME=VALUE")
+    parser.add_argument("--limit", type=int, default=None, help="число текстов из каждого датасета")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--json", default=None, help="куда сохранить отчёт")
+    args = parser.parse_args(argv)
+
+    loader = DatasetLoader()
+    datasets = {
+        "benign": preprocess(loader.load_file(os.getenv("BENIGN_DATA_PATH")))[:args.limit],
+        "jailbreak": preprocess(loader.load_file(os.getenv("JAILBREAK_DATA_PATH")))[:args.limit],
+    }
+    reference = VectorFeatureExtractor(
+        encoder_backend=args.reference,
+        encoder_options=parse_options(args.reference_option)
+    )
+    candidate = VectorFeatureExtractor(
+        encoder_backend=args.candidate,
+        encoder_options=parse_options(args.candidate_option)
+    )
+    guard = MLGuard(use_vector=True, threshold=PIPELINE_POLICY[1])
+
+    report = calibrate(datasets, reference, candidate, guard, args.batch_size)
+
+    print(f"{report['reference']} -> {report['candidate']}, порог {report['threshold']}")
+    for name, result in report["datasets"].items():
+        drift, verdicts = result["cosine_drift"], result["verdicts"]
+        print(
+            f"{name:>9}: n={result['n']} "
+            f"1-cos mean={drift['mean']:.2e} p99={drift['p99']:.2e} max={drift['max']:.2e} | "
+            f"BLOCK {verdicts['blocked_reference']} -> {verdicts['blocked_candidate']} "
+            f"(+{verdicts['allow_to_block']} / -{verdicts['block_to_allow']}) | "
+            f"{result['candidate_texts_per_s']:.1f} texts/s, x{result['speedup']:.2f}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,14 @@ import os
 import numpy as np
 from collections import Counter
 
-from nltk import pos_tag, word_tokenize
+from nltk import word_tokenize
 from nltk.corpus import stopwords
+from nltk.tag import PerceptronTagger
 
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
+from secure_prompt.core import metrics
 from secure_prompt.core.preprocess import preprocess
 from secure_prompt.guards.vector_features import VectorFeatureExtractor
 from data.lexical import LEXEMES
@@ -20,71 +22,131 @@ load_dotenv()
 DATA_DIR = Path(__file__).resolve().parents[1] / "data"
 
 
-def extract_features_static(text: str) -> List[float]:
-    # -------- FEATS #1 -----------------
-
-    char_counter = Counter(text.lower())
-    char_probs = [count / len(text) for count in char_counter.values()]
-    char_entropy = -sum(p * np.log2(p) for p in char_probs) if char_probs else 0
-
-    stops_en = set(stopwords.words('english'))
-    stops_ru = set(stopwords.words('russian'))
-    words = word_tokenize(text.lower()) if text else []
-    stopword_ratio_en = sum(1 for w in words if w in stops_en) / len(words) if words else 0
-    stopword_ratio_ru = sum(1 for w in words if w in stops_ru) / len(words) if words else 0
-
-    translation_markers = [
-        'chatgpt', 'openai', 'gpt', 'ai', 'model', 'assistant',
-        'please', 'could', 'would', 'should', 'generate', 'create',
-        'content', 'response', 'output', 'instructions', 'ethical', 'input'
-    ]
-    translation_marker_count = sum(
-        1 for marker in translation_markers if marker in text.lower()
-    )
-
-    # -------- FEATS #2 -----------------
-
-    if words:
-        lexical_diversity = len(set(words)) / len(words)
-    else:
-        lexical_diversity = 0
-
-    tagged = pos_tag(words)
+TRANSLATION_MARKERS = (
+    'chatgpt', 'openai', 'gpt', 'ai', 'model', 'assistant',
+    'please', 'could', 'would', 'should', 'generate', 'create',
+    'content', 'response', 'output', 'instructions', 'ethical', 'input'
+)
+META_VOCABS = ("actions", "targets")
+META_CATEGORIES = ("override", "freedom", "roleplay", "system")
 
-    pos_tags = [tag for word, tag in tagged]
 
-    verb_ratio = sum(1 for tag in pos_tags if tag.startswith('VB')) / len(pos_tags) if pos_tags else 0
-    noun_ratio = sum(1 for tag in pos_tags if tag.startswith('NN')) / len(pos_tags) if pos_tags else 0
-    pronoun_ratio = sum(1 for tag in pos_tags if tag.startswith('PR')) / len(pos_tags) if pos_tags else 0
+def _char_stats(text: str, lowered: str) -> Tuple[float, int]:
+    """Entropy of the lowercased characters and the number of non-alpha characters, from one walk over text."""
+    counts = Counter(text)
+    non_alpha = sum(n for ch, n in counts.items() if not ch.isalpha())
+    if len(lowered) != len(text) or "\u03a3" in counts:
+        # 'İ' expands and 'Σ' lowers by context (final sigma): count the lowered text itself
+        lowered_counts = Counter(lowered)
+    else:
+        lowered_counts = Counter()
+        for ch, n in counts.items():
+            lowered_counts[ch.lower()] += n
+    n_chars = len(lowered)
+    char_entropy = -sum(n / n_chars * np.log2(n / n_chars) for n in lowered_counts.values()) if n_chars else 0
+    return char_entropy, non_alpha
+
+
+class StaticFeatureExtractor:
+    def __init__(self, lexemes: dict = LEXEMES):
+        # word lists in the order of the m1..m8 features
+        self.meta_words = [
+            tuple(lexemes[vt][meta]) for vt in META_VOCABS for meta in META_CATEGORIES
+        ]
+        self.lexeme_vocab = tuple(dict.fromkeys(w for words in self.meta_words for w in words))
+
+        # length of extract(): 2 + m1..m8 per vocab + 8
+        self.n_features = 10 + len(self.meta_words)
+
+        # NLTK resources are loaded on first use and kept for the process lifetime
+        self._stops_en = None
+        self._stops_ru = None
+        self._tagger = None
+
+    def _load_resources(self) -> None:
+        if self._tagger is None:
+            self._stops_en = frozenset(stopwords.words('english'))
+            self._stops_ru = frozenset(stopwords.words('russian'))
+            self._tagger = PerceptronTagger()
+
+    def extract(self, text: str) -> List[float]:
+        self._load_resources()
+        lowered = text.lower()
+        words = word_tokenize(lowered) if text else []
+        return self._features(text, lowered, words, self._tag(words))
+
+    def _tag(self, words: List[str]) -> List[str]:
+        return [tag for word, tag in self._tagger.tag(words)]
+
+    def _features(self, text: str, lowered: str, words: List[str], pos_tags: List[str]) -> List[float]:
+        # -------- FEATS #1 -----------------
+
+        char_entropy, non_alpha = _char_stats(text, lowered)
+
+        n_words = len(words)
+        stopword_ratio_en = sum(1 for w in words if w in self._stops_en) / n_words if words else 0
+        stopword_ratio_ru = sum(1 for w in words if w in self._stops_ru) / n_words if words else 0
+
+        translation_marker_count = sum(1 for marker in TRANSLATION_MARKERS if marker in lowered)
+
+        # -------- FEATS #2 -----------------
+
+        lexical_diversity = len(set(words)) / n_words if words else 0
+
+        n_tags = len(pos_tags)
+
+        verb_ratio = sum(1 for tag in pos_tags if tag.startswith('VB')) / n_tags if pos_tags else 0
+        noun_ratio = sum(1 for tag in pos_tags if tag.startswith('NN')) / n_tags if pos_tags else 0
+        pronoun_ratio = sum(1 for tag in pos_tags if tag.startswith('PR')) / n_tags if pos_tags else 0
+
+        # -------- FEATS #3 -----------------
+
+        # one substring scan per distinct lexeme, shared by all categories
+        found = {word for word in self.lexeme_vocab if word in text}
+        meta_words_hits = [sum(1 for word in lexeme_words if word in found) for lexeme_words in self.meta_words]
+
+        return [
+            sum(len(w) for w in words) / max(n_words, 1),
+            non_alpha / max(len(text), 1),
+            *meta_words_hits,
+            char_entropy,
+            stopword_ratio_en,
+            stopword_ratio_ru,
+            translation_marker_count,
+            lexical_diversity,
+            verb_ratio,
+            noun_ratio,
+            pronoun_ratio
+        ]
+
+    def extract_batch(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), n_features) float32 matrix of the static features."""
+        out = np.empty((len(texts), self.n_features), dtype=np.float32)
+        self.extract_into(texts, out)
+        return out
+
+    def extract_into(self, texts: List[str], out: np.ndarray) -> None:
+        """
+        Writes the features of texts[i] into out[i]; out may be a column slice
+        of a larger matrix. NLTK tokenization and tagging run over the whole
+        batch first, so their time is reported as stages of their own.
+        """
+        self._load_resources()
+        lowered = [text.lower() for text in texts]
+        with metrics.stage("features.tokenize", len(texts)):
+            words = [word_tokenize(low) if text else [] for text, low in zip(texts, lowered)]
+        with metrics.stage("features.pos_tag", len(texts)):
+            pos_tags = [self._tag(text_words) for text_words in words]
+        for i, text in enumerate(texts):
+            out[i] = self._features(text, lowered[i], words[i], pos_tags[i])
 
-    # -------- FEATS #3 -----------------
 
-    meta_category = ["override", "freedom", "roleplay", "system"]
+_static_extractor = StaticFeatureExtractor()
 
-    c = ("actions", "targets")
-    meta_words_hits = [0] * (len(c) * len(meta_category))
-    for vt in range(len(c)):
-        for meta in range(len(meta_category)):
-            for word in LEXEMES[c[vt]][meta_category[meta]]:
-                if word in text:
-                    meta_words_hits[vt * len(meta_category) + meta] += 1
-    m1, m2, m3, m4, m5, m6, m7, m8 = meta_words_hits
 
-    features = [
-        sum(len(w) for w in words) / max(len(words), 1),
-        sum(not c.isalpha() for c in text) / max(len(text), 1),
-        m1, m2, m3, m4, m5, m6, m7, m8,
-        char_entropy,
-        stopword_ratio_en,
-        stopword_ratio_ru,
-        translation_marker_count,
-        lexical_diversity,
-        verb_ratio,
-        noun_ratio,
-        pronoun_ratio
-    ]
+def extract_features_static(text: str) -> List[float]:
+    return _static_extractor.extract(text)
 
-    return features
 
 class FeatureExtractor:
     def __init__(self, init_vector=True):
@@ -92,16 +154,50 @@ class FeatureExtractor:
         if init_vector:
             self.vector_feats_extractor = VectorFeatureExtractor()
 
-    def extract_features(self, texts: List[str], use_vector: bool = False) -> List[List[float]]:
-        result = []
+    def get_vector_extractor(self) -> VectorFeatureExtractor:
+        if not self.vector_feats_extractor:
+            self.vector_feats_extractor = VectorFeatureExtractor()
+        return self.vector_feats_extractor
+
+    def n_features(self, use_vector: bool = False) -> int:
+        """Width of the extract_features matrix; the vector width loads the vector extractor."""
+        n = _static_extractor.n_features
+        if use_vector:
+            n += self.get_vector_extractor().feature_dim
+        return n
+
+    def extract_features(
+            self,
+            texts: List[str],
+            use_vector: bool = False,
+            static: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        One preallocated (len(texts), dim) float32 matrix per batch: static
+        features in the first columns, vector features in the rest.
+
+        static: already extracted static features of texts (e.g. the rows the
+        lexical tier scored), copied instead of being extracted again
+        """
+        n_static = _static_extractor.n_features
+        dim = n_static
+        state = None
+        if use_vector:
+            # one template snapshot sizes the matrix and assembles the vector block
+            state = self.get_vector_extractor().bank.state
+            dim += self.vector_feats_extractor._compute_feature_dim(state)
+        result = np.empty((len(texts), dim), dtype=np.float32)
+
         # -------- FEATS #4 -----------------
-        v_feats = [[]] * len(texts)
         if use_vector:
-            if not self.vector_feats_extractor:
-                self.vector_feats_extractor = VectorFeatureExtractor()
-            v_feats = self.vector_feats_extractor.extract_features_batch(texts)
-        for i, text in enumerate(texts):
-            result.append(extract_features_static(text) + v_feats[i])
+            self.vector_feats_extractor.extract_features_batch(texts, out=result[:, n_static:], state=state)
+        if static is not None:
+            if np.shape(static) != (len(texts), n_static):
+                raise ValueError(f"static must have shape {(len(texts), n_static)}, got {np.shape(static)}")
+            result[:, :n_static] = static
+            return result
+        with metrics.stage("features.static", len(texts)):
+            _static_extractor.extract_into(texts, result[:, :n_static])
         return result
 
 
@@ -121,7 +217,7 @@ class DatasetLoader:
 
         return samples
 
-    def load_dataset(self) -> Tuple[List[List[float]], List[int], List[List[float]], List[int]]:
+    def load_dataset(self) -> Tuple[np.ndarray, List[int], np.ndarray, List[int]]:
         benign = preprocess(self.load_file(os.getenv("BENIGN_DATA_PATH")))
         jailbreak = preprocess(self.load_file(os.getenv("JAILBREAK_DATA_PATH")))
         data = benign + jailbreak
@@ -1,3 +1,4 @@
+import os
 import pickle
 from pathlib import Path
 
@@ -6,12 +7,30 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, roc_auc_score
 
 from ML.dataset import DatasetLoader
+from secure_prompt.guards.linear_model import export_linear_model
 
 
 MODEL_PATH_VECTOR = Path(__file__).resolve().parent / "model_vector.pkl"
 MODEL_PATH = Path(__file__).resolve().parent / "model.pkl"
 
 
+def save_model(model, path: Path) -> None:
+    # Запись во временный файл и атомарная замена: ModelRegistry
+    # не прочитает наполовину записанную модель
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        pickle.dump(model, f)
+    os.replace(tmp_path, path)
+
+    # Линейная модель дополнительно экспортируется в .npz для инференса без sklearn;
+    # устаревший .npz удаляется, чтобы MLGuard не загрузил его вместо pickle
+    npz_path = path.with_suffix(".npz")
+    if export_linear_model(model, npz_path):
+        print(f"Linear export saved to {npz_path}")
+    elif npz_path.exists():
+        npz_path.unlink()
+
+
 def train():
     loader = DatasetLoader()
     X, y, X_v, y_v = loader.load_dataset()
@@ -41,8 +60,7 @@ def train():
 
     print("ROC-AUC:", roc_auc_score(y_test, y_prob))
 
-    with open(MODEL_PATH_VECTOR, "wb") as f:
-        pickle.dump(model, f)
+    save_model(model, MODEL_PATH_VECTOR)
 
     print(f"Model with vector saved to {MODEL_PATH_VECTOR}")
 
@@ -75,8 +93,7 @@ def train():
 
     print("ROC-AUC:", roc_auc_score(y_test, y_prob))
 
-    with open(MODEL_PATH, "wb") as f:
-        pickle.dump(model, f)
+    save_model(model, MODEL_PATH)
 
     print(f"Model saved to {MODEL_PATH}")
 
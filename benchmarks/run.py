@@ -0,0 +1,232 @@
+"""
+Offline benchmark of the detection pipeline, stage by stage.
+
+    python -m benchmarks.run --prompts 256 --out bench.json
+    python -m benchmarks.run --baseline bench.json --threshold 0.1
+
+Every stage is timed per call at each batch size, with at least --min-calls
+calls per entry (the corpus is cycled if needed); the report holds p50/p95/p99
+call latency (ms) and prompts/s. With --baseline the run is compared against
+an earlier report and exits with status 1 on a regression.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from benchmarks.corpora import build_corpora
+
+Stage = Callable[[List[str]], object]
+
+# adversarial_long (~100 KB prompts) is its own corpus, so its latency is reported apart
+CORPORA = ("short", "medium", "long", "mixed", "adversarial", "adversarial_long", "dataset")
+BATCH_SIZES = (1, 8, 32, 128)
+DEFAULT_THRESHOLD = 0.1
+# fewer calls make p95/p99 a single sample
+DEFAULT_MIN_CALLS = 20
+
+
+def _preprocess() -> Stage:
+    from secure_prompt.core.preprocess import preprocess
+    return preprocess
+
+
+def _static_features() -> Stage:
+    from ML.dataset import extract_features_static
+    return lambda batch: [extract_features_static(text) for text in batch]
+
+
+def _vector_features() -> Stage:
+    from secure_prompt.guards.vector_features import VectorFeatureExtractor
+    return VectorFeatureExtractor().extract_features_batch
+
+
+def _ml_guard() -> Stage:
+    from secure_prompt.core.scoring import PIPELINE_POLICY
+    from secure_prompt.guards.ml_guard import MLGuard
+    return MLGuard(use_vector=True, threshold=PIPELINE_POLICY[1]).detect
+
+
+def _decision() -> Stage:
+    from secure_prompt.audit.logger import SecurityLogger
+    from secure_prompt.audit.storage import BufferedJsonlStorage
+    from secure_prompt.core.decision import DecisionCore
+    # events are encoded and written as in production, but to /dev/null
+    return DecisionCore(logger=SecurityLogger(BufferedJsonlStorage(os.devnull))).decide
+
+
+STAGES: Dict[str, Callable[[], Stage]] = {
+    "preprocess": _preprocess,
+    "static_features": _static_features,
+    "vector_features": _vector_features,
+    "ml_guard": _ml_guard,
+    "decision": _decision,
+}
+
+
+def clear_caches() -> None:
+    """Empties the in-memory embedding caches so every run starts cold."""
+    from secure_prompt.guards.resources import get_embedding_cache
+    for cache in list(get_embedding_cache.cache.values()):
+        cache.clear()
+
+
+def measure(stage: Stage, prompts: List[str], batch_size: int, min_calls: int = 1) -> Dict[str, float]:
+    """Times the stage over the corpus in batches, going over it again until min_calls calls are made."""
+    latencies = []
+    processed = 0
+    while len(latencies) < min_calls:
+        for start in range(0, len(prompts), batch_size):
+            batch = prompts[start:start + batch_size]
+            began = time.perf_counter()
+            stage(batch)
+            latencies.append(time.perf_counter() - began)
+            processed += len(batch)
+    latencies_ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, (50, 95, 99)).tolist()
+    total = float(np.sum(latencies))
+    return {
+        "calls": len(latencies),
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "prompts_per_s": processed / total if total > 0 else float("inf"),
+    }
+
+
+def run(
+        corpora: Dict[str, List[str]],
+        stages: Sequence[str],
+        batch_sizes: Sequence[int],
+        min_calls: int = DEFAULT_MIN_CALLS
+) -> Dict[str, Dict]:
+    """
+    Returns {"results": {corpus: {stage: {batch_size: stats}}}, "skipped": {stage: reason}}.
+    A stage whose resources cannot be loaded (no model, no NLTK data) is skipped.
+    """
+    results: Dict[str, Dict] = {name: {} for name in corpora}
+    skipped: Dict[str, str] = {}
+    for name in stages:
+        try:
+            stage = STAGES[name]()
+            # the first call loads models and encoders; it is not timed
+            stage(next(iter(corpora.values()))[:1])
+        except Exception as exc:
+            skipped[name] = f"{type(exc).__name__}: {' '.join(str(exc).split())[:200]}"
+            continue
+        for corpus, prompts in corpora.items():
+            results[corpus][name] = {}
+            for batch_size in batch_sizes:
+                clear_caches()
+                results[corpus][name][str(batch_size)] = measure(stage, prompts, batch_size, min_calls)
+    return {"results": results, "skipped": skipped}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def compare(
+        current: Dict,
+        baseline: Dict,
+        threshold: float = DEFAULT_THRESHOLD,
+        min_calls: int = DEFAULT_MIN_CALLS
+) -> List[str]:
+    """
+    Regressions of current against baseline: prompts/s lower or p95 higher
+    by more than threshold (a fraction). A baseline entry that the current
+    run skipped or did not measure is a regression too, and so is an entry
+    with fewer than min_calls calls on either side, whose p95 means nothing.
+    Entries new in the current run are not compared.
+    """
+    regressions = []
+    skipped = current.get("skipped", {})
+    for corpus, stages in baseline.get("results", {}).items():
+        for stage, sizes in stages.items():
+            for batch_size, base in sizes.items():
+                where = f"{corpus}/{stage}/batch={batch_size}"
+                stats = current["results"].get(corpus, {}).get(stage, {}).get(batch_size)
+                if stats is None:
+                    reason = f"skipped ({skipped[stage]})" if stage in skipped else "not measured"
+                    regressions.append(f"{where}: {reason} in the current run")
+                    continue
+                calls = min(stats.get("calls", 0), base.get("calls", 0))
+                if calls < min_calls:
+                    regressions.append(f"{where}: {calls} calls, at least {min_calls} are needed")
+                    continue
+                if stats["prompts_per_s"] < base["prompts_per_s"] * (1 - threshold):
+                    regressions.append(
+                        f"{where}: {stats['prompts_per_s']:.1f} prompts/s vs {base['prompts_per_s']:.1f}"
+                    )
+                if stats["p95_ms"] > base["p95_ms"] * (1 + threshold):
+                    regressions.append(f"{where}: p95 {stats['p95_ms']:.2f} ms vs {base['p95_ms']:.2f}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline per-stage latency and throughput benchmark")
+    parser.add_argument("--corpora", nargs="+", default=list(CORPORA), help=f"any of {', '.join(CORPORA)}")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=list(STAGES))
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=list(BATCH_SIZES))
+    parser.add_argument("--prompts", type=int, default=256, help="prompts per corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--out", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed relative slowdown before a regression is reported")
+    parser.add_argument("--min-calls", type=int, default=DEFAULT_MIN_CALLS,
+                        help="timed calls per corpus, stage and batch size")
+    args = parser.parse_args(argv)
+
+    corpora = build_corpora(args.corpora, args.prompts, args.seed)
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "prompts": args.prompts,
+            "seed": args.seed,
+            "batch_sizes": args.batch_sizes,
+            "min_calls": args.min_calls,
+        },
+        **run(corpora, args.stages, args.batch_sizes, args.min_calls),
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    for stage, reason in report["skipped"].items():
+        print(f"skipped {stage}: {reason}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold, args.min_calls)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
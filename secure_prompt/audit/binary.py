@@ -0,0 +1,310 @@
+"""
+Compact columnar audit log.
+
+File layout: an 8-byte magic followed by chunks, one chunk per flushed batch.
+A chunk is a 24-byte header (magic, row count, reason value count, rules size)
+followed by contiguous little-endian columns, padded to 8 bytes:
+
+    timestamp     int64[n]     microseconds since the epoch, UTC
+    score         float64[n]
+    reason_len    uint32[n]
+    reason        float32[m]   concatenated reason vectors
+    prompt_hash   uint8[n, 32] raw SHA-256 digest
+    event_type    uint8[n]     index into EVENT_TYPES
+    decision      uint8[n]     index into DECISIONS
+    flags         uint8[n]     bit 0: cache hit
+    model_version S16[n]       ASCII model version tag, NUL-padded
+    tier          uint8[n]     index into TIERS
+    rules_len     uint32[n]
+    rules         uint8[r]     matched rules of each row as UTF-8 JSON, empty for none
+
+Readers map the file and expose the columns as NumPy views without parsing
+individual records.
+"""
+import os
+import json
+import mmap
+import struct
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from secure_prompt.audit.models import SecurityEvent
+from secure_prompt.audit.storage import BufferedAppendStorage
+
+
+FILE_MAGIC = b"SPAUDIT\x01"
+CHUNK_MAGIC = b"SPC1"
+CHUNK_HEADER = struct.Struct("<4sIQQ")
+
+EVENT_TYPES = ("input_check", "response_check")
+DECISIONS = ("ALLOW", "BLOCK")
+TIERS = ("", "rules", "lexical", "vector")
+FLAG_CACHE_HIT = 1
+VERSION_SIZE = 16
+
+# bytes per row outside of the reason values and rules
+ROW_SIZE = 8 + 8 + 4 + 32 + 1 + 1 + 1 + VERSION_SIZE + 1 + 4
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _to_micros(timestamp: str) -> int:
+    dt = datetime.fromisoformat(timestamp)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - _EPOCH) // _MICROSECOND
+
+
+def _from_micros(micros: int) -> str:
+    return (_EPOCH + timedelta(microseconds=int(micros))).isoformat()
+
+
+def _check_encodable(events: list[SecurityEvent]) -> None:
+    for e in events:
+        if e.event_type not in EVENT_TYPES:
+            raise ValueError(f"event type {e.event_type!r} is not representable in the binary audit log")
+        if e.decision not in DECISIONS:
+            raise ValueError(f"decision {e.decision!r} is not representable in the binary audit log")
+        if len(e.model_version) > VERSION_SIZE or not e.model_version.isascii():
+            raise ValueError(f"model version {e.model_version!r} is not representable in the binary audit log")
+        if e.tier not in TIERS:
+            raise ValueError(f"tier {e.tier!r} is not representable in the binary audit log")
+
+
+def _pad(size: int) -> int:
+    return -size % 8
+
+
+def encode_chunk(events: list[SecurityEvent]) -> bytes:
+    n = len(events)
+    reasons = [np.asarray(e.reason, dtype="<f4").ravel() for e in events]
+    reason_len = np.fromiter((len(r) for r in reasons), dtype="<u4", count=n)
+    reason = np.concatenate(reasons) if n else np.empty(0, dtype="<f4")
+
+    event_type = bytes(EVENT_TYPES.index(e.event_type) for e in events)
+    decision = bytes(DECISIONS.index(e.decision) for e in events)
+    rules = [json.dumps(e.rules, ensure_ascii=False).encode("utf-8") if e.rules else b"" for e in events]
+    rules_len = np.fromiter((len(r) for r in rules), dtype="<u4", count=n)
+    rules_data = b"".join(rules)
+
+    parts = [
+        CHUNK_HEADER.pack(CHUNK_MAGIC, n, len(reason), len(rules_data)),
+        np.fromiter((_to_micros(e.timestamp) for e in events), dtype="<i8", count=n).tobytes(),
+        np.fromiter((e.score for e in events), dtype="<f8", count=n).tobytes(),
+        reason_len.tobytes(),
+        reason.tobytes(),
+        b"".join(bytes.fromhex(e.prompt_hash) if e.prompt_hash else bytes(32) for e in events),
+        event_type,
+        decision,
+        bytes(FLAG_CACHE_HIT if e.cache_hit else 0 for e in events),
+        b"".join(e.model_version.encode("ascii").ljust(VERSION_SIZE, b"\0") for e in events),
+        bytes(TIERS.index(e.tier) for e in events),
+        rules_len.tobytes(),
+        rules_data,
+    ]
+    size = sum(len(p) for p in parts)
+    parts.append(bytes(_pad(size)))
+    return b"".join(parts)
+
+
+class BinaryStorage(BufferedAppendStorage):
+    def __init__(
+            self,
+            path: str = "security.log.bin",
+            max_events: int = 512,
+            flush_interval: float = 1.0,
+            fsync: bool = False
+    ):
+        super().__init__(path, max_events, flush_interval, fsync)
+
+    def _open(self) -> int:
+        # the log must never be visible without its magic, or another process
+        # could append a chunk in front of it: the magic is written to a private
+        # file that is then hard-linked under the final name. link() fails if the
+        # log already exists (a rename would silently replace it)
+        if not self.path.exists():
+            tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            try:
+                os.write(fd, FILE_MAGIC)
+            finally:
+                os.close(fd)
+            try:
+                os.link(tmp, self.path)
+            except FileExistsError:
+                pass
+            finally:
+                os.unlink(tmp)
+        return os.open(self.path, os.O_WRONLY | os.O_APPEND)
+
+    def write_many(self, events: Iterable[SecurityEvent]) -> None:
+        # reject unencodable events before they reach the shared buffer
+        events = list(events)
+        _check_encodable(events)
+        super().write_many(events)
+
+    def _encode(self, events: list[SecurityEvent]) -> bytes:
+        return encode_chunk(events)
+
+
+# ---------- READER ----------
+
+@dataclass
+class AuditColumns:
+    timestamp: np.ndarray
+    event_type: np.ndarray
+    decision: np.ndarray
+    flags: np.ndarray
+    model_version: np.ndarray
+    score: np.ndarray
+    prompt_hash: np.ndarray
+    reason_offsets: np.ndarray
+    reason_values: np.ndarray
+    tier: np.ndarray
+    rules_offsets: np.ndarray
+    rules_data: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def reason(self, i: int) -> np.ndarray:
+        return self.reason_values[self.reason_offsets[i]:self.reason_offsets[i + 1]]
+
+    def rules(self, i: int) -> list:
+        data = self.rules_data[self.rules_offsets[i]:self.rules_offsets[i + 1]]
+        if not len(data):
+            return []
+        return [(rule_id, tuple(span)) for rule_id, span in json.loads(data.tobytes().decode("utf-8"))]
+
+    def events(self) -> Iterator[SecurityEvent]:
+        for i in range(len(self)):
+            yield SecurityEvent(
+                timestamp=_from_micros(self.timestamp[i]),
+                event_type=EVENT_TYPES[self.event_type[i]],
+                decision=DECISIONS[self.decision[i]],
+                score=float(self.score[i]),
+                reason=self.reason(i).tolist(),
+                prompt_hash=self.prompt_hash[i].tobytes().hex(),
+                cache_hit=bool(self.flags[i] & FLAG_CACHE_HIT),
+                model_version=self.model_version[i].decode("ascii"),
+                tier=TIERS[self.tier[i]],
+                rules=self.rules(i),
+            )
+
+    @classmethod
+    def concat(cls, chunks: list["AuditColumns"]) -> "AuditColumns":
+        if not chunks:
+            return cls(
+                timestamp=np.empty(0, "<i8"),
+                event_type=np.empty(0, "u1"),
+                decision=np.empty(0, "u1"),
+                flags=np.empty(0, "u1"),
+                model_version=np.empty(0, f"S{VERSION_SIZE}"),
+                score=np.empty(0, "<f8"),
+                prompt_hash=np.empty((0, 32), "u1"),
+                reason_offsets=np.zeros(1, np.int64),
+                reason_values=np.empty(0, "<f4"),
+                tier=np.empty(0, "u1"),
+                rules_offsets=np.zeros(1, np.int64),
+                rules_data=np.empty(0, "u1"),
+            )
+        lengths = np.concatenate([np.diff(c.reason_offsets) for c in chunks])
+        rules_lengths = np.concatenate([np.diff(c.rules_offsets) for c in chunks])
+        return cls(
+            timestamp=np.concatenate([c.timestamp for c in chunks]),
+            event_type=np.concatenate([c.event_type for c in chunks]),
+            decision=np.concatenate([c.decision for c in chunks]),
+            flags=np.concatenate([c.flags for c in chunks]),
+            model_version=np.concatenate([c.model_version for c in chunks]),
+            score=np.concatenate([c.score for c in chunks]),
+            prompt_hash=np.concatenate([c.prompt_hash for c in chunks]),
+            reason_offsets=np.concatenate(([0], np.cumsum(lengths))).astype(np.int64),
+            reason_values=np.concatenate([c.reason_values for c in chunks]),
+            tier=np.concatenate([c.tier for c in chunks]),
+            rules_offsets=np.concatenate(([0], np.cumsum(rules_lengths))).astype(np.int64),
+            rules_data=np.concatenate([c.rules_data for c in chunks]),
+        )
+
+
+def _decode_chunk(buf, offset: int) -> tuple[AuditColumns, int]:
+    magic, n, m, r = CHUNK_HEADER.unpack_from(buf, offset)
+    if magic != CHUNK_MAGIC:
+        raise ValueError(f"corrupted audit chunk at offset {offset}")
+    pos = offset + CHUNK_HEADER.size
+
+    def take(dtype, count):
+        nonlocal pos
+        arr = np.frombuffer(buf, dtype=dtype, count=count, offset=pos)
+        pos += arr.nbytes
+        return arr
+
+    timestamp = take("<i8", n)
+    score = take("<f8", n)
+    reason_len = take("<u4", n)
+    reason_values = take("<f4", m)
+    prompt_hash = take("u1", n * 32).reshape(n, 32)
+    event_type = take("u1", n)
+    decision = take("u1", n)
+    flags = take("u1", n)
+    model_version = take(f"S{VERSION_SIZE}", n)
+    tier = take("u1", n)
+    rules_len = take("<u4", n)
+    rules_data = take("u1", r)
+    pos += _pad(pos - offset)
+
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(reason_len, out=offsets[1:])
+    rules_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(rules_len, out=rules_offsets[1:])
+    return AuditColumns(
+        timestamp, event_type, decision, flags, model_version, score, prompt_hash, offsets, reason_values,
+        tier, rules_offsets, rules_data
+    ), pos
+
+
+def iter_chunks(path: str) -> Iterator[AuditColumns]:
+    """
+    Streams the chunks of a binary audit log as views into a memory map.
+    A truncated trailing chunk (e.g. after a crash mid-write) is ignored.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < len(FILE_MAGIC):
+            return
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if buf[:len(FILE_MAGIC)] != FILE_MAGIC:
+        raise ValueError(f"{path} is not a binary audit log")
+
+    offset = len(FILE_MAGIC)
+    while offset + CHUNK_HEADER.size <= size:
+        _, n, m, r = CHUNK_HEADER.unpack_from(buf, offset)
+        end = offset + CHUNK_HEADER.size + n * ROW_SIZE + m * 4 + r
+        if end > size:
+            break
+        chunk, offset = _decode_chunk(buf, offset)
+        yield chunk
+
+
+def read_columns(path: str) -> AuditColumns:
+    return AuditColumns.concat(list(iter_chunks(path)))
+
+
+def convert_jsonl(src: str, dst: str, chunk_size: int = 4096) -> int:
+    """Converts an existing JSONL audit log; returns the number of events."""
+    storage = BinaryStorage(dst, max_events=chunk_size)
+    count = 0
+    try:
+        with open(src, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    storage.write(SecurityEvent(**json.loads(line)))
+                    count += 1
+    finally:
+        storage.close()
+    return count
@@ -1,7 +1,30 @@
-from secure_prompt.audit.models import SecurityEvent
+import atexit
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from secure_prompt.audit.models import Reason, RuleHit, SecurityEvent
 from secure_prompt.audit.storage import StorageBackend, JsonlStorage
+from secure_prompt.core import metrics
 from typing import Optional
 
+# (event_type, text, decision, score, reason, cache_hit, model_version, tier, rules)
+LogRecord = tuple[str, str, str, float, Reason, bool, str, str, list[RuleHit]]
+
+
+def _write_many(storage: StorageBackend, events: list[SecurityEvent]) -> None:
+    # custom backends written before write_many get one write() per event
+    write_many = getattr(storage, "write_many", None)
+    if write_many is not None:
+        write_many(events)
+    else:
+        for event in events:
+            storage.write(event)
+
 
 class SecurityLogger:
     def __init__(self, storage: Optional[StorageBackend] = None):
@@ -12,36 +35,232 @@ class SecurityLogger:
         raw_prompt: str,
         decision: str,
         score: float,
-        reason: list[float]
+        reason: Reason
     ) -> None:
-        event = SecurityEvent(
-            timestamp=self._now(),
-            event_type="input_check",
-            decision=decision,
-            score=score,
-            reason=reason,
-            prompt_hash=SecurityEvent.hash_text(raw_prompt)
-        )
-        self.storage.write(event)
+        self._emit([("input_check", raw_prompt, decision, score, reason, False, "", "", [])])
+
+    def log_input_checks(
+        self,
+        raw_prompts: list[str],
+        decisions: list[str],
+        scores: list[float],
+        reasons: list[Reason],
+        cache_hits: Optional[list[bool]] = None,
+        model_version: str = "",
+        tiers: Optional[list[str]] = None,
+        rules: Optional[list[list[RuleHit]]] = None
+    ) -> None:
+        if cache_hits is None:
+            cache_hits = [False] * len(raw_prompts)
+        if tiers is None:
+            tiers = [""] * len(raw_prompts)
+        if rules is None:
+            rules = [[]] * len(raw_prompts)
+        self._emit([
+            ("input_check", raw_prompt, decision, score, reason, cache_hit, model_version, tier, hits)
+            for raw_prompt, decision, score, reason, cache_hit, tier, hits
+            in zip(raw_prompts, decisions, scores, reasons, cache_hits, tiers, rules)
+        ])
 
     def log_response_check(
         self,
         response_text: str,
         decision: str,
         score: int,
-        reason: list[float]
+        reason: Reason
     ) -> None:
-        event = SecurityEvent(
-            timestamp=self._now(),
-            event_type="response_check",
+        self._emit([("response_check", response_text, decision, score, reason, False, "", "", [])])
+
+    def close(self) -> None:
+        close = getattr(self.storage, "close", None)
+        if close is not None:
+            close()
+
+    def _emit(self, records: list[LogRecord]) -> None:
+        with metrics.stage("audit.write", len(records)):
+            now = self._now()
+            events = [self._event(now, *record) for record in records]
+            if len(events) == 1:
+                self.storage.write(events[0])
+            elif events:
+                _write_many(self.storage, events)
+
+    @staticmethod
+    def _event(
+        timestamp: str,
+        event_type: str,
+        text: str,
+        decision: str,
+        score: float,
+        reason: Reason,
+        cache_hit: bool = False,
+        model_version: str = "",
+        tier: str = "",
+        rules: Optional[list[RuleHit]] = None
+    ) -> SecurityEvent:
+        return SecurityEvent(
+            timestamp=timestamp,
+            event_type=event_type,
             decision=decision,
             score=score,
             reason=reason,
-            prompt_hash=SecurityEvent.hash_text(response_text),
+            prompt_hash=SecurityEvent.hash_text(text),
+            cache_hit=cache_hit,
+            model_version=model_version,
+            tier=tier,
+            rules=list(rules or [])
         )
-        self.storage.write(event)
 
     @staticmethod
     def _now() -> str:
-        from datetime import datetime
-        return datetime.utcnow().isoformat()
+        from datetime import datetime, timezone
+        return datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class BackgroundSecurityLogger(SecurityLogger):
+    """
+    SecurityLogger that only enqueues records on the caller's thread.
+    Hashing, timestamp formatting, serialization and I/O happen on a
+    dedicated writer thread.
+
+    When the queue holds max_queue records the overflow policy applies:
+      block       - the caller waits for free space;
+      drop_oldest - the oldest queued record is discarded;
+      sample      - the new record is admitted with probability sample_rate
+                    (replacing the oldest one), otherwise discarded.
+    """
+
+    OVERFLOW_POLICIES = ("block", "drop_oldest", "sample")
+
+    def __init__(
+        self,
+        storage: Optional[StorageBackend] = None,
+        max_queue: int = 10000,
+        overflow: str = "drop_oldest",
+        sample_rate: float = 0.1,
+        batch_size: int = 512
+    ):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {self.OVERFLOW_POLICIES}")
+        if max_queue < 1:
+            raise ValueError("max_queue must be positive")
+        super().__init__(storage)
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.errors = 0
+
+        self._queue: deque[tuple[float, LogRecord]] = deque()
+        self._in_flight = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._random = random.Random()
+        self._log = logging.getLogger(__name__)
+
+        self._writer = threading.Thread(target=self._run, name="secure-prompt-audit", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "queued": len(self._queue),
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "written": self.written,
+                "errors": self.errors,
+            }
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until everything queued so far is persisted."""
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._queue and not self._in_flight, timeout)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        self._writer.join()
+        atexit.unregister(self.close)
+        super().close()
+
+    def _emit(self, records: list[LogRecord]) -> None:
+        ts = time.time()
+        # a queued row view would keep the whole batch feature matrix alive
+        # until the writer gets to it; the verdict cache copies for the same reason
+        records = [
+            record[:4] + (record[4].copy(),) + record[5:] if isinstance(record[4], np.ndarray) else record
+            for record in records
+        ]
+        with metrics.stage("audit.enqueue", len(records)), self._lock:
+            if self._closed:
+                raise RuntimeError("SecurityLogger is closed")
+            dropped = self.dropped
+            for record in records:
+                if len(self._queue) >= self.max_queue and not self._make_room():
+                    self.dropped += 1
+                    continue
+                self._queue.append((ts, record))
+                self.enqueued += 1
+            self._not_empty.notify()
+            metrics.count("audit.dropped", self.dropped - dropped)
+
+    def _make_room(self) -> bool:
+        """Frees a slot according to the overflow policy; False drops the new record."""
+        if self.overflow == "block":
+            self._not_full.wait_for(lambda: len(self._queue) < self.max_queue or self._closed)
+            return not self._closed
+        if self.overflow == "sample" and self._random.random() >= self.sample_rate:
+            return False
+        self._queue.popleft()
+        self.dropped += 1
+        return True
+
+    def _run(self) -> None:
+        from datetime import datetime, timezone
+
+        while True:
+            with self._lock:
+                self._not_empty.wait_for(lambda: self._queue or self._closed)
+                if not self._queue:
+                    return
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.batch_size))]
+                self._in_flight = len(batch)
+                self._not_full.notify_all()
+
+            try:
+                with metrics.stage("audit.write", len(batch)):
+                    timestamps = {}
+                    events = []
+                    for ts, record in batch:
+                        if ts not in timestamps:
+                            # naive UTC, same format as _now()
+                            timestamps[ts] = datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+                        events.append(self._event(timestamps[ts], *record))
+                    _write_many(self.storage, events)
+            except Exception:
+                self._log.exception("failed to write %d audit events", len(batch))
+                with self._lock:
+                    self.errors += len(batch)
+            else:
+                with self._lock:
+                    self.written += len(batch)
+
+            with self._lock:
+                self._in_flight = 0
+                self._idle.notify_all()
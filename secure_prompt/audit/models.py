@@ -1,5 +1,15 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import hashlib
+from typing import Union
+
+import numpy as np
+
+# feature vector behind a verdict: a list, or a row view of the batch feature
+# matrix that is converted to a list only when the event is serialized
+Reason = Union[list[float], np.ndarray]
+
+# matched rule: (rule_id, (start, end)) with the span of the match in the checked text
+RuleHit = tuple[str, tuple[int, int]]
 
 
 @dataclass
@@ -8,9 +18,13 @@ class SecurityEvent:
     event_type: str
     decision: str
     score: float
-    reason: list[float]
+    reason: Reason
 
     prompt_hash: str = ""
+    cache_hit: bool = False
+    model_version: str = ""
+    tier: str = ""  # rules / lexical / vector: the stage that produced the decision
+    rules: list[RuleHit] = field(default_factory=list)
 
     @staticmethod
     def hash_text(text: str) -> str:
@@ -1,13 +1,34 @@
+import os
 import json
+import atexit
+import threading
+import weakref
+from functools import partial
 from pathlib import Path
-from typing import Protocol
+from typing import Iterable, Optional, Protocol
 from secure_prompt.audit.models import SecurityEvent
 
 
 class StorageBackend(Protocol):
+    """write_many is optional: SecurityLogger falls back to write() per event without it."""
+
     def write(self, event: SecurityEvent) -> None:
         ...
 
+    def write_many(self, events: Iterable[SecurityEvent]) -> None:
+        ...
+
+
+def _to_list(value):
+    # reason arrives as a row view of the batch feature matrix; it becomes a list only here
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _to_jsonl(event: SecurityEvent) -> str:
+    return json.dumps(event.__dict__, ensure_ascii=False, default=_to_list) + "\n"
+
 
 class JsonlStorage:
     def __init__(self, path: str = "security.log.jsonl"):
@@ -16,4 +37,113 @@ class JsonlStorage:
 
     def write(self, event: SecurityEvent) -> None:
         with self.path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(event.__dict__, ensure_ascii=False) + "\n")
+            f.write(_to_jsonl(event))
+
+    def write_many(self, events: Iterable[SecurityEvent]) -> None:
+        data = "".join(_to_jsonl(event) for event in events)
+        if data:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(data)
+
+
+def _close_at_exit(ref: weakref.ref) -> None:
+    storage = ref()
+    if storage is not None:
+        storage.close()
+
+
+class BufferedAppendStorage:
+    """
+    Base for backends that keep one O_APPEND descriptor open and write events
+    in blocks. The buffer is flushed when it holds max_events events, when the
+    oldest one is flush_interval seconds old, on close() and at exit.
+
+    Every flush is a single write() of whole records, so several processes can
+    append to the same file without interleaving them.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            max_events: int = 512,
+            flush_interval: float = 1.0,
+            fsync: bool = False
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_events = max_events
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self._fd = self._open()
+        self._buffer: list[SecurityEvent] = []
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        # a weak reference: the exit hook must not keep closed-over storages alive
+        self._at_exit = partial(_close_at_exit, weakref.ref(self))
+        atexit.register(self._at_exit)
+
+    def _open(self) -> int:
+        return os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _encode(self, events: list[SecurityEvent]) -> bytes:
+        raise NotImplementedError
+
+    def write(self, event: SecurityEvent) -> None:
+        self.write_many((event,))
+
+    def write_many(self, events: Iterable[SecurityEvent]) -> None:
+        with self._lock:
+            if self._fd is None:
+                raise ValueError("write to closed storage")
+            self._buffer.extend(events)
+            if len(self._buffer) >= self.max_events:
+                self._flush_locked()
+            elif self._buffer and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is None:
+                return
+            self._flush_locked()
+            os.close(self._fd)
+            self._fd = None
+        atexit.unregister(self._at_exit)
+
+    def _flush_locked(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer or self._fd is None:
+            return
+
+        # the buffer is dropped only once it is written: on ENOSPC/EIO the
+        # events stay buffered and the next flush retries them
+        data = memoryview(self._encode(self._buffer))
+        while data:
+            written = os.write(self._fd, data)
+            data = data[written:]
+        self._buffer = []
+        if self.fsync:
+            os.fsync(self._fd)
+
+
+class BufferedJsonlStorage(BufferedAppendStorage):
+    def __init__(
+            self,
+            path: str = "security.log.jsonl",
+            max_events: int = 512,
+            flush_interval: float = 1.0,
+            fsync: bool = False
+    ):
+        super().__init__(path, max_events, flush_interval, fsync)
+
+    def _encode(self, events: list[SecurityEvent]) -> bytes:
+        return "".join(_to_jsonl(event) for event in events).encode("utf-8")
@@ -0,0 +1,116 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from secure_prompt.core.decision import DecisionCore, DecisionResult
+
+
+class AsyncDecisionCore:
+    """
+    asyncio front end for DecisionCore.
+
+    Concurrent decide_one() calls are coalesced into batches of at most
+    max_batch_size prompts, waiting at most max_wait seconds for a batch to
+    fill. Batches run one at a time on a worker thread, so the event loop is
+    never blocked and prompts that arrive while a batch is running form the
+    next one.
+    """
+
+    def __init__(
+            self,
+            core: Optional[DecisionCore] = None,
+            max_batch_size: int = 64,
+            max_wait: float = 0.005,
+            **core_kwargs
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be positive")
+        if max_wait < 0:
+            raise ValueError("max_wait must not be negative")
+
+        self.core = core or DecisionCore(**core_kwargs)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="secure-prompt-decide")
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._has_items: Optional[asyncio.Event] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def __aenter__(self) -> "AsyncDecisionCore":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def decide_one(self, prompt: str) -> DecisionResult:
+        if self._closing:
+            raise RuntimeError("AsyncDecisionCore is closed")
+        self._ensure_worker()
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((prompt, future))
+        self._has_items.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._batch_full.set()
+        return await future
+
+    async def decide(self, prompts: list[str]) -> list[DecisionResult]:
+        return list(await asyncio.gather(*(self.decide_one(p) for p in prompts)))
+
+    async def aclose(self) -> None:
+        """Finishes the queued prompts, then stops the worker."""
+        self._closing = True
+        if self._worker is not None:
+            self._has_items.set()
+            self._batch_full.set()
+            await self._worker
+            self._worker = None
+        self._executor.shutdown(wait=True)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None:
+            self._has_items = asyncio.Event()
+            self._batch_full = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._pending:
+                if self._closing:
+                    return
+                self._has_items.clear()
+                await self._has_items.wait()
+                continue
+
+            if len(self._pending) < self.max_batch_size and not self._closing:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            if len(self._pending) < self.max_batch_size:
+                self._batch_full.clear()
+
+            # callers that gave up while waiting are not scored
+            batch = [(prompt, future) for prompt, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self.core.decide, [prompt for prompt, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from typing import Optional
 
+from secure_prompt.audit.models import RuleHit
+
 
 class SecurityError(Exception):
     def __init__(self, *args):
@@ -13,4 +15,4 @@ class SecurityError(Exception):
 @dataclass
 class BaseResult:
     is_jailbreak: Optional[bool]
-    rules: Optional[list[tuple[str, str]]]
+    rules: Optional[list[RuleHit]]
@@ -0,0 +1,72 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class VerdictCache:
+    """
+    LRU cache of decisions with a TTL. Entries are keyed on the normalized
+    prompt together with the raw one (the verdict is the max over both
+    variants) and are dropped whenever the pipeline fingerprint changes.
+    """
+
+    def __init__(
+            self,
+            max_entries: int = 10000,
+            ttl: float = 300.0,
+            clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[bytes, tuple[float, Any]]" = OrderedDict()
+        self._fingerprint: Optional[Hashable] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(raw: str, normalized: str) -> bytes:
+        return hashlib.sha256(f"{normalized}\0{raw}".encode("utf-8")).digest()
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def validate(self, fingerprint: Hashable) -> None:
+        """Clears the cache if the model files, thresholds or policy changed."""
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                self._entries.clear()
+                self._fingerprint = fingerprint
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, raw: str, normalized: str) -> Optional[Any]:
+        key = self.key(raw, normalized)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, raw: str, normalized: str, value: Any) -> None:
+        key = self.key(raw, normalized)
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
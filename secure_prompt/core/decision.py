@@ -1,9 +1,20 @@
-from dataclasses import dataclass
+import logging
+import os
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Hashable, Optional
+
+import numpy as np
 
 from secure_prompt.audit.logger import SecurityLogger
+from secure_prompt.audit.models import Reason, RuleHit
 
+from secure_prompt.core import metrics, scoring
+from secure_prompt.core.cache import VerdictCache
+from secure_prompt.core.registry import ModelRegistry, ModelVersion
 from secure_prompt.core.preprocess import preprocess
-from secure_prompt.guards.ml_guard import MLGuard
+from secure_prompt.guards.ml_guard import MLGuard, MLResult
+from secure_prompt.guards.rules import RuleEngine, RuleResult
 from secure_prompt.core.scoring import PIPELINE_POLICY
 
 
@@ -11,42 +22,318 @@ from secure_prompt.core.scoring import PIPELINE_POLICY
 class DecisionResult:
     verdict: str
     score: float
-    reason: list[str]
+    reason: Reason
+    rules: list[RuleHit] = field(default_factory=list)
+    tier: str = ""  # rules / lexical / vector: the stage that produced the verdict
 
 
 class DecisionCore:
-    def __init__(self, use_vector: bool = True):
-        self.jail_score = PIPELINE_POLICY[bool(use_vector)]
-        self.logger = SecurityLogger()
+    def __init__(
+            self,
+            use_vector: bool = True,
+            cascade: bool = False,
+            cascade_allow_score: Optional[float] = None,
+            logger: Optional[SecurityLogger] = None,
+            verdict_cache: Optional[VerdictCache] = None,
+            registry: Optional[ModelRegistry] = None,
+            rules: Optional[RuleEngine] = None,
+            tiered: bool = False,
+            tier_band: Optional[tuple[float, float]] = None
+    ):
+        self.use_vector = bool(use_vector)
+        self.jail_score = PIPELINE_POLICY[self.use_vector]
+        self.logger = logger or SecurityLogger()
         self.guard = MLGuard(threshold=self.jail_score, use_vector=use_vector)
+        # tiered: the lexical model scores the batch first; only prompts whose
+        # lexical score falls into tier_band = [low, high) reach the vector model
+        if tiered and not self.use_vector:
+            raise ValueError("tiered mode needs use_vector=True for its second tier")
+        self.tiered = tiered
+        self.lexical_score = PIPELINE_POLICY[0]
+        self.lexical_guard = MLGuard(threshold=self.lexical_score, use_vector=False) if tiered else None
+        self._tier_band = tier_band
+        self.tier_band = self._default_tier_band()
+        # cascade: the normalized variant is scored first, the raw one only
+        # when the first score falls into [cascade_allow_score, jail_score)
+        self.cascade = cascade
+        self._cascade_allow_score = cascade_allow_score
+        self.cascade_allow_score = self._default_allow_score()
+        self.verdict_cache = verdict_cache
+        # registry: the model and thresholds are taken from its current
+        # version, re-read at the start of every batch. In tiered mode the
+        # registry versions the final (vector) model and both thresholds; the
+        # lexical tier keeps the model file it was built with
+        self.registry = registry
+        self.version: Optional[ModelVersion] = None
+        self._rejected: Optional[ModelVersion] = None
+        if registry is not None:
+            self._activate(registry.current)
+        # rules: block/allow rules decide obvious prompts before the model;
+        # matched (rule_id, (start, end)) pairs are reported in DecisionResult.rules
+        self.rules = rules
+
+    def warm_up(self) -> None:
+        """
+        Loads everything the guards create lazily (vector extractor, encoder,
+        template bank, NLTK resources) by scoring one throwaway prompt; nothing
+        is logged. Used before forking workers so that they share the pages.
+        """
+        self.guard.detect(["warm up"])
+        if self.tiered:
+            self.lexical_guard.detect(["warm up"])
+
+    def _default_allow_score(self) -> float:
+        if self._cascade_allow_score is None:
+            return self.jail_score / 2
+        return self._cascade_allow_score
+
+    def _default_tier_band(self) -> tuple[float, float]:
+        low, high = self._tier_band or (self.lexical_score / 2, self.lexical_score * 2)
+        if not low <= self.lexical_score <= high:
+            raise ValueError(f"tier_band {(low, high)} must contain the lexical threshold {self.lexical_score}")
+        return low, high
 
-    def _apply_policy(self, score: float) -> str:
-        if score >= self.jail_score:
+    def _activate(self, version: ModelVersion) -> None:
+        """
+        Switches to a registry version: its model replaces the final-tier model
+        and its policy sets both thresholds. The lexical model is not versioned;
+        its file is part of the verdict-cache fingerprint instead.
+
+        A model whose width differs from the guard's feature matrix (e.g. a
+        lexical model for a vector guard) raises ValueError and nothing is
+        switched; the registry only compares widths between its own versions.
+        """
+        n_features = getattr(version.model, "n_features_in_", None)
+        if n_features is not None:
+            expected = self.guard.feature_extractor.n_features(self.use_vector)
+            if n_features != expected:
+                raise ValueError(
+                    f"model {version.tag} expects {n_features} features, the guard produces {expected}"
+                )
+        self.version = version
+        self.jail_score = version.policy[self.use_vector]
+        self.cascade_allow_score = self._default_allow_score()
+        if self.tiered:
+            self.lexical_score = version.policy[0]
+            self.lexical_guard.threshold = self.lexical_score
+            self.tier_band = self._default_tier_band()
+        self.guard.model = version.model
+        self.guard.model_path = Path(version.model_path)
+        self.guard.threshold = self.jail_score
+
+    def _apply_policy(self, score: float, jail_score: Optional[float] = None) -> str:
+        if score >= (self.jail_score if jail_score is None else jail_score):
             return "BLOCK"
         return "ALLOW"
 
-    def decide(self, prompts: list[str]) -> list[DecisionResult]:
-        normalized = preprocess(prompts)
-        g_result = self.guard.detect(prompts + normalized)
+    @staticmethod
+    def _model_file(path: Path) -> tuple:
+        stat = os.stat(path)
+        return str(path), stat.st_mtime_ns, stat.st_size
+
+    def _fingerprint(self) -> Hashable:
+        # cached verdicts are only valid for the same model file, thresholds and policy
+        if self.version is not None:
+            model = (self.version.tag,)
+        else:
+            model = (*self._model_file(self.guard.model_path), scoring.PIPELINE_POLICY)
+        rules = self.rules.digest if self.rules is not None else None
+        tiers = None
+        if self.tiered:
+            tiers = (*self._model_file(self.lexical_guard.model_path), self.lexical_score, self.tier_band)
+        return (*model, self.jail_score, self.cascade, self.cascade_allow_score, rules, tiers, self._templates())
+
+    def _templates(self) -> Optional[tuple]:
+        # vector verdicts also depend on the template library and on how it is searched
+        if not self.use_vector:
+            return None
+        vector = self.guard.feature_extractor.get_vector_extractor()
+        chunking = tuple(sorted(vector.chunk_config.items())) if vector.chunk_config is not None else None
+        return vector.bank.state.digest, vector.index_config, vector.search_k, chunking
+
+    def _is_confident(self, score: float) -> bool:
+        return score >= self.jail_score or score < self.cascade_allow_score
+
+    def _detect_unique(
+            self,
+            texts: list[str],
+            guard: Optional[MLGuard] = None,
+            static: Optional[dict[str, np.ndarray]] = None
+    ) -> dict[str, MLResult]:
+        """
+        Scores each distinct text once. static maps texts to static features
+        the lexical tier already extracted; they are reused when every text has them.
+        """
+        unique = list(dict.fromkeys(texts))
+        if not unique:
+            return {}
+        guard = guard or self.guard
+        if static is not None and all(text in static for text in unique):
+            return dict(zip(unique, guard.detect(unique, static=np.stack([static[text] for text in unique]))))
+        return dict(zip(unique, guard.detect(unique)))
+
+    def _score_variants(
+            self,
+            prompts: list[str],
+            normalized: list[str],
+            static: Optional[dict[str, np.ndarray]] = None
+    ) -> dict[str, MLResult]:
+        if not self.cascade:
+            return self._detect_unique(prompts + normalized, static=static)
+
+        scored = self._detect_unique(normalized, static=static)
+        pending = [
+            raw for raw, norm in zip(prompts, normalized)
+            if raw not in scored and not self._is_confident(scored[norm].score)
+        ]
+        scored.update(self._detect_unique(pending, static=static))
+        return scored
+
+    def _check_rules(self, prompts: list[str], normalized: list[str]) -> list[Optional[RuleResult]]:
+        if self.rules is None:
+            return [None] * len(prompts)
+        with metrics.stage("rules", len(prompts)):
+            return [self.rules.check(raw, norm) for raw, norm in zip(prompts, normalized)]
+
+    def _ml_decision(
+            self,
+            g_raw: MLResult,
+            g_norm: MLResult,
+            jail_score: float,
+            matched: list[RuleHit],
+            tier: str
+    ) -> DecisionResult:
+        score_raw, score_norm = g_raw.score, g_norm.score
+        score = max(score_raw, score_norm)
+        reason = g_raw.features if score == score_raw else g_norm.features
+        verdict = self._apply_policy(score, jail_score)
+        if verdict == "ALLOW":
+            reason = []
+        return DecisionResult(
+            verdict=verdict,
+            score=score,
+            reason=reason,
+            rules=matched,
+            tier=tier,
+        )
+
+    def _decide_lexical(
+            self,
+            prompts: list[str],
+            normalized: list[str],
+            matched: list[list[RuleHit]]
+    ) -> tuple[list[Optional[DecisionResult]], dict[str, MLResult]]:
+        """
+        First tier: decisions for prompts outside tier_band, None for the
+        uncertain ones, and the lexical results by text. The lexical features
+        are the static block of the vector model's features, so the vector
+        tier reuses them instead of extracting them again.
+        """
+        scored = self._detect_unique(prompts + normalized, self.lexical_guard)
+        low, high = self.tier_band
         result = []
+        for raw, norm, rules in zip(prompts, normalized, matched):
+            g_raw, g_norm = scored[raw], scored[norm]
+            score = max(g_raw.score, g_norm.score)
+            if low <= score < high:
+                result.append(None)
+            else:
+                result.append(self._ml_decision(g_raw, g_norm, self.lexical_score, rules, "lexical"))
+        return result, scored
 
-        for i in range(len(prompts)):
-            score_raw, score_norm = g_result[i].score, g_result[i+len(prompts)].score
-            score = max(score_raw, score_norm)
-            reason = g_result[i].features if score == score_raw else g_result[i+len(prompts)].features
-            verdict = self._apply_policy(score)
-            if verdict == "ALLOW":
-                reason = []
-            result.append(DecisionResult(
-                verdict=verdict,
-                score=score,
-                reason=reason,
-            ))
-            self.logger.log_input_check(
-                raw_prompt=prompts[i],
-                decision=verdict,
-                score=score,
-                reason=reason
+    def _decide_uncached(self, prompts: list[str], normalized: list[str]) -> list[DecisionResult]:
+        checks = self._check_rules(prompts, normalized)
+        matched = [check.rules if check is not None else [] for check in checks]
+        # rule verdicts have no model score or features: the score is the policy
+        # threshold the verdict corresponds to, the audit event names the rules
+        result: list[Optional[DecisionResult]] = [
+            DecisionResult(
+                verdict=check.verdict,
+                score=self.jail_score if check.verdict == "BLOCK" else 0.0,
+                reason=[],
+                rules=check.rules,
+                tier="rules",
+            ) if check is not None and check.verdict is not None else None
+            for check in checks
+        ]
+
+        # only prompts the rules (and in tiered mode the lexical model) left undecided go further
+        pending = [i for i, r in enumerate(result) if r is None]
+        static = None
+        if self.tiered and pending:
+            lexical, lexical_scored = self._decide_lexical(
+                [prompts[i] for i in pending],
+                [normalized[i] for i in pending],
+                [matched[i] for i in pending]
             )
+            for i, decision in zip(pending, lexical):
+                result[i] = decision
+            pending = [i for i in pending if result[i] is None]
+            static = {text: r.features for text, r in lexical_scored.items()}
+
+        scored = self._score_variants([prompts[i] for i in pending], [normalized[i] for i in pending], static)
+        tier = "vector" if self.use_vector else "lexical"
+        for i in pending:
+            g_norm = scored[normalized[i]]
+            # in cascade mode a confident normalized score skips the raw variant
+            g_raw = scored.get(prompts[i], g_norm)
+            result[i] = self._ml_decision(g_raw, g_norm, self.jail_score, matched[i], tier)
+
+        for decision in result:
+            metrics.count(f"decision.tier.{decision.tier}")
+        return result
+
+    def decide(self, prompts: list[str]) -> list[DecisionResult]:
+        with metrics.stage("decision", len(prompts)):
+            return self._decide(prompts)
+
+    def _decide(self, prompts: list[str]) -> list[DecisionResult]:
+        # swap to a newer (or rolled back) version between batches only
+        current = self.registry.current if self.registry is not None else None
+        if current is not None and current is not self.version and current is not self._rejected:
+            try:
+                self._activate(current)
+            except ValueError:
+                # the previous version keeps serving until the registry publishes another one
+                self._rejected = current
+                logging.getLogger(__name__).exception("model version %s not activated", current.tag)
+
+        with metrics.stage("preprocess", len(prompts)):
+            normalized = preprocess(prompts)
+        result: list[Optional[DecisionResult]] = [None] * len(prompts)
+        cache_hits = [False] * len(prompts)
+
+        cache = self.verdict_cache
+        if cache is not None:
+            cache.validate(self._fingerprint())
+            for i, (raw, norm) in enumerate(zip(prompts, normalized)):
+                cached = cache.get(raw, norm)
+                if cached is not None:
+                    result[i] = replace(cached)
+                    cache_hits[i] = True
+            hits = sum(cache_hits)
+            metrics.count("verdict_cache.hits", hits)
+            metrics.count("verdict_cache.misses", len(prompts) - hits)
+
+        todo = [i for i, r in enumerate(result) if r is None]
+        if todo:
+            fresh = self._decide_uncached([prompts[i] for i in todo], [normalized[i] for i in todo])
+            for i, decision in zip(todo, fresh):
+                result[i] = decision
+                if cache is not None:
+                    # a row view would keep the whole batch feature matrix alive in the cache
+                    reason = decision.reason.copy() if isinstance(decision.reason, np.ndarray) else decision.reason
+                    cache.put(prompts[i], normalized[i], replace(decision, reason=reason))
+
+        self.logger.log_input_checks(
+            raw_prompts=prompts,
+            decisions=[r.verdict for r in result],
+            scores=[r.score for r in result],
+            reasons=[r.reason for r in result],
+            cache_hits=cache_hits,
+            model_version=self.version.tag if self.version is not None else "",
+            tiers=[r.tier for r in result],
+            rules=[r.rules for r in result]
+        )
 
         return result
@@ -0,0 +1,193 @@
+import bisect
+import os
+import re
+import threading
+import time
+from contextlib import nullcontext
+from typing import ContextManager, Optional, Protocol, Sequence
+
+# seconds; the last bucket of every histogram is +Inf
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class MetricsHook(Protocol):
+    """
+    Receives hot-path measurements. observe() gets the wall time of one
+    stage call and the number of prompts (or texts) it handled; count()
+    gets event counters such as cache hits.
+    """
+
+    enabled: bool
+
+    def observe(self, stage: str, seconds: float, batch_size: int) -> None:
+        ...
+
+    def count(self, name: str, value: int = 1) -> None:
+        ...
+
+
+class NullMetrics:
+    """Default hook: discards everything; stage() skips even the clock reads."""
+
+    enabled = False
+
+    def observe(self, stage: str, seconds: float, batch_size: int) -> None:
+        pass
+
+    def count(self, name: str, value: int = 1) -> None:
+        pass
+
+
+class _Histogram:
+    __slots__ = ("buckets", "sum", "count", "items")
+
+    def __init__(self, n_buckets: int):
+        self.buckets = [0] * (n_buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.items = 0
+
+
+class InMemoryMetrics:
+    """
+    Per-stage latency histograms (fixed buckets, as in Prometheus) plus the
+    number of processed items per stage and plain counters.
+    """
+
+    enabled = True
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        if list(buckets) != sorted(set(buckets)):
+            raise ValueError("buckets must be strictly increasing")
+        self.bounds = tuple(buckets)
+        self.histograms: dict[str, _Histogram] = {}
+        self.counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, batch_size: int) -> None:
+        bucket = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = _Histogram(len(self.bounds))
+            histogram.buckets[bucket] += 1
+            histogram.sum += seconds
+            histogram.count += 1
+            histogram.items += batch_size
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def snapshot(self) -> dict:
+        """{"stages": {stage: {count, sum, items, buckets}}, "counters": {...}}; buckets are not cumulative."""
+        with self._lock:
+            return {
+                "stages": {
+                    stage: {"count": h.count, "sum": h.sum, "items": h.items, "buckets": list(h.buckets)}
+                    for stage, h in self.histograms.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def to_prometheus(self, prefix: str = "secure_prompt") -> str:
+        """Prometheus text exposition format (0.0.4) of the current values."""
+        snapshot = self.snapshot()
+        lines = []
+
+        if snapshot["stages"]:
+            name = f"{prefix}_stage_seconds"
+            lines += [f"# HELP {name} Wall time of one call of a pipeline stage.", f"# TYPE {name} histogram"]
+            for stage, h in sorted(snapshot["stages"].items()):
+                label = _escape(stage)
+                cumulative = 0
+                for bound, n in zip((*self.bounds, float("inf")), h["buckets"]):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{stage="{label}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{label}"}} {h["sum"]!r}')
+                lines.append(f'{name}_count{{stage="{label}"}} {h["count"]}')
+
+            name = f"{prefix}_stage_items_total"
+            lines += [f"# HELP {name} Prompts or texts handled by a pipeline stage.", f"# TYPE {name} counter"]
+            for stage, h in sorted(snapshot["stages"].items()):
+                lines.append(f'{name}{{stage="{_escape(stage)}"}} {h["items"]}')
+
+        for counter, value in sorted(snapshot["counters"].items()):
+            name = f"{prefix}_{_metric_name(counter)}_total"
+            lines += [f"# TYPE {name} counter", f"{name} {value}"]
+
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write_prometheus(self, path: str, prefix: str = "secure_prompt") -> None:
+        """
+        Writes the exposition to a file (e.g. for node_exporter's textfile
+        collector); the file is replaced atomically, so scrapers never read
+        a partial one.
+        """
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus(prefix))
+        os.replace(tmp, path)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_name(value: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", value)
+
+
+class _StageTimer:
+    __slots__ = ("hook", "stage", "batch_size", "start")
+
+    def __init__(self, hook: MetricsHook, stage: str, batch_size: int):
+        self.hook = hook
+        self.stage = stage
+        self.batch_size = batch_size
+
+    def __enter__(self) -> "_StageTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.hook.observe(self.stage, time.perf_counter() - self.start, self.batch_size)
+
+
+_NULL_TIMER = nullcontext()
+_hook: MetricsHook = NullMetrics()
+
+
+def set_metrics(hook: Optional[MetricsHook]) -> MetricsHook:
+    """Installs the process-wide hook (None restores the no-op one); returns the previous hook."""
+    global _hook
+    previous = _hook
+    _hook = hook if hook is not None else NullMetrics()
+    return previous
+
+
+def get_metrics() -> MetricsHook:
+    return _hook
+
+
+def stage(name: str, batch_size: int = 1) -> ContextManager:
+    """Times the enclosed block as one call of the stage; a shared no-op context when disabled."""
+    hook = _hook
+    if not hook.enabled:
+        return _NULL_TIMER
+    return _StageTimer(hook, name, batch_size)
+
+
+def count(name: str, value: int = 1) -> None:
+    hook = _hook
+    if hook.enabled:
+        hook.count(name, value)
@@ -0,0 +1,137 @@
+import os
+import sys
+import multiprocessing as mp
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from secure_prompt.audit.logger import SecurityLogger
+from secure_prompt.core.decision import DecisionCore, DecisionResult
+
+
+# DecisionCore of the current worker process, set once by _init_worker
+_worker_core: Optional[DecisionCore] = None
+
+
+class _ShardLogger:
+    """
+    Audit logger of a worker: records are returned with the shard results and
+    written by the parent's logger. A buffered or background logger inherited
+    through fork would lose its queue when the worker exits.
+    """
+
+    def __init__(self):
+        self.records: list[dict] = []
+
+    def log_input_checks(self, **kwargs) -> None:
+        self.records.append(kwargs)
+
+
+def _init_worker(core: Optional[DecisionCore], core_kwargs: dict, torch_threads: Optional[int]) -> None:
+    global _worker_core
+    if torch_threads is not None and "torch" in sys.modules:
+        import torch
+        torch.set_num_threads(torch_threads)
+    if core is not None:
+        _worker_core = core
+    elif _worker_core is None:
+        _worker_core = DecisionCore(**core_kwargs, logger=_ShardLogger())
+    if hasattr(_worker_core, "logger"):
+        _worker_core.logger = _ShardLogger()
+
+
+def _decide_shard(prompts: list[str]) -> tuple[list[DecisionResult], list[dict]]:
+    results = _worker_core.decide(prompts)
+    logger = getattr(_worker_core, "logger", None)
+    if not isinstance(logger, _ShardLogger):
+        return results, []
+    records, logger.records = logger.records, []
+    return results, records
+
+
+def _shards(prompts: Iterable[str], size: int) -> Iterator[list[str]]:
+    it = iter(prompts)
+    while shard := list(islice(it, size)):
+        yield shard
+
+
+class ParallelDecisionCore:
+    """
+    Shards large offline batches across a process pool.
+
+    With the fork start method the parent warms the core up (encoder,
+    template bank, models) before the pool starts, so the workers inherit
+    them copy-on-write and nothing is pickled. With spawn every worker builds
+    its DecisionCore once in the pool initializer. Results are returned in
+    input order; audit records are written by the parent's logger.
+    """
+
+    def __init__(
+            self,
+            core: Optional[DecisionCore] = None,
+            workers: Optional[int] = None,
+            chunk_size: int = 256,
+            torch_threads: Optional[int] = 1,
+            start_method: Optional[str] = None,
+            **core_kwargs
+    ):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+
+        if start_method is None:
+            start_method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+        self._ctx = mp.get_context(start_method)
+
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.torch_threads = torch_threads
+        self.core_kwargs = core_kwargs
+        self._custom_core = core is not None
+        self.core = core
+        if self.core is None and start_method == "fork":
+            self.core = DecisionCore(**core_kwargs)
+        if self.core is not None:
+            self.logger = getattr(self.core, "logger", None)
+        else:
+            self.logger = core_kwargs.get("logger") or SecurityLogger()
+        self._pool = None
+
+    def __enter__(self) -> "ParallelDecisionCore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _get_pool(self):
+        if self._pool is None:
+            global _worker_core
+            # workers log through _ShardLogger; the parent's logger is not sent to them
+            worker_kwargs = {k: v for k, v in self.core_kwargs.items() if k != "logger"}
+            if self._ctx.get_start_method() == "fork":
+                # lazily loaded resources must exist before the fork to be shared
+                warm_up = getattr(self.core, "warm_up", None)
+                if warm_up is not None:
+                    warm_up()
+                _worker_core = self.core
+                initargs = (None, worker_kwargs, self.torch_threads)
+            else:
+                # a user supplied core is pickled once per worker, otherwise
+                # every worker builds its own from the same configuration
+                initargs = (self.core if self._custom_core else None, worker_kwargs, self.torch_threads)
+            self._pool = self._ctx.Pool(self.workers, initializer=_init_worker, initargs=initargs)
+        return self._pool
+
+    def decide_iter(self, prompts: Iterable[str]) -> Iterator[DecisionResult]:
+        """Streams results for an arbitrarily long iterable of prompts."""
+        for results, records in self._get_pool().imap(_decide_shard, _shards(prompts, self.chunk_size)):
+            for record in records:
+                self.logger.log_input_checks(**record)
+            yield from results
+
+    def decide(self, prompts: list[str]) -> list[DecisionResult]:
+        return list(self.decide_iter(prompts))
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
@@ -1,6 +1,9 @@
 import re
+import sys
 import unicodedata
 import base64
+from functools import lru_cache
+from typing import Optional
 
 
 ZERO_WIDTH_CHARS = [
@@ -22,10 +25,36 @@ HOMOGLYPH_MAP = {
     "0": "o", "1": "i", "3": "e"
 }
 
+_ZERO_WIDTH_TABLE = str.maketrans(dict.fromkeys(ZERO_WIDTH_CHARS))
+_HOMOGLYPH_TABLE = str.maketrans(HOMOGLYPH_MAP)
+_HOMOGLYPH_TABLE_K_L = str.maketrans(HOMOGLYPH_MAP_K_L)
+_HOMOGLYPH_TABLE_L_K = str.maketrans(HOMOGLYPH_MAP_L_K)
+
+_BASE64_RE = re.compile(r"[A-Za-z0-9+/=]+")
+_SPACED_LETTERS_RE = re.compile(r"(?<!\w)([a-zа-я])\s+(?=[a-zа-я](?!\w))")
+
+
+@lru_cache(maxsize=None)
+def _punctuation_table() -> dict[int, str]:
+    # every punctuation (P*) and symbol (S*) code point maps to a space
+    return {
+        code: " "
+        for code in range(sys.maxunicode + 1)
+        if unicodedata.category(chr(code)).startswith(("P", "S"))
+    }
+
+
+@lru_cache(maxsize=None)
+def _cleanup_table() -> dict[int, Optional[str]]:
+    # zero-width characters are format characters (Cf), never P*/S*,
+    # so both mappings can be applied in one translate
+    return {**_punctuation_table(), **_ZERO_WIDTH_TABLE}
+
+
 def try_decode_base64(text: str) -> str:
     stripped = text.strip()
 
-    if not re.fullmatch(r"[A-Za-z0-9+/=]+", stripped):
+    if not _BASE64_RE.fullmatch(stripped):
         return text
 
     try:
@@ -43,63 +72,50 @@ def normalize_unicode(text: str) -> str:
 
 
 def remove_zero_width(text: str) -> str:
-    for ch in ZERO_WIDTH_CHARS:
-        text = text.replace(ch, "")
-    return text
+    return text.translate(_ZERO_WIDTH_TABLE)
 
 
 def normalize_punctuation(text: str) -> str:
-    out = []
-
-    for ch in text:
-        cat = unicodedata.category(ch)
-
-        if cat.startswith(("P", "S")):
-            out.append(" ")
-        else:
-            out.append(ch)
-
-    return "".join(out)
+    return text.translate(_punctuation_table())
 
 
 def normalize_spacing(text: str) -> str:
-    while True:
-        new = re.sub(r"(?<!\w)([a-zа-я])\s+(?=[a-zа-я](?!\w))", r"\1", text)
-        if new == text:
-            break
-        text = new
-    return text
+    # A single pass is already the fixed point: joining "x y" only turns
+    # whitespace into word characters, which can only block further matches,
+    # and a match consumes nothing past the whitespace run.
+    return _SPACED_LETTERS_RE.sub(r"\1", text)
 
 
 def normalize_whitespace(text: str) -> str:
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
+    # str.split() and re's \s share the same notion of whitespace
+    return " ".join(text.split())
 
 
 def normalize_homoglyphs(text: str) -> str:
-    return "".join(HOMOGLYPH_MAP.get(c, c) for c in text)
+    return text.translate(_HOMOGLYPH_TABLE)
 
 
 def normalize_homoglyphs_k_l(text: str) -> str:
-    return "".join(HOMOGLYPH_MAP_K_L.get(c, c) for c in text)
+    return text.translate(_HOMOGLYPH_TABLE_K_L)
 
 
 def normalize_homoglyphs_l_k(text: str) -> str:
-    return "".join(HOMOGLYPH_MAP_L_K.get(c, c) for c in text)
+    return text.translate(_HOMOGLYPH_TABLE_L_K)
+
+
+def normalize(raw: str) -> str:
+    text = try_decode_base64(raw)
+    text = unicodedata.normalize("NFKC", text.lower())
+    text = text.translate(_cleanup_table())
+    text = _SPACED_LETTERS_RE.sub(r"\1", text)
+    text = " ".join(text.split())
+    return text.translate(_HOMOGLYPH_TABLE)
 
 
 def preprocess(texts: list[str], homoglyphs_alph=False):
     result = []
     for raw in texts:
-        text = try_decode_base64(raw)
-        text = text.lower()
-        text = normalize_unicode(text)
-        text = remove_zero_width(text)
-        text = normalize_punctuation(text)
-        text = normalize_spacing(text)
-        text = normalize_whitespace(text)
-        text = normalize_homoglyphs(text)
-        norm = text
+        norm = normalize(raw)
         if homoglyphs_alph:
             lat_canon = normalize_homoglyphs_k_l(norm)
             cyr_canon = normalize_homoglyphs_l_k(norm)
@@ -0,0 +1,209 @@
+import os
+import json
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import numpy as np
+from dotenv import dotenv_values, find_dotenv
+
+from secure_prompt.core import scoring
+from secure_prompt.guards.resources import parse_model, resolve_model_path
+
+
+THRESHOLD_KEYS = ("ML_JAIL_SCORE", "VECTOR_JAIL_SCORE", "PP1", "PP2")
+
+
+@dataclass(frozen=True)
+class ModelVersion:
+    """A loaded classifier together with the thresholds it was validated with."""
+    tag: str
+    model: Any
+    model_path: str
+    thresholds: dict[str, float]
+    loaded_at: float = field(default_factory=time.time)
+
+    @property
+    def policy(self) -> tuple[float, float]:
+        return self.thresholds["PP1"], self.thresholds["PP2"]
+
+
+class ModelRegistry:
+    """
+    Watches a model file and the threshold config (.env) and keeps the
+    current ModelVersion. New versions are loaded and validated on a
+    background thread and published with a single reference swap, so a
+    consumer reading `current` once per batch never mixes two versions.
+    The model file is resolved as in MLGuard: an exported .npz next to the
+    .pkl wins unless the pickle is newer.
+
+    A version that fails validation is rejected and the current one stays
+    active; it is not retried until the files change again. `rollback()`
+    restores the previous version the same way.
+    """
+
+    def __init__(
+            self,
+            model_path: Path,
+            config_path: Optional[str] = None,
+            poll_interval: float = 2.0,
+            history: int = 3,
+            validator: Optional[Callable[[ModelVersion], None]] = None
+    ):
+        self.model_path = Path(model_path).resolve()
+        self.config_path = config_path if config_path is not None else find_dotenv(usecwd=True) or None
+        self.poll_interval = poll_interval
+        self.validator = validator
+
+        self.reloads = 0
+        self.rejected = 0
+
+        self._history: deque[ModelVersion] = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._log = logging.getLogger(__name__)
+
+        self._seen = self._signature()
+        self._current = self._load()
+
+    @property
+    def current(self) -> ModelVersion:
+        return self._current
+
+    @property
+    def history(self) -> list[ModelVersion]:
+        """Previous versions, most recent last."""
+        return list(self._history)
+
+    # ---------- LOADING ----------
+
+    def _signature(self) -> tuple:
+        def stat(path):
+            try:
+                st = os.stat(path)
+            except (OSError, TypeError):
+                return None
+            return st.st_mtime_ns, st.st_size
+
+        return stat(resolve_model_path(self.model_path)), stat(self.config_path)
+
+    def _thresholds(self) -> dict[str, float]:
+        defaults = {
+            "ML_JAIL_SCORE": scoring.ML_JAIL_SCORE,
+            "VECTOR_JAIL_SCORE": scoring.VECTOR_JAIL_SCORE,
+            "PP1": scoring.PIPELINE_POLICY[0],
+            "PP2": scoring.PIPELINE_POLICY[1],
+        }
+        values = dotenv_values(self.config_path) if self.config_path else {}
+        return {key: float(values.get(key) or defaults[key]) for key in THRESHOLD_KEYS}
+
+    def _load(self) -> ModelVersion:
+        model_path = resolve_model_path(self.model_path)
+        data = model_path.read_bytes()
+        thresholds = self._thresholds()
+        model_hash = hashlib.sha256(data).hexdigest()
+        config_hash = hashlib.sha256(json.dumps(thresholds, sort_keys=True).encode("utf-8")).hexdigest()
+        version = ModelVersion(
+            tag=f"{model_hash[:8]}.{config_hash[:4]}",
+            model=parse_model(data, model_path.suffix),
+            model_path=str(model_path),
+            thresholds=thresholds,
+        )
+        self._validate(version)
+        return version
+
+    def _validate(self, version: ModelVersion) -> None:
+        model = version.model
+        if not callable(getattr(model, "predict_proba", None)):
+            raise ValueError(f"{version.model_path} does not contain a classifier with predict_proba")
+
+        bad = [key for key, value in version.thresholds.items() if not math.isfinite(value) or value <= 0]
+        if bad:
+            raise ValueError(f"invalid thresholds: {bad}")
+
+        n_features = getattr(model, "n_features_in_", None)
+        current = getattr(self, "_current", None)
+        expected = getattr(current.model, "n_features_in_", None) if current else None
+        if expected is not None and n_features != expected:
+            raise ValueError(f"model expects {n_features} features, the running one {expected}")
+        if n_features is not None:
+            probs = np.asarray(model.predict_proba(np.zeros((1, n_features))))
+            if probs.shape != (1, 2) or not np.all((probs >= 0) & (probs <= 1)):
+                raise ValueError(f"predict_proba returned {probs!r} on a probe row")
+
+        if self.validator is not None:
+            self.validator(version)
+
+    def check(self) -> bool:
+        """Loads a new version if the watched files changed; returns True on a swap."""
+        with self._lock:
+            signature = self._signature()
+            if signature == self._seen:
+                return False
+            self._seen = signature
+
+            try:
+                version = self._load()
+            except Exception:
+                self.rejected += 1
+                self._log.exception("rejected model update from %s", self.model_path)
+                return False
+
+            if version.tag == self._current.tag:
+                return False
+            self._history.append(self._current)
+            self._current = version
+            self.reloads += 1
+            self._log.info("model version %s activated", version.tag)
+            return True
+
+    def rollback(self) -> ModelVersion:
+        """Reactivates the previous version; the files on disk stay ignored until they change."""
+        with self._lock:
+            if not self._history:
+                raise RuntimeError("no previous model version to roll back to")
+            self._current = self._history.pop()
+            self._seen = self._signature()
+            self._log.warning("rolled back to model version %s", self._current.tag)
+            return self._current
+
+    def __reduce__(self):
+        # a spawned worker process builds its own registry over the same files
+        return _restore_registry, (
+            self.model_path, self.config_path, self.poll_interval,
+            self._history.maxlen, self.validator, self._thread is not None
+        )
+
+    # ---------- WATCHER ----------
+
+    def start(self) -> "ModelRegistry":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="secure-prompt-registry", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception:
+                self._log.exception("model registry check failed")
+
+
+def _restore_registry(model_path, config_path, poll_interval, history, validator, watching) -> ModelRegistry:
+    registry = ModelRegistry(model_path, config_path, poll_interval, history, validator)
+    return registry.start() if watching else registry
@@ -0,0 +1,136 @@
+"""
+Артефакты без pickle: каталог с массивами <name>.npy и метаданными meta.json.
+
+Массивы читаются через np.load(mmap_mode="r"), так что процессы, открывшие
+один артефакт, делят одну копию в page cache. Каталог пишется во временное
+место и переименовывается целиком, поэтому читатель никогда не видит
+частично записанный артефакт.
+
+Разовая конвертация старых pickle (кэш шаблонов v4 и модели MLGuard):
+
+    python -m secure_prompt.guards.artifacts --cache-dir ./vector_cache
+"""
+import os
+import json
+import pickle
+import shutil
+import argparse
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+ARTIFACT_VERSION = 1
+META_FILE = "meta.json"
+
+
+def write_artifact(path: str, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> str:
+    """Атомарно записывает артефакт; если он уже записан другим процессом, оставляет существующий"""
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    os.makedirs(tmp_path)
+    try:
+        specs = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            np.save(os.path.join(tmp_path, f"{name}.npy"), array, allow_pickle=False)
+            specs[name] = {"dtype": array.dtype.str, "shape": list(array.shape)}
+        with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({**meta, "format_version": ARTIFACT_VERSION, "arrays": specs}, f, ensure_ascii=False)
+        os.rename(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            raise
+    return path
+
+
+def read_artifact(path: str, mmap: bool = True) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Returns:
+        (arrays, meta); при mmap=True массивы - read-only отображения файлов
+    """
+    with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format_version") != ARTIFACT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия артефакта {path}: {meta.get('format_version')}")
+
+    arrays = {}
+    for name, spec in meta["arrays"].items():
+        array = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None, allow_pickle=False)
+        if array.dtype.str != spec["dtype"] or list(array.shape) != spec["shape"]:
+            raise ValueError(f"Массив {name} артефакта {path} не совпадает с метаданными")
+        arrays[name] = array
+    return arrays, meta
+
+
+# ---------- CONVERTER ----------
+
+def convert_template_pickle(pickle_path: str, cache_dir: str, model_name: str) -> int:
+    """
+    Переносит кэш шаблонов template_embeddings_v4.pkl в хранилище v5:
+    эмбеддинги попадают в content-addressed хранилище и в снимок-артефакт.
+    model_name должен совпадать с моделью, которой посчитан старый кэш.
+
+    Returns:
+        число перенесённых шаблонов
+    """
+    from secure_prompt.guards.templates import TemplateSet, TemplateStore
+
+    with open(pickle_path, "rb") as f:
+        data = pickle.load(f)
+    texts = list(data["texts"])
+    embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+    state = TemplateSet(
+        embeddings=embeddings,
+        texts=texts,
+        categories=list(data.get("categories") or ["unknown"] * len(texts)),
+        weights=list(data.get("weights") or [1.0] * len(texts)),
+    )
+
+    rows = {text: i for i, text in enumerate(texts)}
+    store = TemplateStore(cache_dir, model_name)
+    store.embed(texts, lambda missing: embeddings[[rows[text] for text in missing]])
+    store.save_snapshot(state)
+    return len(texts)
+
+
+def convert_model_pickle(pickle_path: str) -> Optional[str]:
+    """
+    Экспортирует линейную модель из pickle в .npz рядом с ним.
+
+    Returns:
+        путь к .npz или None, если модель не линейная и остаётся в pickle
+    """
+    from secure_prompt.guards.linear_model import export_linear_model
+
+    with open(pickle_path, "rb") as f:
+        model = pickle.load(f)
+    npz_path = Path(pickle_path).with_suffix(".npz")
+    return str(npz_path) if export_linear_model(model, npz_path) else None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from secure_prompt.guards.ml_guard import MODEL_PATH, MODEL_PATH_VECTOR
+
+    parser = argparse.ArgumentParser(description="Конвертация pickle-артефактов secure_prompt")
+    parser.add_argument("--cache-dir", default="./vector_cache")
+    parser.add_argument("--model-name", default=os.getenv("VECTOR_MODEL_NAME"))
+    parser.add_argument("--models", nargs="*", default=[str(MODEL_PATH), str(MODEL_PATH_VECTOR)])
+    args = parser.parse_args(argv)
+
+    template_pickle = os.path.join(args.cache_dir, "template_embeddings_v4.pkl")
+    if os.path.exists(template_pickle):
+        n = convert_template_pickle(template_pickle, os.path.abspath(args.cache_dir), args.model_name)
+        print(f"{template_pickle}: {n} шаблонов перенесено")
+
+    for model_path in args.models:
+        if not os.path.exists(model_path):
+            continue
+        npz_path = convert_model_pickle(model_path)
+        print(f"{model_path}: " + (f"сохранено в {npz_path}" if npz_path else "модель не линейная, остаётся в pickle"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+CHUNK_AGGREGATIONS = ("max", "mean")
+
+# Число токенов каждого слова (без специальных токенов), обычно токенизатором энкодера
+TokenCounter = Callable[[List[str]], Sequence[int]]
+
+# Окна режутся по словам, но каждое окно ограничено и бюджетом токенов
+# max_tokens: иначе окно из 64 слов русского текста, base64 или разрядки
+# занимает больше max_seq_length токенов и молча усекается энкодером
+DEFAULT_CHUNK_CONFIG: Dict[str, Any] = {
+    "window": 64,           # слов в окне (не больше)
+    "overlap": 16,          # слов перекрытия соседних окон полной длины
+    "max_tokens": None,     # токенов в окне; None - max_seq_length энкодера минус спецтокены
+    "max_windows": 32,      # окон на текст, ограничивает стоимость длинных текстов
+    "agg": "max",           # агрегация похожестей по окнам: max или mean
+}
+
+
+def normalize_chunk_config(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Полная конфигурация разбиения на окна с проверкой значений"""
+    full = {**DEFAULT_CHUNK_CONFIG, **(config or {})}
+    unknown = set(full) - set(DEFAULT_CHUNK_CONFIG)
+    if unknown:
+        raise ValueError(f"Неизвестные параметры разбиения: {sorted(unknown)}")
+    if full["window"] < 1 or not 0 <= full["overlap"] < full["window"]:
+        raise ValueError("Нужно window >= 1 и 0 <= overlap < window")
+    if full["max_tokens"] is not None and full["max_tokens"] < 1:
+        raise ValueError("max_tokens должен быть >= 1")
+    if full["max_windows"] < 1:
+        raise ValueError("max_windows должен быть >= 1")
+    if full["agg"] not in CHUNK_AGGREGATIONS:
+        raise ValueError(f"agg должен быть одним из {CHUNK_AGGREGATIONS}")
+    return full
+
+
+def _fit_word(word: str, n_tokens: int, max_tokens: int, count_tokens: TokenCounter) -> List[Tuple[str, int]]:
+    """Слово длиннее max_tokens токенов (base64, слитный текст) режется на части по символам"""
+    if n_tokens <= max_tokens or len(word) == 1:
+        return [(word, n_tokens)]
+    size = max(1, len(word) * max_tokens // n_tokens)
+    pieces = [word[i:i + size] for i in range(0, len(word), size)]
+    fitted = []
+    for piece, count in zip(pieces, count_tokens(pieces)):
+        if count > max_tokens:
+            half = len(piece) // 2
+            halves = [piece[:half], piece[half:]]
+            for part, part_count in zip(halves, count_tokens(halves)):
+                fitted.extend(_fit_word(part, part_count, max_tokens, count_tokens))
+        else:
+            fitted.append((piece, count))
+    return fitted
+
+
+def iter_windows(
+        segments: Iterable[str],
+        window: int,
+        overlap: int,
+        max_tokens: Optional[int] = None,
+        count_tokens: Optional[TokenCounter] = None
+) -> Iterator[str]:
+    """
+    Окна не длиннее window слов и max_tokens токенов из потока фрагментов текста.
+
+    Окно выдаётся, как только набрано достаточно слов, поэтому поток можно
+    прервать после любого окна. Слово, разрезанное границей фрагментов,
+    склеивается. Окно, укороченное бюджетом токенов, перекрывается со
+    следующим пропорционально меньше. Последнее окно может быть короче.
+    """
+    budget = max_tokens if max_tokens is not None and count_tokens is not None else None
+    words: List[str] = []
+    tokens: List[int] = []
+    tail = ""
+    covered = 0  # сколько слов в начале words уже вошло в выданные окна
+    emitted = False
+
+    def add(parts: List[str]) -> None:
+        if budget is None:
+            words.extend(parts)
+            return
+        for word, n in zip(parts, count_tokens(parts)):
+            for piece, piece_tokens in _fit_word(word, n, budget, count_tokens):
+                words.append(piece)
+                tokens.append(piece_tokens)
+
+    def take() -> int:
+        """Сколько слов из начала words помещается в окно"""
+        if budget is None:
+            return min(window, len(words))
+        k, total = 0, 0
+        while k < min(window, len(words)) and total + tokens[k] <= budget:
+            total += tokens[k]
+            k += 1
+        return max(k, 1)
+
+    def emit(k: int) -> str:
+        nonlocal covered, emitted
+        text = " ".join(words[:k])
+        stride = k - overlap * k // window
+        del words[:stride]
+        del tokens[:stride]
+        covered = k - stride
+        emitted = True
+        return text
+
+    for segment in segments:
+        text = tail + segment
+        parts = text.split()
+        tail = parts.pop() if parts and not text[-1].isspace() else ""
+        add(parts)
+        # окно готово, когда набрано window слов или следующее слово не влезает в бюджет
+        while words:
+            k = take()
+            if k == len(words) < window:
+                break
+            yield emit(k)
+
+    if tail:
+        add([tail])
+    while words and (not emitted or len(words) > covered):
+        yield emit(take())
+
+
+def window_budget(max_windows: int) -> Tuple[int, int]:
+    """
+    Политика покрытия длинного текста: (head, tail) - сколько окон проверяется
+    подряд с начала и с конца текста. Середина текста дальше max_windows окон
+    не проверяется: так стоимость ограничена, а начало и конец, куда обычно
+    ставят инструкцию, покрыты сплошь, без пропусков между окнами. Чтобы
+    проверить середину, нужно увеличить max_windows.
+    """
+    tail = max_windows // 2
+    return max_windows - tail, tail
+
+
+def split_windows(
+        text: str,
+        window: int,
+        overlap: int,
+        max_windows: int,
+        max_tokens: Optional[int] = None,
+        count_tokens: Optional[TokenCounter] = None
+) -> List[str]:
+    """
+    Окна текста. Текст, который помещается в одно окно, остаётся как есть.
+    Если окон больше max_windows, берутся подряд идущие окна с начала и с
+    конца текста (window_budget) - та же политика, что и в detect_stream.
+    """
+    words = text.split()
+    fits = len(words) <= window
+    if fits and max_tokens is not None and count_tokens is not None:
+        fits = sum(count_tokens(words)) <= max_tokens
+    if fits:
+        return [text]
+    windows = list(iter_windows([text], window, overlap, max_tokens, count_tokens))
+    if len(windows) <= max_windows:
+        return windows
+    head, tail = window_budget(max_windows)
+    return windows[:head] + (windows[-tail:] if tail else [])
@@ -0,0 +1,233 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+# записей на диске по умолчанию: ~150 МБ при dim=384
+DEFAULT_MAX_DISK_ENTRIES = 100_000
+
+
+def content_key(model_name: str, text: str) -> bytes:
+    """Адрес эмбеддинга по содержимому: sha256(имя модели, текст)"""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).digest()
+
+
+class DiskEmbeddingStore:
+    """
+    Дисковый уровень: записи фиксированного размера (ключ 32 байта + вектор
+    float32) в одном файле, чтение через memory map. Каждое добавление - один
+    write() целых записей с O_APPEND, поэтому каталог могут делить несколько
+    процессов; их записи подхватывает refresh().
+
+    max_entries ограничивает файл: когда записей становится больше, файл
+    сжимается до max_entries // 2 самых новых записей. Сжатый файл атомарно
+    заменяет старый; процессы, открывшие старый, переоткрывают файл при
+    следующем refresh(), а записи, добавленные ими в старый файл в момент
+    сжатия, теряются (это кэш). None - без ограничения.
+    """
+
+    def __init__(self, directory: str, dim: int, max_entries: Optional[int] = None):
+        if max_entries is not None and max_entries < 2:
+            raise ValueError("max_entries должен быть >= 2")
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"embeddings_{dim}d.bin")
+        self.dim = dim
+        self.max_entries = max_entries
+        self.dtype = np.dtype([("key", "S32"), ("vec", "<f4", (dim,))])
+        self._fd: Optional[int] = None
+        self._reopen()
+
+    def __len__(self) -> int:
+        return self._n_rows
+
+    def _reopen(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        self._rows: Dict[bytes, int] = {}
+        self._data: Optional[np.memmap] = None
+        self._n_rows = 0
+        self._signature: Optional[tuple] = None
+        self.refresh()
+
+    def refresh(self) -> None:
+        """
+        Отображает записи, добавленные после прошлого вызова (любым процессом).
+        Файл перечитывается, только если изменились его размер или mtime;
+        после сжатия другим процессом файл открывается заново.
+        """
+        try:
+            replaced = os.stat(self.path).st_ino != os.fstat(self._fd).st_ino
+        except FileNotFoundError:
+            replaced = True
+        if replaced:
+            self._reopen()
+            return
+
+        stat = os.fstat(self._fd)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if signature == self._signature:
+            return
+        self._signature = signature
+        n_rows = stat.st_size // self.dtype.itemsize
+        if n_rows == self._n_rows:
+            return
+        self._data = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(n_rows,))
+        # numpy отрезает конечные NUL-байты у значений "S32", а в дайджесте они бывают
+        for row, key in enumerate(self._data["key"][self._n_rows:].tolist(), start=self._n_rows):
+            self._rows.setdefault(key.ljust(32, b"\0"), row)
+        self._n_rows = n_rows
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        return np.array(self._data["vec"][row])
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        records = np.empty(len(keys), dtype=self.dtype)
+        records["key"] = keys
+        records["vec"] = vectors
+        data = memoryview(records.tobytes())
+        while data:
+            written = os.write(self._fd, data)
+            data = data[written:]
+        if self.max_entries is not None and os.fstat(self._fd).st_size // self.dtype.itemsize > self.max_entries:
+            self.compact()
+
+    def compact(self) -> None:
+        """Оставляет max_entries // 2 самых новых записей без повторов ключей"""
+        self.refresh()
+        if self._data is None:
+            return
+        keep = self.max_entries // 2 if self.max_entries is not None else self._n_rows
+        newest = self._data[max(self._n_rows - keep, 0):]
+        # повтор ключа (два процесса закодировали один текст) - оставляем последнюю запись
+        last = {key.ljust(32, b"\0"): row for row, key in enumerate(newest["key"].tolist())}
+        records = newest[np.fromiter(sorted(last.values()), dtype=np.intp, count=len(last))]
+
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(records.tobytes())
+        os.replace(tmp, self.path)
+        self._reopen()
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._data = None
+
+
+class EmbeddingCache:
+    """
+    Кэш эмбеддингов текстов по содержимому: LRU в памяти и опциональный
+    уровень на диске с ключом sha256(имя модели, текст), так что повторные
+    промпты не доходят до энкодера и переживают перезапуск воркеров.
+    """
+
+    def __init__(
+            self,
+            model_name: str,
+            dim: int,
+            max_entries: int = 10000,
+            disk_dir: Optional[str] = None,
+            max_disk_entries: Optional[int] = DEFAULT_MAX_DISK_ENTRIES
+    ):
+        self.model_name = model_name
+        self.dim = dim
+        self.max_entries = max_entries
+        self.disk = DiskEmbeddingStore(disk_dir, dim, max_disk_entries) if disk_dir else None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, text: str) -> bytes:
+        return content_key(self.model_name, text)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self.disk) if self.disk else 0,
+        }
+
+    def clear(self) -> None:
+        """Очищает уровень в памяти и счётчики; дисковый уровень остаётся"""
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def _lookup(self, key: bytes) -> Optional[np.ndarray]:
+        emb = self._memory.get(key)
+        if emb is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return emb
+        if self.disk is not None:
+            emb = self.disk.get(key)
+            if emb is not None:
+                self._remember(key, emb)
+                self.disk_hits += 1
+                return emb
+        return None
+
+    def _remember(self, key: bytes, emb: np.ndarray) -> None:
+        self._memory[key] = emb
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def encode(self, texts: List[str], encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Матрица (len(texts), dim) float32; в encode передаются только тексты,
+        которых нет ни на одном уровне, каждый различный текст один раз.
+        """
+        result = np.empty((len(texts), self.dim), dtype=np.float32)
+        missing: Dict[bytes, List[int]] = {}
+        missing_texts: List[str] = []
+
+        with self._lock:
+            refreshed = self.disk is None
+            for i, text in enumerate(texts):
+                key = self.key(text)
+                if key in missing:
+                    missing[key].append(i)
+                    continue
+                emb = self._lookup(key)
+                if emb is None and not refreshed:
+                    # записи других процессов подхватываются не чаще раза за батч
+                    self.disk.refresh()
+                    refreshed = True
+                    emb = self._lookup(key)
+                if emb is None:
+                    missing[key] = [i]
+                    missing_texts.append(text)
+                else:
+                    result[i] = emb
+            self.misses += len(missing_texts)
+
+        if not missing_texts:
+            return result
+
+        encoded = np.asarray(encode(missing_texts), dtype=np.float32).reshape(len(missing_texts), self.dim)
+        keys = list(missing)
+
+        with self._lock:
+            for key, emb in zip(keys, encoded):
+                result[missing[key]] = emb
+                self._remember(key, emb.copy())
+            if self.disk is not None:
+                self.disk.put_many(keys, encoded)
+
+        return result
@@ -0,0 +1,317 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Protocol, Sequence
+
+import numpy as np
+
+
+ENCODER_BACKENDS = ("sentence_transformers", "torch", "onnx")
+ONNX_META_FILE = "encoder.json"
+
+# Бюджет батча в токенах с учётом паддинга: строк * длина самого длинного текста
+DEFAULT_MAX_BATCH_TOKENS = 4096
+MAX_BATCH_ROWS = 256
+
+
+class Encoder(Protocol):
+    """Энкодер текстов: нормализованные эмбеддинги (len(texts), dim) float32"""
+    dim: int
+    max_seq_length: int
+
+    def encode(
+            self,
+            texts: List[str],
+            batch_size: int = 32,
+            show_progress: bool = False,
+            max_tokens: Optional[int] = None
+    ) -> np.ndarray:
+        ...
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        ...
+
+
+def encoder_cache_id(model_name: str, backend: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Имя для ключей кэшей эмбеддингов: квантованные энкодеры дают другие
+    векторы и не должны делить кэш с исходной моделью.
+    """
+    options = options or {}
+    if backend == "onnx":
+        return f"{model_name}#onnx-{'int8' if options.get('quantize', True) else 'fp32'}"
+    if backend == "torch" and options.get("quantize", False):
+        return f"{model_name}#torch-int8"
+    return model_name
+
+
+def create_encoder(model_name: str, backend: str = "sentence_transformers", options: Optional[Dict[str, Any]] = None) -> Encoder:
+    options = options or {}
+    if backend == "sentence_transformers":
+        return SentenceTransformerEncoder(model_name, **options)
+    if backend == "torch":
+        return TorchEncoder(model_name, **options)
+    if backend == "onnx":
+        return OnnxEncoder(model_name, **options)
+    raise ValueError(f"Неизвестный бэкенд энкодера {backend!r}, доступны {ENCODER_BACKENDS}")
+
+
+def plan_batches(
+        lengths: Sequence[int],
+        max_tokens: Optional[int] = None,
+        batch_size: int = 32,
+        max_rows: int = MAX_BATCH_ROWS
+) -> List[np.ndarray]:
+    """
+    Делит тексты на батчи по возрастанию длины в токенах.
+
+    С max_tokens батч растёт, пока строк * длина последнего (самого длинного)
+    текста не превысит бюджет, так что короткие тексты не дополняются до
+    длины редкого длинного; текст длиннее бюджета идёт отдельным батчем.
+    Без max_tokens батчи по batch_size строк, но тоже отсортированные.
+
+    Returns:
+        список массивов индексов исходных текстов
+    """
+    lengths = np.asarray(lengths)
+    order = np.argsort(lengths, kind="stable")
+    if max_tokens is None:
+        return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+    batches = []
+    start = 0
+    while start < len(order):
+        end = start + 1
+        while end < len(order) and end - start < max_rows and (end - start + 1) * lengths[order[end]] <= max_tokens:
+            end += 1
+        batches.append(order[start:end])
+        start = end
+    return batches
+
+
+class BatchedEncoder:
+    """
+    Общая часть бэкендов: тексты группируются по длине в токенах
+    (plan_batches), результат возвращается в исходном порядке.
+    """
+    dim: int
+    max_seq_length: int
+    tokenizer: Any = None
+
+    def token_lengths(self, texts: List[str]) -> np.ndarray:
+        """Длины после токенизации и усечения до max_seq_length"""
+        if self.tokenizer is None:
+            # без токенизатора - оценка по байтам UTF-8
+            lengths = [len(text.encode("utf-8")) // 4 + 2 for text in texts]
+        else:
+            lengths = [len(ids) for ids in self.tokenizer(
+                texts,
+                add_special_tokens=True,
+                truncation=True,
+                max_length=self.max_seq_length
+            )["input_ids"]]
+        return np.minimum(lengths, self.max_seq_length)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Число токенов без специальных и без усечения (для нарезки текста на окна)"""
+        if self.tokenizer is None:
+            return [-(-len(text.encode("utf-8")) // 4) for text in texts]
+        return [len(ids) for ids in self.tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def encode(
+            self,
+            texts: List[str],
+            batch_size: int = 32,
+            show_progress: bool = False,
+            max_tokens: Optional[int] = None
+    ) -> np.ndarray:
+        embeddings = np.empty((len(texts), self.dim), dtype=np.float32)
+        if not texts:
+            return embeddings
+
+        batches = plan_batches(self.token_lengths(texts), max_tokens, batch_size)
+        if show_progress:
+            from tqdm.auto import tqdm
+            batches = tqdm(batches, desc="Encoding")
+        for idx in batches:
+            embeddings[idx] = self._encode_batch([texts[i] for i in idx])
+        return embeddings
+
+
+class SentenceTransformerEncoder(BatchedEncoder):
+    """SentenceTransformer с настройками по умолчанию; torch импортируется только здесь"""
+
+    def __init__(self, model_name: str, device: Optional[str] = None):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device=device) if device else SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.max_seq_length = self.model.max_seq_length
+        self.tokenizer = self.model.tokenizer
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        embeddings = self.model.encode(
+            texts,
+            batch_size=len(texts),
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), self.dim)
+
+
+class TorchEncoder(SentenceTransformerEncoder):
+    """
+    SentenceTransformer на CPU с явным числом потоков torch, inference_mode
+    и опциональной int8 dynamic quantization Linear-слоёв.
+
+    torch.set_num_threads действует на весь процесс.
+    """
+
+    def __init__(self, model_name: str, num_threads: Optional[int] = None, quantize: bool = False):
+        import torch
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        super().__init__(model_name, device="cpu")
+        self.model.eval()
+        if quantize:
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        import torch
+
+        with torch.inference_mode():
+            return super()._encode_batch(texts)
+
+
+def export_onnx(model_name: str, directory: str, quantize: bool = True) -> str:
+    """
+    Экспортирует трансформер sentence-transformers модели в ONNX (и его
+    int8-версию) в directory; повторный вызов возвращает готовый файл.
+
+    Поддерживаются модели вида Transformer -> Pooling (cls/mean/max) [-> Normalize].
+    """
+    fp32_path = os.path.join(directory, "model.onnx")
+    int8_path = os.path.join(directory, "model_int8.onnx")
+    target = int8_path if quantize else fp32_path
+    if os.path.exists(target):
+        return target
+
+    logger = logging.getLogger(__name__)
+    os.makedirs(directory, exist_ok=True)
+
+    if not os.path.exists(fp32_path):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        st_model = SentenceTransformer(model_name, device="cpu")
+        modules = [type(module).__name__ for module in st_model]
+        if modules[:2] != ["Transformer", "Pooling"] or set(modules[2:]) - {"Normalize"}:
+            raise ValueError(f"ONNX-экспорт не поддерживает модули {modules}")
+        pooling = st_model[1].get_pooling_mode_str()
+        if pooling not in ("cls", "mean", "max"):
+            raise ValueError(f"ONNX-экспорт не поддерживает пулинг {pooling!r}")
+
+        transformer = st_model[0]
+        hf_model = transformer.auto_model.eval()
+        tokenizer = transformer.tokenizer
+        tokenizer.save_pretrained(directory)
+
+        sample = tokenizer(["пример текста для экспорта"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+        class HiddenStates(torch.nn.Module):
+            def forward(self, *inputs):
+                return hf_model(**dict(zip(input_names, inputs))).last_hidden_state
+
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+        logger.info(f"Экспорт {model_name} в ONNX")
+        tmp_path = fp32_path + ".tmp"
+        torch.onnx.export(
+            HiddenStates(),
+            tuple(sample[name] for name in input_names),
+            tmp_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+        with open(os.path.join(directory, ONNX_META_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "model_name": model_name,
+                "pooling": pooling,
+                "max_seq_length": transformer.max_seq_length,
+                "dim": st_model.get_sentence_embedding_dimension(),
+            }, f)
+        os.replace(tmp_path, fp32_path)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info(f"int8-квантование {fp32_path}")
+        tmp_path = int8_path + ".tmp"
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+
+    return target
+
+
+class OnnxEncoder(BatchedEncoder):
+    """
+    Трансформер в ONNX Runtime (по умолчанию int8 dynamic quantization),
+    токенизация через transformers, пулинг и нормализация в NumPy.
+    Модель экспортируется один раз в onnx_dir.
+    """
+
+    def __init__(
+            self,
+            model_name: str,
+            onnx_dir: str = "./vector_cache/onnx",
+            quantize: bool = True,
+            num_threads: Optional[int] = None
+    ):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_hash = hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:16]
+        directory = os.path.join(onnx_dir, model_hash)
+        path = export_onnx(model_name, directory, quantize)
+
+        with open(os.path.join(directory, ONNX_META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.pooling = meta["pooling"]
+        self.max_seq_length = meta["max_seq_length"]
+        self.dim = meta["dim"]
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        elif self.pooling == "max":
+            pooled = np.where(mask[:, :, None] > 0, hidden, -np.inf).max(axis=1)
+        else:
+            pooled = (hidden * mask[:, :, None]).sum(axis=1) / np.maximum(mask.sum(axis=1, keepdims=True), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        feeds = {name: value.astype(np.int64) for name, value in tokens.items() if name in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+        return self._pool(hidden, tokens["attention_mask"].astype(np.float32))
@@ -0,0 +1,199 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "pq")
+
+DEFAULT_INDEX_CONFIG: Dict[str, Any] = {
+    "type": "flat",
+    "use_faiss": True,
+    # ivf / pq
+    "nlist": None,          # по умолчанию ~4*sqrt(n_templates), не больше n_templates/39
+    "nprobe": 16,
+    # hnsw
+    "M": 32,
+    "ef_construction": 80,
+    "ef_search": 64,
+    # pq
+    "pq_m": 16,
+    "pq_nbits": 8,
+}
+
+
+def normalize_index_config(config: Optional[Dict[str, Any]]) -> Tuple[Tuple[str, Any], ...]:
+    """Полная конфигурация индекса в хешируемом виде (ключ общего индекса)"""
+    full = {**DEFAULT_INDEX_CONFIG, **(config or {})}
+    unknown = set(full) - set(DEFAULT_INDEX_CONFIG)
+    if unknown:
+        raise ValueError(f"Неизвестные параметры индекса: {sorted(unknown)}")
+    if full["type"] not in INDEX_TYPES:
+        raise ValueError(f"Тип индекса должен быть одним из {INDEX_TYPES}")
+    return tuple(sorted(full.items()))
+
+
+class NumpyFlatIndex:
+    """Точный поиск по inner product без FAISS"""
+
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = embeddings
+        self.ntotal = len(embeddings)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        sims = queries @ self.embeddings.T
+        k = min(k, self.ntotal)
+        ids = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(sims, ids, axis=1)
+        order = np.argsort(-scores, axis=1)
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+
+class TemplateIndex:
+    """
+    Поиск ближайших шаблонов: flat (точный), IVF, HNSW или IVF-PQ.
+
+    Обученные индексы (всё, кроме flat) сохраняются в cache_dir и при
+    следующем запуске читаются с диска вместо повторного обучения.
+
+    Внутренние id векторов (метки) стабильны между обновлениями и
+    переводятся в номера строк текущего снимка шаблонов при поиске.
+    """
+
+    def __init__(self, embeddings: np.ndarray, config: Tuple[Tuple[str, Any], ...], cache_dir: Optional[str] = None):
+        self.config = dict(config)
+        self.kind = self.config["type"]
+        self.ntotal = len(embeddings)
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.RLock()
+        self._reset_labels(self.ntotal)
+
+        if self.kind == "flat" and not self.config["use_faiss"]:
+            self.index = NumpyFlatIndex(embeddings)
+            return
+
+        import faiss
+
+        path = self._cache_path(embeddings, cache_dir) if self.kind != "flat" else None
+        if path is not None and os.path.exists(path):
+            self.index = faiss.read_index(path)
+        else:
+            self.index = self._build(faiss, embeddings)
+            if path is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                faiss.write_index(self.index, path)
+        self._apply_search_params(faiss)
+
+    def _cache_path(self, embeddings: np.ndarray, cache_dir: Optional[str]) -> Optional[str]:
+        if cache_dir is None:
+            return None
+        digest = hashlib.sha256(embeddings.tobytes())
+        digest.update(json.dumps(self.config, sort_keys=True).encode("utf-8"))
+        return os.path.join(cache_dir, f"index_{self.kind}_{digest.hexdigest()[:16]}.faiss")
+
+    def _build(self, faiss, embeddings: np.ndarray):
+        n, dim = embeddings.shape
+        metric = faiss.METRIC_INNER_PRODUCT
+
+        if self.kind == "flat":
+            index = faiss.IndexFlatIP(dim)
+        elif self.kind == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, self.config["M"], metric)
+            index.hnsw.efConstruction = self.config["ef_construction"]
+        else:
+            # FAISS нужно не меньше ~39 обучающих точек на центроид
+            nlist = self.config["nlist"] or max(1, min(int(4 * np.sqrt(n)), n // 39))
+            nlist = min(nlist, n)
+            quantizer = faiss.IndexFlatIP(dim)
+            if self.kind == "ivf":
+                index = faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+            else:
+                pq_m = self.config["pq_m"]
+                if dim % pq_m:
+                    raise ValueError(f"pq_m={pq_m} должно делить размерность эмбеддингов {dim}")
+                # для обучения кодбуков нужно не меньше 2**nbits точек
+                nbits = min(self.config["pq_nbits"], max(1, int(np.log2(n))))
+                index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, nbits, metric)
+            self.logger.info(f"Обучение индекса {self.kind} на {n} шаблонах")
+            index.train(embeddings)
+
+        index.add(embeddings)
+        return index
+
+    def _apply_search_params(self, faiss) -> None:
+        if self.kind in ("ivf", "pq"):
+            faiss.extract_index_ivf(self.index).nprobe = self.config["nprobe"]
+        elif self.kind == "hnsw":
+            self.index.hnsw.efSearch = self.config["ef_search"]
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            (scores, ids) формы (batch, k); отсутствующие соседи имеют id -1
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        with self.lock:
+            scores, labels = self.index.search(queries, min(k, self.ntotal))
+            ids = np.where(labels >= 0, self._positions[labels], -1)
+        return scores, ids
+
+    def _set_labels(self, labels: np.ndarray) -> None:
+        self._labels = labels
+        self._positions = np.full(self._next_label, -1, dtype=np.intp)
+        self._positions[labels] = np.arange(len(labels))
+
+    def _reset_labels(self, n: int) -> None:
+        self._next_label = n
+        self._set_labels(np.arange(n, dtype=np.int64))
+
+    def update(self, embeddings: np.ndarray, source: np.ndarray) -> None:
+        """
+        Приводит индекс к новому набору шаблонов без переобучения: IVF/PQ
+        удаляют и дописывают векторы, HNSW дописывает (при удалении граф
+        строится заново), flat пересобирается копированием векторов.
+
+        Args:
+            embeddings: эмбеддинги нового снимка шаблонов
+            source: для каждой строки нового снимка - номер строки старого, -1 для новых шаблонов
+        """
+        with self.lock:
+            kept = source >= 0
+            kept_labels = self._labels[source[kept]]
+            removed = np.setdiff1d(self._labels, kept_labels)
+            new_rows = np.flatnonzero(~kept)
+            self.ntotal = len(embeddings)
+
+            if isinstance(self.index, NumpyFlatIndex):
+                self.index = NumpyFlatIndex(embeddings)
+                self._reset_labels(self.ntotal)
+                return
+
+            import faiss
+
+            if self.kind == "flat" or (self.kind == "hnsw" and removed.size):
+                self.logger.info(f"Перестроение индекса {self.kind} на {self.ntotal} шаблонах")
+                self.index = self._build(faiss, embeddings)
+                self._apply_search_params(faiss)
+                self._reset_labels(self.ntotal)
+                return
+
+            if removed.size:
+                self.index.remove_ids(faiss.IDSelectorBatch(removed.astype(np.int64)))
+            new_labels = np.arange(self._next_label, self._next_label + len(new_rows), dtype=np.int64)
+            if len(new_rows):
+                vectors = np.ascontiguousarray(embeddings[new_rows], dtype=np.float32)
+                if self.kind == "hnsw":
+                    # HNSW нумерует векторы подряд, номера совпадают с new_labels
+                    self.index.add(vectors)
+                else:
+                    self.index.add_with_ids(vectors, new_labels)
+            self._next_label += len(new_rows)
+
+            labels = np.empty(self.ntotal, dtype=np.int64)
+            labels[kept] = kept_labels
+            labels[new_rows] = new_labels
+            self._set_labels(labels)
@@ -0,0 +1,85 @@
+import os
+from pathlib import Path
+from typing import Any, BinaryIO, Tuple, Union
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+
+
+class LinearScorer:
+    """
+    Логистическая регрессия без sklearn: коэффициенты и intercept из .npz.
+
+    Повторяет интерфейс predict_proba бинарного LogisticRegression, а
+    score_batch считает вероятность и log-odds оценку MLGuard для всего
+    батча одним выражением.
+    """
+
+    def __init__(self, coef: np.ndarray, intercept: float, classes: np.ndarray):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(intercept)
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = len(self.coef)
+
+    def decision_function(self, x) -> np.ndarray:
+        return np.asarray(x, dtype=np.float64) @ self.coef + self.intercept
+
+    def predict_proba(self, x) -> np.ndarray:
+        p = self._sigmoid(self.decision_function(x))
+        return np.column_stack((1.0 - p, p))
+
+    def score_batch(self, x) -> Tuple[np.ndarray, np.ndarray]:
+        """(вероятность атаки, -log(1 - p + 1e-6)) для каждой строки x"""
+        p = self._sigmoid(self.decision_function(x))
+        return p, -np.log(1.0 - p + 1e-6)
+
+    @staticmethod
+    def _sigmoid(z: np.ndarray) -> np.ndarray:
+        # та же формула, что и в sklearn (expit), без переполнения exp для больших |z|
+        e = np.exp(-np.abs(z))
+        return np.where(z >= 0, 1.0 / (1.0 + e), e / (1.0 + e))
+
+    @classmethod
+    def load(cls, file: Union[str, Path, BinaryIO]) -> "LinearScorer":
+        with np.load(file, allow_pickle=False) as data:
+            version = int(data["format_version"])
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Неподдерживаемая версия формата линейной модели: {version}")
+            return cls(data["coef"], float(data["intercept"]), data["classes"])
+
+
+def export_linear_model(model: Any, path: Union[str, Path]) -> bool:
+    """
+    Сохраняет бинарную линейную модель sklearn в .npz для LinearScorer.
+
+    Returns:
+        False, если модель не линейная бинарная (тогда обслуживается из pickle)
+    """
+    coef = getattr(model, "coef_", None)
+    intercept = getattr(model, "intercept_", None)
+    classes = getattr(model, "classes_", None)
+    if coef is None or intercept is None or classes is None or len(classes) != 2 or np.shape(coef)[0] != 1:
+        return False
+    if np.asarray(classes).dtype.hasobject or not callable(getattr(model, "predict_proba", None)):
+        return False
+
+    # экспортируем, только если скорер воспроизводит predict_proba модели
+    scorer = LinearScorer(coef, np.ravel(intercept)[0], classes)
+    probe = np.random.default_rng(0).normal(size=(8, scorer.n_features_in_))
+    if not np.allclose(model.predict_proba(probe), scorer.predict_proba(probe), rtol=1e-9, atol=1e-12):
+        return False
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            format_version=np.int64(FORMAT_VERSION),
+            coef=scorer.coef,
+            intercept=np.float64(scorer.intercept),
+            classes=scorer.classes_,
+        )
+    os.replace(tmp_path, path)
+    return True
@@ -1,10 +1,13 @@
 from dataclasses import dataclass
-import math
-import pickle
 from pathlib import Path
+from typing import Optional
 
+import numpy as np
+
+from secure_prompt.core import metrics
 from secure_prompt.core.scoring import ML_JAIL_SCORE
 from secure_prompt.core.base import BaseResult
+from secure_prompt.guards.resources import load_model, resolve_model_path
 from ML.dataset import FeatureExtractor
 
 
@@ -16,7 +19,7 @@ MODEL_PATH = Path(__file__).resolve().parents[2] / "ml" / "model.pkl"
 class MLResult(BaseResult):
     probability: float
     score: float
-    features: list[float]
+    features: np.ndarray  # строка матрицы признаков батча (view, без копии)
 
 
 class MLGuard:
@@ -24,22 +27,33 @@ class MLGuard:
         self.use_vector = use_vector
         if use_vector:
             model_path = MODEL_PATH_VECTOR
-        with open(model_path, "rb") as f:
-            self.model = pickle.load(f)
+        self.model_path = resolve_model_path(model_path)
+        self.model = load_model(str(self.model_path))
         self.threshold = threshold
-        self.feature_extractor = FeatureExtractor()
+        # VectorFeatureExtractor создаётся только при первом запросе векторных признаков
+        self.feature_extractor = FeatureExtractor(init_vector=False)
 
-    def predict(self, x: list[list[float]]) -> list[list[float]]:
+    def predict(self, x: np.ndarray) -> np.ndarray:
         return self.model.predict_proba(x)
 
-    def detect(self, texts: list[str]) -> list[MLResult]:
-        feats = self.feature_extractor.extract_features(texts, self.use_vector)
-        x = feats
-        probs = self.predict(x)
+    def score(self, x) -> tuple[np.ndarray, np.ndarray]:
+        """Вероятность атаки и оценка -log(1 - p + 1e-6) для батча признаков"""
+        score_batch = getattr(self.model, "score_batch", None)
+        if score_batch is not None:
+            return score_batch(x)
+        probability = np.asarray(self.predict(x))[:, 1]
+        return probability, -np.log(1 - probability + 1e-6)
+
+    def detect(self, texts: list[str], static: Optional[np.ndarray] = None) -> list[MLResult]:
+        """static: готовые статические признаки texts (строки), пересчитываются только векторные"""
+        with metrics.stage("ml_guard.features", len(texts)):
+            feats = self.feature_extractor.extract_features(texts, self.use_vector, static)
+        with metrics.stage("ml_guard.predict", len(texts)):
+            probabilities, scores = self.score(feats)
         return [MLResult(
-            is_jailbreak=-math.log(1 - prob[1] + 1e-6) >= self.threshold,
+            is_jailbreak=score >= self.threshold,
             rules=None,
-            probability=prob[1],
-            score=-math.log(1 - prob[1] + 1e-6),
+            probability=probability,
+            score=score,
             features=feats[i]
-        ) for i, prob in enumerate(probs)]
+        ) for i, (probability, score) in enumerate(zip(probabilities.tolist(), scores.tolist()))]
@@ -0,0 +1,108 @@
+import io
+import os
+import pickle
+import logging
+import threading
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+from secure_prompt.guards.embedding_cache import EmbeddingCache
+from secure_prompt.guards.encoders import DEFAULT_MAX_BATCH_TOKENS, Encoder, create_encoder, encoder_cache_id
+from secure_prompt.guards.linear_model import LinearScorer
+from secure_prompt.guards.templates import TemplateBank, TemplateKey
+
+
+def _shared(loader: Callable) -> Callable:
+    """
+    Превращает загрузчик в ленивый синглтон на процесс: ресурс создаётся
+    при первом запросе и переиспользуется для тех же аргументов.
+    """
+    cache = {}
+    lock = threading.Lock()
+
+    @wraps(loader)
+    def get(*key):
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        with lock:
+            if key not in cache:
+                cache[key] = loader(*key)
+            return cache[key]
+
+    get.cache = cache
+    return get
+
+
+@_shared
+def get_encoder(
+        model_name: str,
+        backend: str = "sentence_transformers",
+        options: Tuple[Tuple[str, Any], ...] = ()
+) -> Encoder:
+    """Энкодер выбранного бэкенда; options - отсортированные пары (имя, значение)"""
+    return create_encoder(model_name, backend, dict(options))
+
+
+@_shared
+def get_template_bank(
+        model_name: str,
+        cache_dir: str,
+        templates: Tuple[TemplateKey, ...],
+        backend: str = "sentence_transformers",
+        options: Tuple[Tuple[str, Any], ...] = ()
+) -> TemplateBank:
+    def encode(texts):
+        return get_encoder(model_name, backend, options).encode(texts, max_tokens=DEFAULT_MAX_BATCH_TOKENS)
+
+    # хранилище ключуется энкодером: эмбеддинги квантованной модели хранятся отдельно
+    return TemplateBank.load(templates, encode, cache_dir, encoder_cache_id(model_name, backend, dict(options)))
+
+
+@_shared
+def get_embedding_cache(model_name: str, dim: int, max_entries: int, disk_dir: Optional[str]) -> EmbeddingCache:
+    return EmbeddingCache(model_name, dim, max_entries, disk_dir)
+
+
+def resolve_model_path(model_path: Path) -> Path:
+    """
+    Экспортированная линейная модель (.npz рядом с .pkl) загружается без
+    sklearn; pickle используется, если .npz нет или он старше pickle.
+    """
+    model_path = Path(model_path).resolve()
+    npz_path = model_path.with_suffix(".npz")
+    if model_path.suffix != ".npz" and npz_path.exists():
+        if not model_path.exists() or npz_path.stat().st_mtime_ns >= model_path.stat().st_mtime_ns:
+            return npz_path
+    return model_path
+
+
+def parse_model(data: bytes, suffix: str):
+    """Модель из содержимого файла: .npz - LinearScorer без sklearn, иначе pickle"""
+    if suffix == ".npz":
+        return LinearScorer.load(io.BytesIO(data))
+    # pickle исполняет код из файла: остаётся только для моделей, которые нельзя экспортировать в .npz
+    logging.getLogger(__name__).warning("Модель загружается из pickle; для линейных моделей используйте .npz")
+    return pickle.loads(data)
+
+
+def load_model(path: str):
+    """
+    Обученная модель: LinearScorer из .npz или sklearn модель из pickle.
+    Кэш ключуется версией файла (mtime и размер): после переобучения
+    (train.py атомарно заменяет файл) новые гарды получают новую модель,
+    а не ту, что была загружена первой.
+    """
+    stat = os.stat(path)
+    return _load_model_file(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+@_shared
+def _load_model_file(path: str, mtime_ns: int, size: int):
+    # прежние версии того же файла больше не нужны новым гардам
+    for key in [key for key in _load_model_file.cache if key[0] == path]:
+        del _load_model_file.cache[key]
+    path = Path(path)
+    return parse_model(path.read_bytes(), path.suffix)
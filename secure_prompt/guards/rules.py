@@ -0,0 +1,154 @@
+"""
+Предварительная проверка правилами перед MLGuard.
+
+Все правила сканирования (block и flag) собраны в одно регулярное
+выражение с именованной группой на правило, так что текст проходится
+один раз. Совпадение ищется только с начала слова или со знака
+пунктуации: остальные позиции отсекаются одной проверкой, а не перебором
+всех правил. Allow-правила - белый список: они должны совпасть со всем
+текстом целиком.
+
+Файл правил - JSON-список объектов {"id", "pattern", "action"}, где action
+одно из block / allow / flag. Шаблоны применяются к тексту в нижнем
+регистре и должны быть записаны в нижнем регистре (re.IGNORECASE
+замедляет общее выражение в несколько раз); без групп с именами и
+обратных ссылок.
+"""
+import os
+import re
+import json
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from secure_prompt.audit.models import RuleHit
+from secure_prompt.core.base import BaseResult
+
+
+RULE_ACTIONS = ("block", "allow", "flag")
+RULES_PATH = Path(os.getenv("RULES_PATH") or Path(__file__).resolve().parent / "rules.json")
+
+
+@dataclass(frozen=True)
+class Rule:
+    id: str
+    pattern: str
+    action: str = "flag"
+
+
+@dataclass
+class RuleResult(BaseResult):
+    verdict: Optional[str]  # BLOCK / ALLOW или None, если нужна проверка моделью
+
+
+def load_rules(path: Path = RULES_PATH) -> List[Rule]:
+    with open(path, encoding="utf-8") as f:
+        return [Rule(item["id"], item["pattern"], item.get("action", "flag")) for item in json.load(f)]
+
+
+def lexeme_rules(lexemes: Dict[str, Dict[str, Iterable[str]]]) -> List[Rule]:
+    """flag-правило на каждую категорию словаря: lexeme:<словарь>:<категория>"""
+    rules = []
+    for vocab, categories in lexemes.items():
+        for category, words in categories.items():
+            words = sorted({word.lower() for word in words}, key=len, reverse=True)
+            if words:
+                alternation = "|".join(re.escape(word) for word in words)
+                rules.append(Rule(f"lexeme:{vocab}:{category}", rf"(?<!\w)(?:{alternation})(?!\w)", "flag"))
+    return rules
+
+
+class RuleEngine:
+    """
+    Политика:
+        - совпало block-правило -> BLOCK без вызова модели;
+        - меньше min_length непробельных символов -> ALLOW;
+        - текст целиком совпал с allow-правилом и нет flag-совпадений -> ALLOW;
+        - иначе решает модель, совпавшие flag-правила сохраняются в rules.
+    """
+
+    def __init__(self, rules: Sequence[Rule], min_length: int = 3):
+        ids = [rule.id for rule in rules]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Идентификаторы правил должны быть уникальными")
+        for rule in rules:
+            if rule.action not in RULE_ACTIONS:
+                raise ValueError(f"Правило {rule.id}: action должен быть одним из {RULE_ACTIONS}")
+            try:
+                compiled = re.compile(rule.pattern)
+            except re.error as e:
+                raise ValueError(f"Правило {rule.id}: некорректный шаблон: {e}") from None
+            if compiled.groupindex:
+                raise ValueError(f"Правило {rule.id}: именованные группы не поддерживаются")
+            literal = re.sub(r"\\.", "", rule.pattern)  # экранированные классы вроде \W не в счёт
+            if literal != literal.lower():
+                raise ValueError(f"Правило {rule.id}: шаблон должен быть в нижнем регистре")
+
+        self.rules = list(rules)
+        self.min_length = min_length
+        self._by_id = {rule.id: rule for rule in self.rules}
+
+        # block раньше flag: при совпадении в одной позиции побеждает block
+        scan = sorted((r for r in self.rules if r.action != "allow"), key=lambda r: r.action != "block")
+        self._groups = {f"r{i}": rule for i, rule in enumerate(scan)}
+        alternatives = "|".join(f"(?P<{name}>{rule.pattern})" for name, rule in self._groups.items())
+        self._scan = re.compile(rf"(?:(?<!\w)(?=\w)|(?=[^\w\s]))(?:{alternatives})") if scan else None
+        allow = [rule.pattern for rule in self.rules if rule.action == "allow"]
+        self._allow = re.compile("|".join(f"(?:{p})" for p in allow)) if allow else None
+
+        self.digest = hashlib.sha256(json.dumps(
+            [(r.id, r.pattern, r.action) for r in self.rules] + [min_length]
+        ).encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def from_config(cls, path: Optional[Path] = RULES_PATH, lexemes: Optional[Dict] = None, min_length: int = 3) -> "RuleEngine":
+        """Правила из файла и flag-правила словаря LEXEMES"""
+        if lexemes is None:
+            from data.lexical import LEXEMES
+            lexemes = LEXEMES
+        rules = load_rules(path) if path is not None else []
+        return cls(rules + lexeme_rules(lexemes), min_length)
+
+    def match(self, text: str, with_text: bool = False) -> List[tuple]:
+        """
+        Совпадения по всем правилам сканирования за один проход:
+        (rule_id, (start, end)), с with_text - (rule_id, (start, end), фрагмент).
+        Если lower() меняет длину строки (İ), позиции относятся к text.lower()
+        """
+        if self._scan is None:
+            return []
+        lowered = text.lower()
+        matches = self._scan.finditer(lowered)
+        if not with_text:
+            return [(self._groups[m.lastgroup].id, m.span()) for m in matches]
+        source = text if len(lowered) == len(text) else lowered
+        return [(self._groups[m.lastgroup].id, m.span(), source[m.start():m.end()]) for m in matches]
+
+    def check(self, *variants: str) -> RuleResult:
+        """
+        Проверяет один запрос в нескольких вариантах (исходный и нормализованный):
+        BLOCK по любому варианту, ALLOW только если его дают все варианты.
+        Совпадения правила берутся из первого варианта, где оно сработало,
+        и позиции относятся к этому варианту.
+        """
+        unique = {}
+        for text in variants:
+            unique.setdefault(text.lower(), text)
+        hits: List[RuleHit] = []
+        for text in unique.values():
+            seen = {rule_id for rule_id, _ in hits}
+            hits.extend(hit for hit in self.match(text) if hit[0] not in seen)
+        variants = tuple(unique.values())
+        blocked = any(self._by_id[rule_id].action == "block" for rule_id, _ in hits)
+        if blocked:
+            return RuleResult(is_jailbreak=True, rules=hits, verdict="BLOCK")
+        if not hits and all(self._allows(text) for text in variants):
+            return RuleResult(is_jailbreak=False, rules=hits, verdict="ALLOW")
+        return RuleResult(is_jailbreak=None, rules=hits, verdict=None)
+
+    def _allows(self, text: str) -> bool:
+        stripped = text.strip()
+        if len("".join(stripped.split())) < self.min_length:
+            return True
+        return self._allow is not None and self._allow.fullmatch(stripped.lower()) is not None
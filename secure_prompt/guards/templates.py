@@ -0,0 +1,407 @@
+import os
+import glob
+import json
+import hashlib
+import logging
+import shutil
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from secure_prompt.guards.artifacts import read_artifact, write_artifact
+from secure_prompt.guards.embedding_cache import DiskEmbeddingStore, content_key
+from secure_prompt.guards.index import TemplateIndex
+
+
+# Хранилище v5 адресуется по содержимому шаблонов; старый template_embeddings_v4.pkl
+# переносится конвертером secure_prompt.guards.artifacts
+STORE_DIR = "template_store_v5"
+
+# (text, category, weight)
+TemplateKey = Tuple[str, str, float]
+
+
+def templates_key(templates: Sequence[dict]) -> Tuple[TemplateKey, ...]:
+    """Хешируемое представление списка шаблонов (ключ для общих ресурсов)"""
+    return tuple(
+        (t["text"], t.get("category", "unknown"), t.get("weight", 1.0))
+        for t in templates
+    )
+
+
+def entries_digest(entries: Sequence[TemplateKey]) -> str:
+    """Хеш содержимого (тексты, категории, веса) для сверки версий между воркерами"""
+    payload = json.dumps([list(entry) for entry in entries], ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+class TemplateStore:
+    """
+    Эмбеддинги шаблонов по content hash (sha256 имени модели и текста).
+
+    Кодируются только тексты, которых ещё нет в хранилище. Файл append-only
+    и общий для всех процессов с тем же cache_dir, поэтому воркер подхватывает
+    эмбеддинги, уже посчитанные другим воркером.
+
+    Собранные библиотеки дополнительно сохраняются снимками-артефактами
+    (embeddings.npy + meta.json), которые воркеры отображают в память.
+    Хранятся keep_snapshots последних использованных снимков; более старые
+    удаляются не раньше, чем через snapshot_grace секунд после последнего
+    использования, чтобы воркер, который ещё загружает старый снимок, его нашёл.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, keep_snapshots: int = 5, snapshot_grace: float = 600.0):
+        self.model_name = model_name
+        model_hash = hashlib.sha256(str(model_name).encode("utf-8")).hexdigest()[:16]
+        self.directory = os.path.join(cache_dir, STORE_DIR, model_hash)
+        self.keep_snapshots = keep_snapshots
+        self.snapshot_grace = snapshot_grace
+        self.disk: Optional[DiskEmbeddingStore] = None
+        self.encoded = 0
+        self._opened = False
+        self._lock = threading.Lock()
+
+    def _open(self) -> None:
+        # Размерность заранее неизвестна: берём её из имени уже существующего файла
+        self._opened = True
+        existing = glob.glob(os.path.join(self.directory, "embeddings_*d.bin"))
+        if existing:
+            dim = int(os.path.basename(existing[0])[len("embeddings_"):-len("d.bin")])
+            self.disk = DiskEmbeddingStore(self.directory, dim)
+
+    def _lookup(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        if not self._opened:
+            self._open()
+        if self.disk is None:
+            return [None] * len(keys)
+        found = [self.disk.get(key) for key in keys]
+        if any(emb is None for emb in found):
+            self.disk.refresh()
+            found = [emb if emb is not None else self.disk.get(key) for emb, key in zip(found, keys)]
+        return found
+
+    def embed(self, texts: Sequence[str], encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Эмбеддинги текстов (len(texts), dim); encode вызывается только для новых текстов"""
+        with self._lock:
+            found = self._lookup([content_key(self.model_name, text) for text in texts])
+            missing = list(dict.fromkeys(text for text, emb in zip(texts, found) if emb is None))
+            if missing:
+                encoded = np.asarray(encode(missing), dtype=np.float32).reshape(len(missing), -1)
+                if self.disk is None:
+                    self.disk = DiskEmbeddingStore(self.directory, encoded.shape[1])
+                self.disk.put_many([content_key(self.model_name, text) for text in missing], encoded)
+                self.encoded += len(missing)
+                fresh = dict(zip(missing, encoded))
+                found = [fresh[text] if emb is None else emb for text, emb in zip(texts, found)]
+
+        if not found:
+            return np.empty((0, self.disk.dim if self.disk else 0), dtype=np.float32)
+        return np.stack(found).astype(np.float32, copy=False)
+
+    # ---------- SNAPSHOTS ----------
+
+    def _snapshot_path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"snapshot_{digest}")
+
+    def load_snapshot(self, entries: Sequence[TemplateKey], version: int = 0) -> Optional["TemplateSet"]:
+        """Снимок с эмбеддингами через mmap или None, если для этих шаблонов его ещё нет"""
+        entries = [tuple(entry) for entry in entries]
+        path = self._snapshot_path(entries_digest(entries))
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return None
+        arrays, meta = read_artifact(path)
+        stored = [(text, category, weight) for text, category, weight in zip(meta["texts"], meta["categories"], meta["weights"])]
+        if meta["model_name"] != self.model_name or stored != entries:
+            return None
+        try:
+            # время использования: по нему _prune_snapshots выбирает, что удалить
+            os.utime(path)
+        except OSError:
+            pass
+        return TemplateSet(
+            embeddings=arrays["embeddings"],
+            texts=meta["texts"],
+            categories=meta["categories"],
+            weights=meta["weights"],
+            version=version,
+        )
+
+    def save_snapshot(self, state: "TemplateSet") -> "TemplateSet":
+        """Сохраняет снимок и возвращает его копию, отображённую в память"""
+        os.makedirs(self.directory, exist_ok=True)
+        write_artifact(self._snapshot_path(state.digest), {"embeddings": state.embeddings}, {
+            "kind": "templates",
+            "model_name": self.model_name,
+            "dim": int(state.embeddings.shape[1]),
+            "texts": state.texts,
+            "categories": state.categories,
+            "weights": state.weights,
+        })
+        self._prune_snapshots()
+        return self.load_snapshot(state.entries, state.version) or state
+
+    def _prune_snapshots(self) -> None:
+        # Отображённые в память снимки остаются доступны читателям и после удаления
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "snapshot_*")):
+            if ".tmp-" in path:
+                continue
+            try:
+                snapshots.append((os.stat(path).st_mtime, path))
+            except FileNotFoundError:
+                pass  # уже удалён другим процессом
+        snapshots.sort()
+        expired = time.time() - self.snapshot_grace
+        for mtime, path in snapshots[:max(len(snapshots) - self.keep_snapshots, 0)]:
+            if mtime < expired:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+@dataclass
+class TemplateSet:
+    """
+    Снимок библиотеки шаблонов и производные массивы для сборки признаков.
+    Не изменяется после создания: обновление библиотеки создаёт новый снимок.
+    """
+    embeddings: np.ndarray
+    texts: List[str]
+    categories: List[str]
+    weights: List[float]
+    version: int = 0
+
+    unique_categories: List[str] = field(init=False)
+    weight_array: np.ndarray = field(init=False)
+    category_index: np.ndarray = field(init=False)
+    category_matrix: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        self.embeddings = np.ascontiguousarray(self.embeddings, dtype=np.float32)
+        # Уникальные категории для консистентности
+        self.unique_categories = sorted(set(self.categories))
+        self.weight_array = np.asarray(self.weights, dtype=np.float32)
+
+        # (n_templates x n_categories): 1/|cat| для шаблонов категории, иначе 0,
+        # так что weighted @ matrix даёт среднее по каждой категории
+        cat_pos = {cat: j for j, cat in enumerate(self.unique_categories)}
+        self.category_index = np.fromiter((cat_pos[cat] for cat in self.categories), dtype=np.intp, count=len(self.categories))
+        matrix = np.zeros((len(self.categories), len(self.unique_categories)), dtype=np.float32)
+        matrix[np.arange(len(self.categories)), self.category_index] = 1.0
+        counts = matrix.sum(axis=0)
+        matrix /= np.maximum(counts, 1.0)
+        self.category_matrix = matrix
+
+    @property
+    def entries(self) -> List[TemplateKey]:
+        return list(zip(self.texts, self.categories, self.weights))
+
+    @cached_property
+    def digest(self) -> str:
+        """Хеш содержимого (тексты, категории, веса) для сверки версий между воркерами"""
+        return entries_digest(self.entries)
+
+
+class TemplateBank:
+    """
+    Библиотека шаблонов, общая для всех экстракторов: текущий снимок (state),
+    хранилище эмбеддингов и построенные индексы поиска.
+
+    Шаблоны можно добавлять и удалять на лету: кодируются только новые тексты,
+    индексы обновляются инкрементально, после чего снимок подменяется целиком,
+    так что читатели всегда видят согласованные массивы.
+    """
+
+    def __init__(
+            self,
+            state: TemplateSet,
+            store: Optional[TemplateStore] = None,
+            encode: Optional[Callable[[List[str]], np.ndarray]] = None,
+            cache_dir: Optional[str] = None
+    ):
+        self.state = state
+        self.store = store
+        self.cache_dir = cache_dir
+        self.logger = logging.getLogger(__name__)
+        self._encode = encode
+        self._indexes: Dict[Tuple[Tuple[str, Any], ...], TemplateIndex] = {}
+        self._index_lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        # Раскладки признаков обслуживаемых моделей: (столбцы по шаблонам, столбцы по категориям)
+        self._pinned_layouts: set = set()
+
+    @property
+    def version(self) -> int:
+        return self.state.version
+
+    def pin_layout(self, template_columns: bool, category_columns: bool) -> None:
+        """
+        Фиксирует столбцы признаков, на которых обучена модель: с template_columns
+        нельзя менять список шаблонов, с category_columns - набор категорий.
+        Такие обновления отклоняются с ValueError, изменение весов разрешено.
+        """
+        with self._update_lock:
+            self._pinned_layouts.add((bool(template_columns), bool(category_columns)))
+
+    def _check_layout(self, state: TemplateSet, entries: List[TemplateKey]) -> None:
+        texts = [text for text, _, _ in entries]
+        categories = sorted({category for _, category, _ in entries})
+        for template_columns, category_columns in self._pinned_layouts:
+            if template_columns and texts != state.texts:
+                raise ValueError(
+                    "Обновление меняет список шаблонов, а модель использует признаки по каждому шаблону; "
+                    "обновления на лету возможны с search_k или без include_template_scores"
+                )
+            if category_columns and categories != state.unique_categories:
+                raise ValueError(
+                    f"Обновление меняет набор категорий {state.unique_categories} -> {categories}, "
+                    "а модель использует признаки по категориям"
+                )
+
+    def get_index(self, config: Tuple[Tuple[str, Any], ...]) -> TemplateIndex:
+        """Индекс поиска по шаблонам, строится при первом обращении и общий для всех экстракторов"""
+        with self._index_lock:
+            if config not in self._indexes:
+                self._indexes[config] = TemplateIndex(self.state.embeddings, config, self.cache_dir)
+            return self._indexes[config]
+
+    def search(
+            self,
+            config: Tuple[Tuple[str, Any], ...],
+            queries: np.ndarray,
+            k: int
+    ) -> Tuple[TemplateSet, np.ndarray, np.ndarray]:
+        """
+        Поиск k ближайших шаблонов.
+
+        Returns:
+            (state, scores, ids): ids указывают на строки возвращённого снимка
+        """
+        index = self.get_index(config)
+        with index.lock:
+            state = self.state
+            scores, ids = index.search(queries, k)
+        return state, scores, ids
+
+    # ---------- UPDATES ----------
+
+    def add_templates(self, templates: Sequence[TemplateKey]) -> TemplateSet:
+        """
+        Добавляет шаблоны в конец библиотеки. Для уже известного текста
+        обновляются категория и вес, эмбеддинг не пересчитывается.
+        """
+        with self._update_lock:
+            entries = self.state.entries
+            positions = {text: i for i, (text, _, _) in reversed(list(enumerate(entries)))}
+            for text, category, weight in templates:
+                if text in positions:
+                    entries[positions[text]] = (text, category, weight)
+                else:
+                    positions[text] = len(entries)
+                    entries.append((text, category, weight))
+            return self._apply(entries)
+
+    def remove_templates(self, texts: Iterable[str]) -> TemplateSet:
+        """Удаляет шаблоны с указанными текстами"""
+        removed = set(texts)
+        with self._update_lock:
+            return self._apply([entry for entry in self.state.entries if entry[0] not in removed])
+
+    def sync_templates(self, templates: Sequence[TemplateKey]) -> TemplateSet:
+        """
+        Приводит библиотеку к переданному списку (новая выгрузка шаблонов):
+        порядок шаблонов совпадает с загрузкой этого списка с нуля.
+        """
+        with self._update_lock:
+            return self._apply([(text, category, weight) for text, category, weight in templates])
+
+    def _apply(self, entries: List[TemplateKey]) -> TemplateSet:
+        """Собирает новый снимок из entries и обновляет индексы; вызывается под _update_lock"""
+        state = self.state
+        if entries == state.entries:
+            return state
+        self._check_layout(state, entries)
+
+        # Для каждой новой строки - строка старого снимка с тем же текстом (или -1)
+        old_rows = defaultdict(deque)
+        for row, text in enumerate(state.texts):
+            old_rows[text].append(row)
+        source = np.array(
+            [old_rows[text].popleft() if old_rows.get(text) else -1 for text, _, _ in entries],
+            dtype=np.intp
+        )
+
+        new_rows = np.flatnonzero(source < 0)
+        embeddings = np.empty((len(entries), state.embeddings.shape[1]), dtype=np.float32)
+        embeddings[source >= 0] = state.embeddings[source[source >= 0]]
+        if len(new_rows):
+            if self._encode is None or self.store is None:
+                raise RuntimeError("Банк шаблонов создан без энкодера: добавление новых шаблонов невозможно")
+            embeddings[new_rows] = self.store.embed([entries[row][0] for row in new_rows], self._encode)
+
+        new_state = TemplateSet(
+            embeddings=embeddings,
+            texts=[text for text, _, _ in entries],
+            categories=[category for _, category, _ in entries],
+            weights=[weight for _, _, weight in entries],
+            version=state.version + 1,
+        )
+        if self.store is not None:
+            new_state = self.store.save_snapshot(new_state)
+
+        # Держим блокировки всех индексов до подмены снимка, чтобы поиск
+        # не вернул id нового индекса вместе со старым снимком
+        with self._index_lock, ExitStack() as stack:
+            for index in self._indexes.values():
+                stack.enter_context(index.lock)
+            for index in self._indexes.values():
+                index.update(new_state.embeddings, source)
+            self.state = new_state
+
+        n_removed = len(state.texts) - int((source >= 0).sum())
+        self.logger.info(
+            f"Шаблоны обновлены до версии {new_state.version}: "
+            f"+{len(new_rows)} -{n_removed}, всего {len(entries)}"
+        )
+        return new_state
+
+    @classmethod
+    def load(
+            cls,
+            templates: Sequence[TemplateKey],
+            encode: Callable[[List[str]], np.ndarray],
+            cache_dir: str,
+            model_name: str
+    ) -> "TemplateBank":
+        """
+        Загружает эмбеддинги шаблонов: готовый снимок отображается в память,
+        иначе библиотека собирается из хранилища (кодируются только
+        отсутствующие тексты) и сохраняется снимком для остальных воркеров.
+
+        encode вызывается только для новых текстов, так что энкодер
+        не загружается, если все эмбеддинги уже посчитаны.
+        """
+        logger = logging.getLogger(__name__)
+        store = TemplateStore(cache_dir, model_name)
+
+        state = store.load_snapshot(templates)
+        if state is None:
+            # Извлекаем текст, категорию и вес из шаблонов
+            texts = [t[0] for t in templates]
+            categories = [t[1] for t in templates]
+            weights = [t[2] for t in templates]
+
+            state = store.save_snapshot(TemplateSet(
+                embeddings=store.embed(texts, encode),
+                texts=texts,
+                categories=categories,
+                weights=weights,
+            ))
+        bank = cls(state, store, encode, cache_dir)
+
+        logger.info(f"Загружено {len(state.texts)} шаблонов для извлечения признаков (закодировано {store.encoded})")
+        return bank
@@ -1,14 +1,18 @@
 import os
-import pickle
 import logging
 import numpy as np
 from dataclasses import dataclass
-from typing import Dict, Any, Optional, List
-
-import faiss
-from sentence_transformers import SentenceTransformer
+from typing import Dict, Any, Iterable, Optional, List, Union
 
+from secure_prompt.core import metrics
 from secure_prompt.core.scoring import VECTOR_JAIL_SCORE
+from collections import deque
+
+from secure_prompt.guards.chunking import iter_windows, normalize_chunk_config, split_windows, window_budget
+from secure_prompt.guards.encoders import DEFAULT_MAX_BATCH_TOKENS, ENCODER_BACKENDS, encoder_cache_id
+from secure_prompt.guards.index import normalize_index_config
+from secure_prompt.guards.resources import get_encoder, get_embedding_cache, get_template_bank
+from secure_prompt.guards.templates import TemplateSet, templates_key
 from data.lexical import VECTOR_TEMPLATES
 
 from dotenv import load_dotenv
@@ -28,6 +32,8 @@ class VectorResult:
 
 class VectorFeatureExtractor:
     MODEL_NAME = os.getenv("VECTOR_MODEL_NAME")
+    ENCODER_BACKEND = os.getenv("VECTOR_ENCODER_BACKEND", "sentence_transformers")
+    CHUNKING = os.getenv("VECTOR_CHUNKING")  # max / mean включает разбиение на окна
 
     def __init__(
             self,
@@ -35,12 +41,45 @@ class VectorFeatureExtractor:
             threshold: float = VECTOR_JAIL_SCORE,
             use_faiss: bool = True,
             cache_dir: str = "./vector_cache",
-            feature_config: Dict[str, bool] = None
+            feature_config: Dict[str, bool] = None,
+            embedding_cache_size: int = 10000,
+            embedding_cache_dir: Optional[str] = None,
+            index_config: Optional[Dict[str, Any]] = None,
+            search_k: Optional[int] = None,
+            encoder_backend: Optional[str] = None,
+            encoder_options: Optional[Dict[str, Any]] = None,
+            max_batch_tokens: Optional[int] = DEFAULT_MAX_BATCH_TOKENS,
+            chunking: Optional[Dict[str, Any]] = None
     ):
         self.templates = templates
         self.threshold = threshold
         self.use_faiss = use_faiss
         self.cache_dir = cache_dir
+        self.index_config = normalize_index_config({"use_faiss": use_faiss, **(index_config or {})})
+        # search_k: признаки считаются только по search_k ближайшим шаблонам
+        # (через индекс), без плотного вектора похожестей на все шаблоны
+        self.search_k = search_k
+
+        # Бэкенд энкодера: sentence_transformers, torch (потоки, int8) или onnx (int8)
+        self.encoder_backend = encoder_backend or self.ENCODER_BACKEND
+        if self.encoder_backend not in ENCODER_BACKENDS:
+            raise ValueError(f"encoder_backend должен быть одним из {ENCODER_BACKENDS}")
+        encoder_options = dict(encoder_options or {})
+        if self.encoder_backend == "onnx":
+            encoder_options.setdefault("onnx_dir", os.path.join(os.path.abspath(cache_dir), "onnx"))
+        self.encoder_options = tuple(sorted(encoder_options.items()))
+        self.encoder_id = encoder_cache_id(self.MODEL_NAME, self.encoder_backend, encoder_options)
+        # max_batch_tokens: батчи энкодера формируются по бюджету токенов с учётом
+        # паддинга, тексты сгруппированы по длине; None - по batch_size текстов
+        self.max_batch_tokens = max_batch_tokens
+
+        # chunking: длинные тексты делятся на перекрывающиеся окна, похожести на
+        # шаблоны агрегируются по окнам (max/mean), feature_dim не меняется
+        if chunking is None and self.CHUNKING:
+            chunking = {"agg": self.CHUNKING}
+        self.chunk_config = normalize_chunk_config(chunking) if chunking is not None else None
+        if self.chunk_config is not None and search_k is not None:
+            raise ValueError("chunking не поддерживается вместе с search_k")
 
         # Конфигурация признаков
         self.feature_config = feature_config or {
@@ -50,85 +89,85 @@ class VectorFeatureExtractor:
             'include_category_scores': True
         }
 
-        self.logger = logging.getLogger(__name__)
-        os.makedirs(cache_dir, exist_ok=True)
-
-        # Инициализация модели
-        self.model = SentenceTransformer(self.MODEL_NAME)
+        if search_k is not None and self.feature_config.get('include_template_scores', True):
+            raise ValueError("include_template_scores требует похожести на все шаблоны; отключите его для search_k")
+        if self.feature_config.get('category_agg', 'mean') not in ('mean', 'max'):
+            raise ValueError("category_agg должен быть 'mean' или 'max'")
 
-        # Загружаем или вычисляем эмбеддинги шаблонов
-        self.template_embeddings = None
-        self.template_texts = None
-        self.template_categories = None
-        self.template_weights = None
-        self._init_embeddings()
+        self.logger = logging.getLogger(__name__)
 
-        # Получаем уникальные категории для консистентности
-        self.unique_categories = sorted(set(self.template_categories))
+        # Эмбеддинги шаблонов общие для всех экстракторов с той же конфигурацией;
+        # энкодер загружается лениво, только когда нужно что-то закодировать
+        self.bank = get_template_bank(
+            self.MODEL_NAME,
+            os.path.abspath(cache_dir),
+            templates_key(templates),
+            self.encoder_backend,
+            self.encoder_options
+        )
 
-        # Индекс для быстрого поиска (опционально)
-        self.index = None
-        if use_faiss:
-            self._init_index()
+        # Модель обучена на фиксированном наборе столбцов: обновления шаблонов,
+        # меняющие ширину или смысл столбцов, банк отклоняет
+        self.bank.pin_layout(
+            self.feature_config.get('include_template_scores', True),
+            self.feature_config.get('include_category_scores', True)
+        )
 
-        # Кэш для эмбеддингов текстов
-        self.text_embedding_cache = {}
-        self.max_cache_size = 1000
+        # Кэш эмбеддингов текстов (LRU в памяти + опционально на диске)
+        self.embedding_cache = get_embedding_cache(
+            self.encoder_id,
+            self.template_embeddings.shape[1],
+            embedding_cache_size,
+            os.path.abspath(embedding_cache_dir) if embedding_cache_dir else None
+        )
 
-        # Предвычисляем размерность признаков
-        self.feature_dim = self._compute_feature_dim()
         self.logger.info(f"Размерность признаков: {self.feature_dim}")
 
     # ---------- INIT ----------
 
-    def _init_embeddings(self):
-        """Инициализация эмбеддингов шаблонов"""
-        cache_path = os.path.join(self.cache_dir, "template_embeddings_v4.pkl")
-
-        if os.path.exists(cache_path):
-            with open(cache_path, "rb") as f:
-                data = pickle.load(f)
-                self.template_embeddings = data["embeddings"]
-                self.template_texts = data["texts"]
-                self.template_categories = data.get("categories", [])
-                self.template_weights = data.get("weights", [])
-        else:
-            # Извлекаем текст, категорию и вес из шаблонов
-            self.template_texts = [t["text"] for t in self.templates]
-            self.template_categories = [t.get("category", "unknown") for t in self.templates]
-            self.template_weights = [t.get("weight", 1.0) for t in self.templates]
-
-            # Вычисляем эмбеддинги
-            self.template_embeddings = self.model.encode(
-                self.template_texts,
-                normalize_embeddings=True,
-                show_progress_bar=False
-            )
-
-            # Сохраняем в кэш
-            with open(cache_path, "wb") as f:
-                pickle.dump({
-                    "embeddings": self.template_embeddings,
-                    "texts": self.template_texts,
-                    "categories": self.template_categories,
-                    "weights": self.template_weights
-                }, f)
-
-        self.logger.info(f"Загружено {len(self.template_texts)} шаблонов для извлечения признаков")
-
-    def _init_index(self):
-        """Инициализация FAISS индекса для быстрого поиска"""
-        dim = self.template_embeddings.shape[1]
-        self.index = faiss.IndexFlatIP(dim)
-        self.index.add(self.template_embeddings.astype("float32"))
-
-    def _compute_feature_dim(self) -> int:
-        """Вычисляет размерность вектора признаков"""
+    @property
+    def model(self):
+        """Энкодер, загружается при первом обращении"""
+        return get_encoder(self.MODEL_NAME, self.encoder_backend, self.encoder_options)
+
+    @property
+    def index(self):
+        """Индекс поиска по шаблонам (flat/ivf/hnsw/pq), общий для экстракторов с той же конфигурацией"""
+        return self.bank.get_index(self.index_config)
+
+    # Шаблоны читаются из текущего снимка банка: библиотека может обновляться на лету
+
+    @property
+    def template_embeddings(self) -> np.ndarray:
+        return self.bank.state.embeddings
+
+    @property
+    def template_texts(self) -> List[str]:
+        return self.bank.state.texts
+
+    @property
+    def template_categories(self) -> List[str]:
+        return self.bank.state.categories
+
+    @property
+    def template_weights(self) -> List[float]:
+        return self.bank.state.weights
+
+    @property
+    def unique_categories(self) -> List[str]:
+        return self.bank.state.unique_categories
+
+    @property
+    def feature_dim(self) -> int:
+        return self._compute_feature_dim(self.bank.state)
+
+    def _compute_feature_dim(self, state: TemplateSet) -> int:
+        """Вычисляет размерность вектора признаков для снимка шаблонов"""
         dim = 0
 
         # 1. Похожесть на каждый паттерн
         if self.feature_config.get('include_template_scores', True):
-            dim += len(self.template_texts)
+            dim += len(state.texts)
 
         # 2. Статистики
         if self.feature_config.get('include_stats', True):
@@ -140,7 +179,7 @@ class VectorFeatureExtractor:
 
         # 4. Оценки по категориям
         if self.feature_config.get('include_category_scores', True):
-            dim += len(self.unique_categories)
+            dim += len(state.unique_categories)
 
         return dim
 
@@ -148,180 +187,370 @@ class VectorFeatureExtractor:
 
     def get_text_embedding(self, text: str) -> np.ndarray:
         """Получает эмбеддинг текста с кэшированием"""
-        if text in self.text_embedding_cache:
-            return self.text_embedding_cache[text]
+        return self.get_text_embeddings([text])[0]
 
-        embedding = self.model.encode(
-            text,
-            normalize_embeddings=True
-        )
+    def get_text_embeddings(
+            self,
+            texts: List[str],
+            show_progress: bool = False,
+            batch_size: int = 32
+    ) -> np.ndarray:
+        """
+        Эмбеддинги батча текстов через кэш: энкодер получает только
+        отсутствующие в кэше тексты, каждый уникальный текст один раз,
+        сгруппированными по длине батчами не больше max_batch_tokens токенов.
 
-        if len(self.text_embedding_cache) >= self.max_cache_size:
-            self.text_embedding_cache.pop(next(iter(self.text_embedding_cache)))
-        self.text_embedding_cache[text] = embedding
+        Returns:
+            np.ndarray формы (len(texts), dim), float32
+        """
+        def encode(missing: List[str]) -> np.ndarray:
+            metrics.count("embedding_cache.misses", len(missing))
+            with metrics.stage("vector.encode", len(missing)):
+                return self.model.encode(missing, batch_size, show_progress, self.max_batch_tokens)
 
-        return embedding
+        metrics.count("embedding_cache.lookups", len(texts))
+        return self.embedding_cache.encode(texts, encode)
 
     def _compute_similarities(self, text_emb: np.ndarray) -> np.ndarray:
         """Вычисляет похожесть со всеми шаблонами"""
-        if self.index is not None and self.use_faiss:
-            # Получаем все похожести через FAISS
-            if len(self.template_embeddings) <= 5000:
-                sims, idxs = self.index.search(
-                    text_emb.reshape(1, -1).astype("float32"),
-                    k=len(self.template_embeddings)
-                )
-                similarities = np.zeros(len(self.template_embeddings))
-                similarities[idxs[0]] = sims[0]
-            else:
-                # Для большого количества используем батчи
-                similarities = np.zeros(len(self.template_embeddings))
-                batch_size = 1000
-                for i in range(0, len(self.template_embeddings), batch_size):
-                    end = min(i + batch_size, len(self.template_embeddings))
-                    batch_sims = np.dot(self.template_embeddings[i:end], text_emb)
-                    similarities[i:end] = batch_sims
-        else:
-            similarities = np.dot(self.template_embeddings, text_emb)
+        return self._compute_similarities_batch(text_emb.reshape(1, -1))[0]
 
-        return similarities
-
-    def extract_features_vector(self, text: str) -> List[float]:
+    def _compute_similarities_batch(self, embeddings: np.ndarray, state: Optional[TemplateSet] = None) -> np.ndarray:
         """
-        Извлекает признаки для ML модели в виде списка ФИКСИРОВАННОЙ длины.
+        Вычисляет похожести батча эмбеддингов со всеми шаблонами.
 
-        Args:
-            text: Текст для анализа
+        Нужны оценки по всем шаблонам, поэтому вместо поиска с k=len(templates)
+        используется одно матричное умножение (эмбеддинги нормализованы, так что
+        это тот же inner product, что и в IndexFlatIP).
 
         Returns:
-            list[float] признаков фиксированной длины
+            np.ndarray формы (batch, n_templates), float32
         """
-        if not text or len(text.strip()) < 3:
-            # Возвращаем нулевой список фиксированной длины
-            return [0.0] * self.feature_dim
-
-        # Получаем эмбеддинг и вычисляем похожести
-        text_emb = self.get_text_embedding(text)
-        similarities = self._compute_similarities(text_emb)
+        state = state or self.bank.state
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with metrics.stage("vector.similarity", len(embeddings)):
+            return embeddings @ state.embeddings.T
+
+    def _output(self, n_rows: int, state: TemplateSet, out: Optional[np.ndarray]) -> np.ndarray:
+        """Матрица признаков: out (проверяется форма) или новая float32"""
+        feature_dim = self._compute_feature_dim(state)
+        if out is None:
+            return np.empty((n_rows, feature_dim), dtype=np.float32)
+        if out.shape != (n_rows, feature_dim) or out.dtype != np.float32:
+            raise ValueError(f"out должен быть float32 формы {(n_rows, feature_dim)}, получен {out.dtype} {out.shape}")
+        return out
+
+    def _assemble_features(self, weighted: np.ndarray, state: TemplateSet, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Собирает все блоки признаков за один проход по матрице взвешенных похожестей.
 
-        # Применяем веса
-        weighted_similarities = similarities * np.array(self.template_weights)
+        Args:
+            weighted: (batch, n_templates) взвешенные похожести
+            state: снимок шаблонов, по которому посчитаны похожести
+            out: куда записать признаки (например, срез столбцов общей матрицы)
 
-        feature_list = []
+        Returns:
+            np.ndarray формы (batch, feature_dim), float32
+        """
+        n_rows, n_templates = weighted.shape
+        feature_dim = self._compute_feature_dim(state)
+        features = self._output(n_rows, state, out)
+        col = 0
 
         # 1. Похожесть на каждый паттерн
         if self.feature_config.get('include_template_scores', True):
-            feature_list.extend(weighted_similarities.tolist())
+            features[:, col:col + n_templates] = weighted
+            col += n_templates
 
         # 2. Статистики
         if self.feature_config.get('include_stats', True):
-            feature_list.append(float(np.max(weighted_similarities)))
-            feature_list.append(float(np.mean(weighted_similarities)))
-            feature_list.append(float(np.std(weighted_similarities)))
+            features[:, col] = weighted.max(axis=1)
+            features[:, col + 1] = weighted.mean(axis=1)
+            features[:, col + 2] = weighted.std(axis=1)
+            col += 3
 
-        # 3. Топ-3 значения
+        # 3. Топ-3 значения (дополняем нулями, если шаблонов меньше трёх)
         if self.feature_config.get('include_top_k', True):
-            top_3 = sorted(weighted_similarities, reverse=True)[:3]
-            # Дополняем нулями до 3 элементов
-            top_3_padded = top_3 + [0.0] * (3 - len(top_3))
-            feature_list.extend(top_3_padded)
-
-        # 4. Оценки по категориям
+            k = min(3, n_templates)
+            top_k = -np.partition(-weighted, k - 1, axis=1)[:, :k]
+            top_k.sort(axis=1)
+            features[:, col:col + k] = top_k[:, ::-1]
+            features[:, col + k:col + 3] = 0.0
+            col += 3
+
+        # 4. Оценки по категориям (среднее или максимум)
         if self.feature_config.get('include_category_scores', True):
-            # Инициализируем словари для всех категорий
-            cat_scores = {cat: 0.0 for cat in self.unique_categories}
-            cat_counts = {cat: 0 for cat in self.unique_categories}
+            n_categories = len(state.unique_categories)
+            if self.feature_config.get('category_agg', 'mean') == 'max':
+                for j in range(n_categories):
+                    features[:, col + j] = weighted[:, state.category_index == j].max(axis=1)
+            else:
+                features[:, col:col + n_categories] = weighted @ state.category_matrix
+            col += n_categories
 
-            # Суммируем по категориям
-            for i, cat in enumerate(self.template_categories):
-                cat_scores[cat] += weighted_similarities[i]
-                cat_counts[cat] += 1
+        # Проверяем размерность
+        assert col == feature_dim, \
+            f"Ожидаемая размерность {feature_dim}, получена {col}"
 
-            # Добавляем средние значения в порядке категорий
-            for cat in self.unique_categories:
-                if cat_counts[cat] > 0:
-                    feature_list.append(cat_scores[cat] / cat_counts[cat])
-                else:
-                    feature_list.append(0.0)
+        return features
 
-        # Проверяем размерность
-        assert len(feature_list) == self.feature_dim, \
-            f"Ожидаемая размерность {self.feature_dim}, получена {len(feature_list)}"
+    def _assemble_topk_features(
+            self,
+            scores: np.ndarray,
+            ids: np.ndarray,
+            state: TemplateSet,
+            out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Собирает признаки по k ближайшим шаблонам: статистики, топ-3 и оценки
+        по категориям считаются только среди найденных соседей.
 
-        return feature_list
+        Args:
+            scores: (batch, k) похожести соседей
+            ids: (batch, k) индексы шаблонов, -1 если сосед не найден
+            state: снимок шаблонов, на строки которого указывают ids
+            out: куда записать признаки
 
-    def extract_features_batch(
+        Returns:
+            np.ndarray формы (batch, feature_dim), float32
+        """
+        n_rows = scores.shape[0]
+        valid = ids >= 0
+        safe_ids = np.where(valid, ids, 0)
+        # для отсутствующих соседей FAISS может вернуть ±FLT_MAX вместо похожести
+        weighted = np.where(valid, scores, 0.0) * state.weight_array[safe_ids]
+        n_valid = valid.sum(axis=1)
+        denom = np.maximum(n_valid, 1)
+        weighted_or_min = np.where(valid, weighted, -np.inf)
+
+        feature_dim = self._compute_feature_dim(state)
+        features = self._output(n_rows, state, out)
+        features.fill(0.0)
+        col = 0
+
+        # 1. Статистики по соседям
+        if self.feature_config.get('include_stats', True):
+            mean = np.where(valid, weighted, 0.0).sum(axis=1) / denom
+            features[:, col] = np.where(n_valid > 0, weighted_or_min.max(axis=1, initial=-np.inf), 0.0)
+            features[:, col + 1] = mean
+            features[:, col + 2] = np.sqrt(np.where(valid, (weighted - mean[:, None]) ** 2, 0.0).sum(axis=1) / denom)
+            col += 3
+
+        # 2. Топ-3 значения
+        if self.feature_config.get('include_top_k', True):
+            k = min(3, weighted.shape[1])
+            if k:
+                top_k = -np.partition(-weighted_or_min, k - 1, axis=1)[:, :k]
+                top_k.sort(axis=1)
+                top_k = top_k[:, ::-1]
+                features[:, col:col + k] = np.where(np.isinf(top_k), 0.0, top_k)
+            col += 3
+
+        # 3. Оценки по категориям среди соседей
+        if self.feature_config.get('include_category_scores', True):
+            n_categories = len(state.unique_categories)
+            in_category = (state.category_index[safe_ids][:, :, None] == np.arange(n_categories)) & valid[:, :, None]
+            if self.feature_config.get('category_agg', 'mean') == 'max':
+                cat_scores = np.where(in_category, weighted[:, :, None], -np.inf).max(axis=1, initial=-np.inf)
+                cat_scores[np.isinf(cat_scores)] = 0.0
+            else:
+                cat_scores = (in_category * weighted[:, :, None]).sum(axis=1) / np.maximum(in_category.sum(axis=1), 1)
+            features[:, col:col + n_categories] = cat_scores
+            col += n_categories
+
+        assert col == feature_dim, \
+            f"Ожидаемая размерность {feature_dim}, получена {col}"
+
+        return features
+
+    def _features_from_embeddings(
             self,
-            texts: List[str],
-            show_progress: bool = False,
-            batch_size: int = 32
-    ) -> List[List[float]]:
+            embeddings: np.ndarray,
+            offsets: Optional[np.ndarray] = None,
+            out: Optional[np.ndarray] = None,
+            state: Optional[TemplateSet] = None
+    ) -> np.ndarray:
         """
-        Извлекает признаки для батча текстов.
+        Признаки для матрицы эмбеддингов (batch x dim).
+
+        offsets: границы окон текстов в embeddings (окна текста i - строки
+        offsets[i]:offsets[i + 1]); похожести окон агрегируются в одну строку
+        state: снимок шаблонов, по которому вызывающий выделил out; в режиме
+        search_k используется снимок индекса (раскладка та же, см. pin_layout)
+        """
+        if self.search_k is not None:
+            with metrics.stage("vector.search", len(embeddings)):
+                state, scores, ids = self.bank.search(self.index_config, embeddings, self.search_k)
+            return self._assemble_topk_features(scores, ids, state, out)
+
+        # Один снимок на весь батч, даже если библиотека обновится во время расчёта
+        state = state or self.bank.state
+        weighted = self._compute_similarities_batch(embeddings, state)
+        weighted *= state.weight_array
+        if offsets is not None and len(offsets) - 1 < len(weighted):
+            if self.chunk_config["agg"] == "max":
+                weighted = np.maximum.reduceat(weighted, offsets[:-1], axis=0)
+            else:
+                weighted = np.add.reduceat(weighted, offsets[:-1], axis=0) / np.diff(offsets)[:, None]
+        return self._assemble_features(weighted, state, out)
+
+    def _window_tokens(self, config: Dict[str, Any]) -> tuple:
+        """
+        (max_tokens, count_tokens) для нарезки окон токенизатором энкодера:
+        по умолчанию окно не длиннее max_seq_length без двух спецтокенов,
+        чтобы энкодер ничего не усекал
+        """
+        encoder = self.model
+        return config["max_tokens"] or encoder.max_seq_length - 2, encoder.count_tokens
+
+    def _split_batch(self, texts: List[str]) -> tuple:
+        """Окна всех текстов батча подряд и их границы offsets"""
+        config = self.chunk_config
+        max_tokens, count_tokens = self._window_tokens(config)
+        windows = []
+        offsets = [0]
+        for text in texts:
+            windows.extend(split_windows(
+                text, config["window"], config["overlap"], config["max_windows"], max_tokens, count_tokens
+            ))
+            offsets.append(len(windows))
+        return windows, np.asarray(offsets)
+
+    def extract_features_vector(self, text: str) -> List[float]:
+        """
+        Извлекает признаки для ML модели в виде списка ФИКСИРОВАННОЙ длины.
+
+        Args:
+            text: Текст для анализа
 
         Returns:
-            List[List[float]] - список списков признаков фиксированной длины
+            list[float] признаков фиксированной длины
         """
-        if not texts:
-            return []
+        if not text or len(text.strip()) < 3:
+            # Возвращаем нулевой список фиксированной длины
+            return [0.0] * self.feature_dim
 
-        all_features = []
+        if self.chunk_config is not None:
+            return self.extract_features_batch([text])[0].tolist()
 
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
+        text_emb = self.get_text_embedding(text)
+        return self._features_from_embeddings(text_emb.reshape(1, -1))[0].tolist()
 
-            # Получаем эмбеддинги для всего батча
-            batch_embeddings = self.model.encode(
-                batch,
-                normalize_embeddings=True,
-                show_progress_bar=show_progress
-            )
+    def extract_features_batch(
+            self,
+            texts: List[str],
+            show_progress: bool = False,
+            batch_size: int = 32,
+            out: Optional[np.ndarray] = None,
+            state: Optional[TemplateSet] = None
+    ) -> np.ndarray:
+        """
+        Извлекает признаки для батча текстов.
 
-            for emb in batch_embeddings:
-                # Вычисляем похожести
-                similarities = self._compute_similarities(emb)
-                weighted = similarities * np.array(self.template_weights)
+        Эмбеддинги берутся из кэша, недостающие кодируются батчами по бюджету
+        max_batch_tokens (или по batch_size текстов без него), после чего все блоки признаков считаются одним проходом по матрице эмбеддингов.
 
-                feature_list = []
+        out: float32 (len(texts), feature_dim), например срез столбцов общей
+        матрицы признаков батча; признаки пишутся в него без копирования
+        state: снимок шаблонов, по ширине которого выделен out; по умолчанию
+        текущий, берётся один раз на батч
 
-                # 1. Похожесть на паттерны
-                if self.feature_config.get('include_template_scores', True):
-                    feature_list.extend(weighted.tolist())
+        Returns:
+            np.ndarray формы (len(texts), feature_dim), float32 (out, если задан)
+        """
+        state = state or self.bank.state
+        if not texts:
+            return self._output(0, state, out)
 
-                # 2. Статистики
-                if self.feature_config.get('include_stats', True):
-                    feature_list.append(float(np.max(weighted)))
-                    feature_list.append(float(np.mean(weighted)))
-                    feature_list.append(float(np.std(weighted)))
+        with metrics.stage("vector.features", len(texts)):
+            if self.chunk_config is not None:
+                windows, offsets = self._split_batch(texts)
+                embeddings = self.get_text_embeddings(windows, show_progress, batch_size)
+                return self._features_from_embeddings(embeddings, offsets, out, state)
 
-                # 3. Топ-3
-                if self.feature_config.get('include_top_k', True):
-                    top_3 = sorted(weighted, reverse=True)[:3]
-                    top_3_padded = top_3 + [0.0] * (3 - len(top_3))
-                    feature_list.extend(top_3_padded)
+            embeddings = self.get_text_embeddings(texts, show_progress, batch_size)
+            return self._features_from_embeddings(embeddings, out=out, state=state)
 
-                # 4. Категории
-                if self.feature_config.get('include_category_scores', True):
-                    cat_scores = {cat: 0.0 for cat in self.unique_categories}
-                    cat_counts = {cat: 0 for cat in self.unique_categories}
+    # ---------- STREAMING ----------
 
-                    for j, cat in enumerate(self.template_categories):
-                        cat_scores[cat] += weighted[j]
-                        cat_counts[cat] += 1
+    def detect_stream(self, segments: Union[str, Iterable[str]], windows_per_step: int = 4) -> VectorResult:
+        """
+        Проверка длинного или поступающего по частям текста окно за окном.
 
-                    for cat in self.unique_categories:
-                        if cat_counts[cat] > 0:
-                            feature_list.append(cat_scores[cat] / cat_counts[cat])
-                        else:
-                            feature_list.append(0.0)
+        Окна кодируются группами по windows_per_step. Покрытие то же, что и
+        у split_windows (window_budget): первые head окон проверяются по мере
+        поступления, и проверка останавливается, как только максимальная
+        взвешенная похожесть окна достигает threshold; последние tail окон
+        проверяются, когда поток закончился; окна между ними пропускаются.
+        Без chunking используются окна по умолчанию.
 
-                # Проверяем размерность
-                assert len(feature_list) == self.feature_dim, \
-                    f"Ожидаемая размерность {self.feature_dim}, получена {len(feature_list)}"
+        Returns:
+            VectorResult с оценкой по просмотренным окнам; metadata содержит
+            число просмотренных и пропущенных окон, номер окна с максимальной
+            похожестью, stopped_early (остаток потока не читался) и truncated
+            (часть окон не проверялась из-за max_windows)
+        """
+        config = self.chunk_config or normalize_chunk_config({})
+        if isinstance(segments, str):
+            segments = [segments]
+        max_tokens, count_tokens = self._window_tokens(config)
+        windows = iter_windows(segments, config["window"], config["overlap"], max_tokens, count_tokens)
+        head, tail = window_budget(config["max_windows"])
+
+        best_score, best_template, best_window, scanned = 0.0, None, None, 0
+
+        def scan(batch: List[tuple]) -> bool:
+            nonlocal best_score, best_template, best_window, scanned
+            state = self.bank.state
+            weighted = self._compute_similarities_batch(self.get_text_embeddings([w for _, w in batch]), state)
+            weighted *= state.weight_array
+            for (index, _), row in zip(batch, weighted):
+                j = int(row.argmax())
+                if row[j] > best_score or best_window is None:
+                    best_score, best_template, best_window = float(row[j]), state.texts[j], index
+                scanned += 1
+                if best_score >= self.threshold:
+                    return True
+            return False
+
+        stopped = False
+        skipped = 0
+        pending: List[tuple] = []
+        last: deque = deque(maxlen=tail)
+        for index, window in enumerate(windows):
+            if index < head:
+                pending.append((index, window))
+                if len(pending) == windows_per_step:
+                    stopped = scan(pending)
+                    pending = []
+                    if stopped:
+                        break
+            elif tail == 0:
+                # окна не хранятся, но считаются до конца потока
+                skipped += 1
+            else:
+                skipped += len(last) == tail
+                last.append((index, window))
 
-                all_features.append(feature_list)
+        if not stopped:
+            rest = pending + list(last)
+            for start in range(0, len(rest), windows_per_step):
+                if scan(rest[start:start + windows_per_step]):
+                    break
 
-        return all_features
+        return VectorResult(
+            is_jailbreak=best_score >= self.threshold,
+            score=best_score,
+            matched_template=best_template,
+            method="vector_stream",
+            metadata={
+                'windows_scanned': scanned,
+                'matched_window': best_window,
+                'windows_skipped': skipped,
+                'stopped_early': stopped,
+                'truncated': skipped > 0
+            }
+        )
 
     # ---------- UTILITY ----------
 
@@ -366,6 +595,7 @@ class VectorFeatureExtractor:
             'embedding_dim': self.template_embeddings.shape[1],
             'feature_dim': self.feature_dim,
             'model': self.MODEL_NAME,
+            'encoder': self.encoder_id,
             'feature_config': self.feature_config
         }
 
@@ -0,0 +1,126 @@
+"""Test doubles shared by the test modules, exposed as fixtures."""
+import zlib
+
+import numpy as np
+import pytest
+
+from secure_prompt.audit.binary import TIERS
+from secure_prompt.audit.models import SecurityEvent
+from secure_prompt.core import decision
+from secure_prompt.guards.ml_guard import MLResult
+
+
+class StubFeatures:
+    def __init__(self, width: int):
+        self.width = width
+
+    def n_features(self, use_vector=False):
+        return self.width
+
+
+class StubGuard:
+    """
+    Stands in for MLGuard inside DecisionCore. A text scores scores[text]
+    (default when absent) and its reason is [score]; override score() for
+    anything else. Every detect() batch is kept in calls, every static block
+    passed to it in static.
+    """
+    scores: dict = {}
+    default = 0.1
+    model_path = None
+    n_features = 1
+
+    def __init__(self, threshold, use_vector=False):
+        self.threshold = threshold
+        self.use_vector = use_vector
+        self.model = None
+        self.feature_extractor = StubFeatures(self.n_features)
+        self.calls = []
+        self.static = []
+
+    def score(self, text):
+        return self.scores.get(text, self.default)
+
+    def detect(self, texts, static=None):
+        self.calls.append(list(texts))
+        if static is not None:
+            self.static.append(static)
+        return [MLResult(None, None, 0.5, score, [score]) for score in map(self.score, texts)]
+
+
+class RecordingLogger:
+    """SecurityLogger double: keeps the keyword arguments of every log_input_checks call."""
+
+    def __init__(self):
+        self.records = []
+
+    def log_input_checks(self, **kwargs):
+        self.records.append(kwargs)
+
+
+class CountingEncoder:
+    """Deterministic unit vectors seeded by the text; every batch it encodes is kept in calls."""
+
+    def __init__(self, dim=16):
+        self.dim = dim
+        self.calls = []
+
+    def vectors(self, texts):
+        out = np.stack([
+            np.random.default_rng(zlib.crc32(t.encode())).normal(size=self.dim) for t in texts
+        ]).astype(np.float32)
+        return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return self.vectors(texts)
+
+
+def make_event(i):
+    """Audit event i; the fields cycle through every value the storages encode."""
+    return SecurityEvent(
+        timestamp=f"2026-03-0{i % 9 + 1}T12:34:56.{i + 1:06d}",
+        event_type="response_check" if i % 5 == 0 else "input_check",
+        decision="BLOCK" if i % 2 else "ALLOW",
+        score=i * 0.25,
+        reason=[0.5, 0.25, float(i)] if i % 2 else [],
+        prompt_hash=SecurityEvent.hash_text(f"prompt {i}"),
+        cache_hit=i % 3 == 0,
+        model_version=f"{i:08x}.beef" if i % 4 == 2 else "",
+        tier=TIERS[i % len(TIERS)],
+        rules=[("lexeme:actions:override", (i, i + 6)), ("правило", (0, 3))] if i % 3 == 1 else [],
+    )
+
+
+@pytest.fixture
+def stub_guard(monkeypatch):
+    """A fresh StubGuard subclass installed as DecisionCore's MLGuard; set its attributes to script it."""
+    guard = type("Guard", (StubGuard,), {"scores": {}})
+    monkeypatch.setattr(decision, "MLGuard", guard)
+    return guard
+
+
+@pytest.fixture
+def audit_log():
+    return RecordingLogger()
+
+
+@pytest.fixture
+def make_core(stub_guard, audit_log):
+    """Builds DecisionCore over stub_guard and audit_log; keyword arguments go to DecisionCore."""
+    def make(**kwargs):
+        kwargs.setdefault("use_vector", False)
+        kwargs.setdefault("logger", audit_log)
+        return decision.DecisionCore(**kwargs)
+    return make
+
+
+@pytest.fixture(name="make_event")
+def make_event_fixture():
+    return make_event
+
+
+@pytest.fixture(name="counting_encoder")
+def counting_encoder_fixture():
+    """The CountingEncoder class: tests create as many encoders (and dims) as they need."""
+    return CountingEncoder
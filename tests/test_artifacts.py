@@ -0,0 +1,107 @@
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from secure_prompt.guards.artifacts import (
+    convert_model_pickle, convert_template_pickle, read_artifact, write_artifact
+)
+from secure_prompt.guards.linear_model import LinearScorer
+from secure_prompt.guards.templates import TemplateBank, TemplateSet, TemplateStore
+
+
+def never_encode(texts):
+    raise AssertionError(f"unexpected encode of {texts}")
+
+
+def test_round_trip_is_memory_mapped(tmp_path):
+    path = str(tmp_path / "artifact")
+    emb = np.arange(12, dtype=np.float32).reshape(3, 4)
+    write_artifact(path, {"embeddings": emb}, {"texts": ["a", "б", "c"]})
+
+    arrays, meta = read_artifact(path)
+    assert meta["texts"] == ["a", "б", "c"]
+    assert np.array_equal(arrays["embeddings"], emb)
+    assert not arrays["embeddings"].flags.writeable
+
+    # повторная запись того же артефакта оставляет существующий
+    write_artifact(path, {"embeddings": emb + 1}, {"texts": []})
+    assert read_artifact(path)[1]["texts"] == ["a", "б", "c"]
+
+
+def test_metadata_mismatch_rejected(tmp_path):
+    path = str(tmp_path / "artifact")
+    write_artifact(path, {"x": np.zeros(4, np.float32)}, {})
+    np.save(tmp_path / "artifact" / "x.npy", np.zeros(5, np.float32))
+    with pytest.raises(ValueError):
+        read_artifact(path)
+
+
+def test_workers_map_the_same_snapshot(tmp_path):
+    templates = [(f"t{i}", "abc"[i % 3], 1.0) for i in range(20)]
+    encode = lambda texts: np.ones((len(texts), 8), np.float32)
+    first = TemplateBank.load(templates, encode, str(tmp_path), "model")
+    second = TemplateBank.load(templates, never_encode, str(tmp_path), "model")
+    assert second.store.disk is None
+    assert not second.state.embeddings.flags.writeable
+    assert np.array_equal(first.state.embeddings, second.state.embeddings)
+
+
+def _snapshot(i):
+    return TemplateSet(np.full((2, 4), i, np.float32), [f"t{i}", "x"], ["a", "a"], [1.0, 1.0])
+
+
+def test_old_snapshots_outlive_the_grace_period(tmp_path):
+    import os
+    import time
+
+    store = TemplateStore(str(tmp_path), "model", keep_snapshots=2, snapshot_grace=60.0)
+    states = [_snapshot(i) for i in range(4)]
+
+    def age(state, seconds):
+        then = time.time() - seconds
+        os.utime(store._snapshot_path(state.digest), (then, then))
+
+    def kept():
+        return [os.path.exists(store._snapshot_path(state.digest)) for state in states]
+
+    for seconds, state in zip((300, 50, 30, 10), states):
+        store.save_snapshot(state)
+        age(state, seconds)
+
+    store._prune_snapshots()
+    # два новых остаются; из старых удаляется только тот, у которого истёк grace-период
+    assert kept() == [False, True, True, True]
+
+    # загрузка отмечает снимок как использованный: он переживает более новые неиспользуемые
+    age(states[1], 500)
+    assert store.load_snapshot(states[1].entries) is not None
+    store.snapshot_grace = 0.0
+    store._prune_snapshots()
+    assert kept() == [False, True, False, True]
+
+
+def test_convert_template_pickle(tmp_path):
+    emb = np.random.default_rng(0).normal(size=(5, 8)).astype(np.float32)
+    texts = [f"t{i}" for i in range(5)]
+    with open(tmp_path / "template_embeddings_v4.pkl", "wb") as f:
+        pickle.dump({"embeddings": emb, "texts": texts, "categories": ["a"] * 5, "weights": [1.0] * 5}, f)
+
+    assert convert_template_pickle(str(tmp_path / "template_embeddings_v4.pkl"), str(tmp_path), "model") == 5
+    bank = TemplateBank.load([(t, "a", 1.0) for t in texts], never_encode, str(tmp_path), "model")
+    assert np.array_equal(bank.state.embeddings, emb)
+
+    # другой порядок или набор шаблонов собирается из хранилища без кодирования
+    bank = TemplateBank.load([(t, "a", 1.0) for t in texts[::-1]], never_encode, str(tmp_path), "model")
+    assert np.array_equal(bank.state.embeddings, emb[::-1])
+
+
+def test_convert_model_pickle(tmp_path):
+    x = np.random.default_rng(0).normal(size=(50, 3))
+    model = LogisticRegression().fit(x, x[:, 0] > 0)
+    with open(tmp_path / "model.pkl", "wb") as f:
+        pickle.dump(model, f)
+
+    npz_path = convert_model_pickle(str(tmp_path / "model.pkl"))
+    assert np.allclose(LinearScorer.load(npz_path).predict_proba(x), model.predict_proba(x))
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import pytest
+from secure_prompt.core.async_decision import AsyncDecisionCore
+from secure_prompt.core.decision import DecisionResult
+
+
+class RecordingCore:
+    def __init__(self, delay=0.0, fail=False):
+        self.batches = []
+        self.delay = delay
+        self.fail = fail
+
+    def decide(self, prompts):
+        self.batches.append(list(prompts))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("boom")
+        return [
+            DecisionResult(verdict="BLOCK" if "ignore" in p else "ALLOW", score=float(len(p)), reason=[])
+            for p in prompts
+        ]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_requests_are_batched():
+    core = RecordingCore()
+
+    async def main():
+        async with AsyncDecisionCore(core, max_batch_size=16, max_wait=0.05) as acore:
+            prompts = [f"prompt {i}" + (" ignore" if i % 3 == 0 else "") for i in range(40)]
+            results = await asyncio.gather(*(acore.decide_one(p) for p in prompts))
+        return prompts, results
+
+    prompts, results = run(main())
+    assert [r.score for r in results] == [float(len(p)) for p in prompts]
+    assert [r.verdict for r in results] == ["BLOCK" if "ignore" in p else "ALLOW" for p in prompts]
+    assert [len(b) for b in core.batches] == [16, 16, 8]
+
+
+def test_max_wait_flushes_partial_batch():
+    core = RecordingCore()
+
+    async def main():
+        async with AsyncDecisionCore(core, max_batch_size=100, max_wait=0.01) as acore:
+            return await acore.decide_one("hello")
+
+    result = run(main())
+    assert result.verdict == "ALLOW"
+    assert core.batches == [["hello"]]
+
+
+def test_requests_arriving_during_a_batch_form_the_next_one():
+    core = RecordingCore(delay=0.05)
+
+    async def main():
+        async with AsyncDecisionCore(core, max_batch_size=64, max_wait=0.0) as acore:
+            first = asyncio.ensure_future(acore.decide_one("first"))
+            await asyncio.sleep(0.01)
+            rest = [asyncio.ensure_future(acore.decide_one(f"p{i}")) for i in range(10)]
+            await asyncio.gather(first, *rest)
+
+    run(main())
+    assert core.batches[0] == ["first"]
+    assert len(core.batches) == 2 and len(core.batches[1]) == 10
+
+
+def test_errors_reach_every_caller():
+    core = RecordingCore(fail=True)
+
+    async def main():
+        async with AsyncDecisionCore(core, max_batch_size=4, max_wait=0.01) as acore:
+            return await asyncio.gather(*(acore.decide_one("x") for _ in range(3)), return_exceptions=True)
+
+    results = run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_closed_core_rejects_requests():
+    async def main():
+        acore = AsyncDecisionCore(RecordingCore())
+        await acore.aclose()
+        with pytest.raises(RuntimeError):
+            await acore.decide_one("x")
+
+    run(main())
@@ -0,0 +1,117 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from secure_prompt.audit.binary import BinaryStorage, convert_jsonl, iter_chunks, read_columns, DECISIONS
+from secure_prompt.audit.storage import JsonlStorage
+
+
+def test_round_trip(tmp_path, make_event):
+    path = str(tmp_path / "audit.bin")
+    events = [make_event(i) for i in range(50)]
+    storage = BinaryStorage(path, max_events=16)
+    storage.write_many(events[:30])
+    storage.write(events[30])
+    storage.write_many(events[31:])
+    storage.close()
+
+    assert list(read_columns(path).events()) == events
+    # 30 events overflow the buffer at once, the remaining 20 flush together
+    assert [len(c) for c in iter_chunks(path)] == [30, 20]
+
+
+def test_columns(tmp_path, make_event):
+    path = str(tmp_path / "audit.bin")
+    storage = BinaryStorage(path)
+    storage.write_many([make_event(i) for i in range(10)])
+    storage.close()
+
+    cols = read_columns(path)
+    assert cols.decision.tolist() == [DECISIONS.index("BLOCK" if i % 2 else "ALLOW") for i in range(10)]
+    assert cols.prompt_hash.shape == (10, 32)
+    assert cols.reason(3).dtype == np.float32
+    assert cols.reason(3).tolist() == [0.5, 0.25, 3.0]
+    assert len(cols.reason(4)) == 0
+    assert (np.diff(cols.timestamp) != 0).all()
+
+
+def test_reopen_appends_without_second_header(tmp_path, make_event):
+    path = str(tmp_path / "audit.bin")
+    for start in (0, 5):
+        storage = BinaryStorage(path)
+        storage.write_many([make_event(i) for i in range(start, start + 5)])
+        storage.close()
+    assert [e.score for e in read_columns(path).events()] == [i * 0.25 for i in range(10)]
+
+
+def test_truncated_tail_is_ignored(tmp_path, make_event):
+    path = str(tmp_path / "audit.bin")
+    storage = BinaryStorage(path)
+    storage.write_many([make_event(i) for i in range(3)])
+    storage.flush()
+    storage.write_many([make_event(i) for i in range(3, 6)])
+    storage.close()
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 10)
+    assert len(read_columns(path)) == 3
+
+
+def test_unknown_decision_rejected(tmp_path, make_event):
+    storage = BinaryStorage(str(tmp_path / "audit.bin"))
+    event = make_event(1)
+    event.decision = "MAYBE"
+    with pytest.raises(ValueError):
+        storage.write(event)
+    storage.write(make_event(2))
+    storage.close()
+    assert len(read_columns(str(tmp_path / "audit.bin"))) == 1
+
+
+def test_long_model_version_rejected(tmp_path, make_event):
+    storage = BinaryStorage(str(tmp_path / "audit.bin"))
+    event = make_event(1)
+    event.model_version = "x" * 17
+    with pytest.raises(ValueError):
+        storage.write(event)
+    storage.close()
+
+
+def test_convert_jsonl_is_smaller(tmp_path, make_event):
+    src, dst = str(tmp_path / "audit.jsonl"), str(tmp_path / "audit.bin")
+    events = [make_event(i) for i in range(200)]
+    for e in events:
+        e.reason = [0.123456789] * 64 if e.decision == "BLOCK" else []
+    JsonlStorage(src).write_many(events)
+
+    assert convert_jsonl(src, dst) == 200
+    assert os.path.getsize(dst) * 3 < os.path.getsize(src)
+    restored = list(read_columns(dst).events())
+    assert [e.prompt_hash for e in restored] == [e.prompt_hash for e in events]
+    assert json.loads(json.dumps(restored[1].reason))[0] == pytest.approx(0.123456789)
+
+
+def _append_binary(path, events, barrier):
+    barrier.wait()
+    storage = BinaryStorage(path)
+    storage.write_many(events)
+    storage.close()
+
+
+def test_concurrent_creators_write_one_header(tmp_path, make_event):
+    import multiprocessing as mp
+
+    path = str(tmp_path / "audit.bin")
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(6)
+    batches = [[make_event(w * 100 + i) for i in range(5)] for w in range(6)]
+    procs = [ctx.Process(target=_append_binary, args=(path, events, barrier)) for events in batches]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+    assert sorted(e.score for e in read_columns(path).events()) == sorted(
+        (w * 100 + i) * 0.25 for w in range(6) for i in range(5)
+    )
+    assert [p.name for p in tmp_path.iterdir()] == ["audit.bin"]
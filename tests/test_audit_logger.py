@@ -0,0 +1,140 @@
+import threading
+
+import numpy as np
+import pytest
+from secure_prompt.audit.logger import BackgroundSecurityLogger, SecurityLogger
+from secure_prompt.audit.models import SecurityEvent
+
+
+class MemoryStorage:
+    def __init__(self, gate=None):
+        self.events = []
+        self.gate = gate
+        self.closed = False
+
+    def write(self, event):
+        self.write_many([event])
+
+    def write_many(self, events):
+        if self.gate is not None:
+            self.gate.wait()
+        self.events.extend(events)
+
+    def close(self):
+        self.closed = True
+
+
+def test_sync_logger_matches_background_logger():
+    sync_storage, bg_storage = MemoryStorage(), MemoryStorage()
+    bg = BackgroundSecurityLogger(bg_storage)
+    for logger in (SecurityLogger(sync_storage), bg):
+        logger.log_input_checks(
+            ["a", "b"], ["ALLOW", "BLOCK"], [0.1, 4.0], [[], [1.0, 2.0]],
+            tiers=["lexical", "rules"], rules=[[], [("override", (0, 1))]]
+        )
+        logger.log_response_check("resp", "ALLOW", 0, [])
+    bg.close()
+
+    def strip(events):
+        return [(e.event_type, e.decision, e.score, e.reason, e.prompt_hash, e.tier, e.rules) for e in events]
+
+    assert strip(bg_storage.events) == strip(sync_storage.events)
+    assert bg_storage.events[0].prompt_hash == SecurityEvent.hash_text("a")
+    assert bg_storage.events[1].tier == "rules" and bg_storage.events[1].rules == [("override", (0, 1))]
+    assert bg_storage.closed
+
+
+def test_close_flushes_queue():
+    storage = MemoryStorage()
+    logger = BackgroundSecurityLogger(storage, batch_size=7)
+    for i in range(100):
+        logger.log_input_check(f"p{i}", "ALLOW", 0.0, [])
+    logger.close()
+    assert len(storage.events) == 100
+    assert logger.stats() == {"queued": 0, "enqueued": 100, "dropped": 0, "written": 100, "errors": 0}
+
+
+def test_queued_reasons_do_not_hold_the_batch_matrix():
+    storage = MemoryStorage()
+    logger = BackgroundSecurityLogger(storage)
+    features = np.arange(6, dtype=np.float32).reshape(2, 3)
+    logger.log_input_checks(["a", "b"], ["BLOCK", "BLOCK"], [1.0, 1.0], list(features))
+    logger.close()
+
+    assert all(event.reason.base is None for event in storage.events)
+    np.testing.assert_array_equal(storage.events[1].reason, features[1])
+
+
+def test_flush_waits_for_writer():
+    storage = MemoryStorage()
+    logger = BackgroundSecurityLogger(storage)
+    logger.log_input_checks(["a"] * 50, ["ALLOW"] * 50, [0.0] * 50, [[]] * 50)
+    assert logger.flush(timeout=5)
+    assert len(storage.events) == 50
+    logger.close()
+
+
+def fill_blocked(policy, **kwargs):
+    gate = threading.Event()
+    storage = MemoryStorage(gate)
+    logger = BackgroundSecurityLogger(storage, max_queue=10, overflow=policy, batch_size=1, **kwargs)
+    logger.log_input_check("first", "ALLOW", 0.0, [])
+    while logger.queued:
+        pass
+    # the writer is now stuck on "first", the queue holds at most 10 records
+    logger.log_input_checks([f"p{i}" for i in range(30)], ["ALLOW"] * 30, [float(i) for i in range(30)], [[]] * 30)
+    return gate, storage, logger
+
+
+def test_drop_oldest_keeps_newest():
+    gate, storage, logger = fill_blocked("drop_oldest")
+    assert logger.dropped == 20
+    gate.set()
+    logger.close()
+    assert [e.score for e in storage.events[1:]] == [float(i) for i in range(20, 30)]
+
+
+def test_sample_drops_everything_with_zero_rate():
+    gate, storage, logger = fill_blocked("sample", sample_rate=0.0)
+    assert logger.dropped == 20
+    gate.set()
+    logger.close()
+    assert [e.score for e in storage.events[1:]] == [float(i) for i in range(10)]
+
+
+def test_block_waits_for_space():
+    gate = threading.Event()
+    storage = MemoryStorage(gate)
+    logger = BackgroundSecurityLogger(storage, max_queue=2, overflow="block", batch_size=1)
+    producer = threading.Thread(target=lambda: [logger.log_input_check(f"p{i}", "ALLOW", float(i), []) for i in range(10)])
+    producer.start()
+    producer.join(timeout=0.2)
+    assert producer.is_alive()
+    gate.set()
+    producer.join(timeout=5)
+    logger.close()
+    assert [e.score for e in storage.events] == [float(i) for i in range(10)]
+    assert logger.dropped == 0
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        BackgroundSecurityLogger(MemoryStorage(), overflow="spill")
+
+
+class WriteOnlyStorage:
+    def __init__(self):
+        self.events = []
+
+    def write(self, event):
+        self.events.append(event)
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_storage_without_write_many(background):
+    storage = WriteOnlyStorage()
+    logger = BackgroundSecurityLogger(storage) if background else SecurityLogger(storage)
+    logger.log_input_checks(["a", "b", "c"], ["ALLOW", "BLOCK", "ALLOW"], [0.1, 4.0, 0.2], [[], [1.0], []])
+    if background:
+        logger.close()
+    assert [e.prompt_hash for e in storage.events] == [SecurityEvent.hash_text(p) for p in "abc"]
@@ -0,0 +1,127 @@
+import gc
+import json
+import multiprocessing as mp
+import os
+import time
+import weakref
+
+import numpy as np
+import pytest
+
+from secure_prompt.audit.logger import SecurityLogger
+from secure_prompt.audit.models import SecurityEvent
+from secure_prompt.audit import storage as storage_module
+from secure_prompt.audit.storage import BufferedJsonlStorage, JsonlStorage
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_jsonl_write_many(tmp_path, make_event):
+    path = tmp_path / "log.jsonl"
+    storage = JsonlStorage(str(path))
+    storage.write(make_event(0))
+    storage.write_many([make_event(i) for i in range(1, 4)])
+    assert [e["score"] for e in read_lines(path)] == [0.0, 0.25, 0.5, 0.75]
+
+
+def test_buffered_flushes_on_size(tmp_path, make_event):
+    path = tmp_path / "log.jsonl"
+    storage = BufferedJsonlStorage(str(path), max_events=10, flush_interval=60)
+    storage.write_many([make_event(i) for i in range(9)])
+    assert read_lines(path) == []
+    storage.write(make_event(9))
+    assert len(read_lines(path)) == 10
+    storage.close()
+
+
+def test_buffered_flushes_on_time(tmp_path, make_event):
+    path = tmp_path / "log.jsonl"
+    storage = BufferedJsonlStorage(str(path), max_events=1000, flush_interval=0.05)
+    storage.write(make_event(1))
+    time.sleep(0.3)
+    assert read_lines(path)[0]["reason"] == [0.5, 0.25, 1.0]
+    storage.close()
+
+
+def test_buffered_flushes_on_close(tmp_path, make_event):
+    path = tmp_path / "log.jsonl"
+    storage = BufferedJsonlStorage(str(path), max_events=1000, flush_interval=60)
+    storage.write_many([make_event(i) for i in range(5)])
+    storage.close()
+    assert [e["decision"] for e in read_lines(path)] == ["ALLOW", "BLOCK", "ALLOW", "BLOCK", "ALLOW"]
+
+
+def test_failed_flush_keeps_events(tmp_path, monkeypatch, make_event):
+    path = tmp_path / "log.jsonl"
+    storage = BufferedJsonlStorage(str(path), max_events=1000, flush_interval=60)
+    storage.write_many([make_event(i) for i in range(3)])
+
+    write = os.write
+
+    def disk_full(fd, data):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(storage_module.os, "write", disk_full)
+    with pytest.raises(OSError):
+        storage.flush()
+    monkeypatch.setattr(storage_module.os, "write", write)
+
+    storage.close()
+    assert [e["score"] for e in read_lines(path)] == [0.0, 0.25, 0.5]
+
+
+def test_exit_hook_does_not_keep_storage_alive(tmp_path):
+    storage = BufferedJsonlStorage(str(tmp_path / "log.jsonl"))
+    fd, ref = storage._fd, weakref.ref(storage)
+    del storage
+    gc.collect()
+    assert ref() is None
+    os.close(fd)
+
+
+def _append_events(path, events):
+    storage = BufferedJsonlStorage(path, max_events=50, flush_interval=60)
+    for event in events:
+        storage.write(event)
+    storage.close()
+
+
+def test_buffered_concurrent_processes_do_not_interleave(tmp_path, make_event):
+    path = str(tmp_path / "log.jsonl")
+    procs = [
+        mp.get_context("spawn").Process(target=_append_events, args=(path, [make_event(w * 1000 + i) for i in range(500)]))
+        for w in range(4)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert sorted(e["score"] for e in read_lines(path)) == sorted((w * 1000 + i) * 0.25 for w in range(4) for i in range(500))
+
+
+def test_logger_writes_one_batch(tmp_path):
+    class Recorder:
+        def __init__(self):
+            self.batches = []
+
+        def write(self, event):
+            self.batches.append([event])
+
+        def write_many(self, events):
+            self.batches.append(list(events))
+
+    storage = Recorder()
+    SecurityLogger(storage).log_input_checks(["a", "b"], ["ALLOW", "BLOCK"], [0.1, 5.0], [[], [1.0]])
+    assert len(storage.batches) == 1
+    assert [e.prompt_hash for e in storage.batches[0]] == [SecurityEvent.hash_text("a"), SecurityEvent.hash_text("b")]
+
+
+def test_array_reason_is_serialized(tmp_path, make_event):
+    path = tmp_path / "log.jsonl"
+    event = make_event(1)
+    event.reason = np.array([[0.5, 1.0, 2.0]], dtype=np.float32)[0, :2]
+    JsonlStorage(str(path)).write(event)
+    assert read_lines(path)[0]["reason"] == [0.5, 1.0]
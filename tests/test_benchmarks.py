@@ -0,0 +1,76 @@
+import base64
+
+import pytest
+
+from benchmarks.corpora import (
+    LENGTH_PROFILES, LONG_ADVERSARIAL_SIZE, PAYLOADS, adversarial_corpus, build_corpora, long_adversarial_corpus, synthetic_corpus
+)
+from benchmarks.run import compare, run
+
+
+def test_corpora_are_deterministic_and_bounded():
+    assert synthetic_corpus(20, "medium", seed=1) == synthetic_corpus(20, "medium", seed=1)
+    assert synthetic_corpus(20, "medium", seed=1) != synthetic_corpus(20, "medium", seed=2)
+    low, high = LENGTH_PROFILES["long"]
+    assert all(low <= len(text) <= high for text in synthetic_corpus(10, "long"))
+    with pytest.raises(ValueError):
+        build_corpora(["huge"], 4)
+
+
+def test_adversarial_cases():
+    spaced, encoded, leet, buried = adversarial_corpus(4)
+    assert spaced.split(" ")[0] and all(len(token) <= 1 for token in spaced.split(" "))
+    payload = encoded.rsplit(" ", 1)[1]
+    assert base64.b64decode(payload).decode("utf-8")
+    assert "4" in leet or "3" in leet
+    assert len(buried) > 3000
+
+
+def test_long_adversarial_cases():
+    corpus = long_adversarial_corpus(6)
+    spaced, encoded, buried = corpus[:3]
+    assert all(0.9 * LONG_ADVERSARIAL_SIZE <= len(text) <= LONG_ADVERSARIAL_SIZE for text in corpus)
+    assert all(len(token) <= 1 for token in spaced.split(" "))
+    assert base64.b64decode(encoded.rsplit(" ", 1)[1]).decode("utf-8")
+    assert any(buried.endswith(payload) for payload in PAYLOADS)
+    assert len(long_adversarial_corpus(100)) < 100
+    assert list(build_corpora(["adversarial_long"], 4)) == ["adversarial_long"]
+
+
+def test_report_structure():
+    corpora = build_corpora(["short", "adversarial"], 10)
+    report = run(corpora, ["preprocess"], [1, 4], min_calls=5)
+
+    assert report["skipped"] == {}
+    stats = report["results"]["adversarial"]["preprocess"]["4"]
+    assert stats["calls"] == 6  # the corpus of 10 prompts is taken twice
+    assert report["results"]["short"]["preprocess"]["1"]["calls"] == 10
+    assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+    assert stats["prompts_per_s"] > 0
+
+
+def test_compare_flags_regressions():
+    def report(prompts_per_s, p95_ms, calls=20):
+        stats = {"calls": calls, "prompts_per_s": prompts_per_s, "p95_ms": p95_ms}
+        return {"results": {"short": {"preprocess": {"8": stats}}}, "skipped": {}}
+
+    baseline = report(1000.0, 2.0)
+    assert compare(report(950.0, 2.1), baseline, threshold=0.1) == []
+    assert len(compare(report(800.0, 2.1), baseline, threshold=0.1)) == 1
+    assert len(compare(report(800.0, 3.0), baseline, threshold=0.1)) == 2
+    # stages missing from the baseline are not compared
+    new_stage = {"results": {"short": {"preprocess": baseline["results"]["short"]["preprocess"], "decision": {}}}}
+    assert compare(new_stage, baseline) == []
+
+
+def test_compare_flags_missing_and_undersampled_entries():
+    baseline = {"results": {"short": {"ml_guard": {"8": {"calls": 20, "prompts_per_s": 10.0, "p95_ms": 1.0}}}}}
+
+    skipped = compare({"results": {"short": {}}, "skipped": {"ml_guard": "FileNotFoundError: model"}}, baseline)
+    assert skipped == ["short/ml_guard/batch=8: skipped (FileNotFoundError: model) in the current run"]
+    assert compare({"results": {}, "skipped": {}}, baseline) == [
+        "short/ml_guard/batch=8: not measured in the current run"
+    ]
+    few = {"results": {"short": {"ml_guard": {"8": {"calls": 2, "prompts_per_s": 10.0, "p95_ms": 1.0}}}}}
+    assert len(compare(few, baseline)) == 1
+    assert compare(few, baseline, min_calls=2) == []
@@ -0,0 +1,164 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from secure_prompt.guards.chunking import iter_windows, normalize_chunk_config, split_windows, window_budget
+from secure_prompt.guards.templates import TemplateBank, TemplateSet
+from secure_prompt.guards.vector_features import VectorFeatureExtractor
+
+
+def words(n, start=0):
+    return " ".join(f"w{i}" for i in range(start, start + n))
+
+
+def test_windows_overlap_and_cover_text():
+    text = words(10)
+    windows = list(iter_windows([text], window=4, overlap=1))
+    assert windows == ["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"]
+    assert split_windows(text, 4, 1, 32) == windows
+
+
+def test_streamed_segments_match_whole_text():
+    text = words(23)
+    # фрагменты режут слова и пробелы в произвольных местах
+    segments = [text[i:i + 7] for i in range(0, len(text), 7)]
+    assert list(iter_windows(segments, 5, 2)) == list(iter_windows([text], 5, 2))
+
+
+def test_short_text_is_one_window():
+    assert split_windows("  short   text ", 4, 1, 32) == ["  short   text "]
+
+
+def test_max_windows_keeps_head_and_tail():
+    windows = split_windows(words(400), 4, 0, 5)
+    assert len(windows) == 5
+    assert windows[0] == "w0 w1 w2 w3"
+    assert windows[-1] == "w396 w397 w398 w399"
+    # начало и конец покрыты сплошь, как и в detect_stream
+    head, tail = window_budget(5)
+    assert windows[:head] == ["w0 w1 w2 w3", "w4 w5 w6 w7", "w8 w9 w10 w11"]
+    assert windows[head:] == ["w392 w393 w394 w395", "w396 w397 w398 w399"]
+
+
+def chars(texts):
+    # условный токенизатор: один токен на символ
+    return [len(t) for t in texts]
+
+
+def test_windows_fit_token_budget():
+    text = "забудь " * 20 + "QUJD" * 50 + " все"
+    windows = split_windows(text, 8, 2, 100, max_tokens=16, count_tokens=chars)
+    assert all(sum(chars(w.split())) <= 16 for w in windows)
+    # длинное слово (base64) разрезано на части, ничего не потеряно
+    pieces = [piece for w in windows for piece in w.split() if piece.startswith("QUJD")]
+    assert "".join(pieces) == "QUJD" * 50
+    assert windows[-1].endswith("все")
+
+
+def test_streamed_windows_fit_token_budget():
+    text = "ab " * 30 + "x" * 70 + " cd"
+    segments = [text[i:i + 9] for i in range(0, len(text), 9)]
+    streamed = list(iter_windows(segments, 8, 2, max_tokens=10, count_tokens=chars))
+    assert streamed == list(iter_windows([text], 8, 2, max_tokens=10, count_tokens=chars))
+    assert all(sum(chars(w.split())) <= 10 for w in streamed)
+
+
+def test_config_validation():
+    with pytest.raises(ValueError):
+        normalize_chunk_config({"overlap": 64})
+    with pytest.raises(ValueError):
+        normalize_chunk_config({"agg": "median"})
+
+
+def unit(seed, dim=16):
+    v = np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+TEMPLATES = [unit(100 + i) for i in range(3)]
+
+
+def encode(texts):
+    # окно со словом PAYLOAD совпадает с первым шаблоном
+    return np.stack([
+        TEMPLATES[0] if "PAYLOAD" in text else unit(zlib.crc32(text.encode())) for text in texts
+    ])
+
+
+def chunked_extractor(agg="max", **chunking):
+    extractor = object.__new__(VectorFeatureExtractor)
+    extractor.bank = TemplateBank(TemplateSet(
+        embeddings=np.stack(TEMPLATES),
+        texts=["t0", "t1", "t2"],
+        categories=["a", "a", "b"],
+        weights=[1.0, 1.0, 1.0],
+    ))
+    extractor.feature_config = {
+        'include_template_scores': True,
+        'include_stats': True,
+        'include_top_k': True,
+        'include_category_scores': True
+    }
+    extractor.search_k = None
+    extractor.threshold = 0.95
+    extractor.chunk_config = normalize_chunk_config({"window": 4, "overlap": 1, "agg": agg, **chunking})
+    extractor.get_text_embeddings = lambda texts, *args: encode(texts)
+    extractor._window_tokens = lambda config: (None, None)
+    return extractor
+
+
+@pytest.mark.parametrize("agg", ["max", "mean"])
+def test_window_similarities_are_aggregated(agg):
+    extractor = chunked_extractor(agg)
+    long_text = words(9) + " PAYLOAD " + words(9, 9)
+    features = extractor.extract_features_batch(["short text", long_text])
+
+    assert features.shape == (2, extractor.feature_dim)
+    per_window = encode(split_windows(long_text, 4, 1, 32)) @ np.stack(TEMPLATES).T
+    expected = per_window.max(axis=0) if agg == "max" else per_window.mean(axis=0)
+    np.testing.assert_allclose(features[1, :3], expected, rtol=1e-5)
+    np.testing.assert_allclose(features[0, :3], encode(["short text"])[0] @ np.stack(TEMPLATES).T, rtol=1e-5)
+    if agg == "max":
+        assert features[1, 0] == pytest.approx(1.0)
+
+
+def test_stream_stops_at_first_blocking_window():
+    extractor = chunked_extractor()
+    text = words(12) + " PAYLOAD " + words(200, 12)
+    segments = [text[i:i + 50] for i in range(0, len(text), 50)]
+
+    result = extractor.detect_stream(iter(segments), windows_per_step=2)
+    assert result.is_jailbreak
+    assert result.matched_template == "t0"
+    assert result.metadata['matched_window'] == 3  # слова 9..12
+    assert result.metadata['stopped_early']
+    assert result.metadata['windows_scanned'] == 4
+
+
+def test_stream_without_match_is_bounded():
+    extractor = chunked_extractor(max_windows=10)
+    result = extractor.detect_stream(words(500))
+    assert not result.is_jailbreak
+    assert result.metadata['windows_scanned'] == 10
+    assert result.metadata['truncated'] and not result.metadata['stopped_early']
+
+
+def test_stream_scans_tail_past_skipped_middle():
+    extractor = chunked_extractor(max_windows=6)
+    result = extractor.detect_stream(iter([words(300), " PAYLOAD"]), windows_per_step=2)
+    assert result.is_jailbreak
+    assert result.metadata['windows_scanned'] == 6
+    assert result.metadata['windows_skipped'] > 0 and result.metadata['truncated']
+    assert result.metadata['matched_window'] == result.metadata['windows_scanned'] + result.metadata['windows_skipped'] - 1
+    assert not result.metadata['stopped_early']
+
+
+@pytest.mark.parametrize("max_windows", [1, 10])
+def test_stream_counts_every_skipped_window(max_windows):
+    # при max_windows=1 хвост пуст (tail == 0), пропущенные окна всё равно считаются
+    extractor = chunked_extractor(max_windows=max_windows)
+    total = len(list(iter_windows([words(500)], 4, 1)))
+    result = extractor.detect_stream(words(500))
+    assert result.metadata['windows_scanned'] == max_windows
+    assert result.metadata['windows_skipped'] == total - max_windows
@@ -0,0 +1,66 @@
+import pytest
+
+
+@pytest.fixture
+def variants_core(make_core, stub_guard):
+    def make(cascade=False):
+        core = make_core(cascade=cascade)
+        high = core.jail_score + 1.0
+        middle = (core.cascade_allow_score + core.jail_score) / 2
+        low = core.cascade_allow_score / 2
+        # preprocess lowercases: "Attack Now" is scored as itself and as "attack now"
+        stub_guard.scores = {
+            "Attack Now": high, "attack now": high,
+            "Hello There": low, "hello there": low,
+            "MAYBE BAD": high, "maybe bad": middle,
+            "Quiet Raw": low, "quiet raw": middle,
+        }
+        return core
+    return make
+
+
+def test_each_unique_text_is_scored_once(variants_core, stub_guard):
+    core = variants_core()
+
+    scored = core._detect_unique(["Attack Now", "hello there", "Attack Now", "hello there", "maybe bad"])
+
+    assert core.guard.calls == [["Attack Now", "hello there", "maybe bad"]]
+    assert {text: r.score for text, r in scored.items()} == {
+        text: stub_guard.scores[text] for text in ("Attack Now", "hello there", "maybe bad")
+    }
+    assert core._detect_unique([]) == {} and len(core.guard.calls) == 1
+
+
+def test_duplicates_are_scattered_back_in_input_order(variants_core, stub_guard):
+    core = variants_core()
+    prompts = ["Hello There", "Attack Now", "Hello There", "MAYBE BAD", "Attack Now"]
+
+    results = core.decide(prompts)
+
+    texts = [text for call in core.guard.calls for text in call]
+    assert sorted(texts) == sorted(set(texts)) == sorted({*prompts, *(p.lower() for p in prompts)})
+    assert [r.verdict for r in results] == ["ALLOW", "BLOCK", "ALLOW", "BLOCK", "BLOCK"]
+    assert [r.score for r in results] == [
+        max(stub_guard.scores[p], stub_guard.scores[p.lower()]) for p in prompts
+    ]
+
+
+def test_cascade_skips_raw_only_for_confident_scores(variants_core, stub_guard):
+    core = variants_core(cascade=True)
+    prompts = ["Attack Now", "Hello There", "MAYBE BAD", "Quiet Raw", "MAYBE BAD"]
+
+    results = core.decide(prompts)
+
+    # normalized variants first, then only the raw variants of uncertain ones
+    assert core.guard.calls == [["attack now", "hello there", "maybe bad", "quiet raw"], ["MAYBE BAD", "Quiet Raw"]]
+    assert [r.verdict for r in results] == ["BLOCK", "ALLOW", "BLOCK", "ALLOW", "BLOCK"]
+    assert results[2].score == stub_guard.scores["MAYBE BAD"]
+    assert results[3].score == stub_guard.scores["quiet raw"]
+
+
+@pytest.mark.parametrize("cascade", [False, True])
+def test_lowercase_prompt_is_scored_once(variants_core, stub_guard, cascade):
+    core = variants_core(cascade)
+    result, = core.decide(["maybe bad"])
+    assert core.guard.calls == [["maybe bad"]]
+    assert result.score == stub_guard.scores["maybe bad"]
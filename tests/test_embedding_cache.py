@@ -0,0 +1,113 @@
+import numpy as np
+
+from secure_prompt.guards.embedding_cache import EmbeddingCache
+
+
+def test_batch_dedup_and_hits(counting_encoder):
+    enc = counting_encoder(dim=8)
+    cache = EmbeddingCache("model", 8)
+    out = cache.encode(["a", "bb", "a", "ccc"], enc)
+    assert enc.calls == [["a", "bb", "ccc"]]
+    assert np.array_equal(out, enc.vectors(["a", "bb", "a", "ccc"]))
+
+    out = cache.encode(["bb", "dddd"], enc)
+    assert enc.calls[-1] == ["dddd"]
+    assert np.array_equal(out, enc.vectors(["bb", "dddd"]))
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 4
+
+
+def test_lru_eviction_keeps_recently_used(counting_encoder):
+    enc = counting_encoder(dim=8)
+    cache = EmbeddingCache("model", 8, max_entries=2)
+    cache.encode(["a"], enc)
+    cache.encode(["b"], enc)
+    cache.encode(["a"], enc)  # "a" becomes most recent
+    cache.encode(["c"], enc)  # evicts "b"
+    enc.calls.clear()
+    cache.encode(["a", "b"], enc)
+    assert enc.calls == [["b"]]
+
+
+def test_disk_tier_survives_restart(tmp_path, counting_encoder):
+    enc = counting_encoder(dim=8)
+    EmbeddingCache("model", 8, disk_dir=str(tmp_path)).encode(["x", "yy"], enc)
+
+    restarted = EmbeddingCache("model", 8, disk_dir=str(tmp_path))
+    enc.calls.clear()
+    out = restarted.encode(["yy", "x", "zzz"], enc)
+    assert enc.calls == [["zzz"]]
+    assert np.array_equal(out, enc.vectors(["yy", "x", "zzz"]))
+    assert restarted.stats()["disk_hits"] == 2
+
+
+def test_disk_tier_keys_ending_in_nul_bytes(tmp_path, counting_encoder):
+    cache = EmbeddingCache("model", 8, disk_dir=str(tmp_path))
+    text = next(f"t{i}" for i in range(10000) if cache.key(f"t{i}").endswith(b"\0"))
+    enc = counting_encoder(dim=8)
+    cache.encode([text], enc)
+
+    enc.calls.clear()
+    EmbeddingCache("model", 8, disk_dir=str(tmp_path)).encode([text], enc)
+    assert enc.calls == []
+
+
+def test_disk_tier_sees_other_writers(tmp_path, counting_encoder):
+    enc = counting_encoder(dim=8)
+    reader = EmbeddingCache("model", 8, disk_dir=str(tmp_path))
+    EmbeddingCache("model", 8, disk_dir=str(tmp_path)).encode(["shared"], enc)
+    enc.calls.clear()
+    reader.encode(["shared"], enc)
+    assert enc.calls == []
+
+
+def test_model_name_is_part_of_key(tmp_path, counting_encoder):
+    enc = counting_encoder(dim=8)
+    EmbeddingCache("model-a", 8, disk_dir=str(tmp_path)).encode(["x"], enc)
+    EmbeddingCache("model-b", 8, disk_dir=str(tmp_path)).encode(["x"], enc)
+    assert len(enc.calls) == 2
+
+
+def test_disk_tier_is_compacted_to_newest_entries(tmp_path, counting_encoder):
+    enc = counting_encoder(dim=8)
+    cache = EmbeddingCache("model", 8, disk_dir=str(tmp_path), max_disk_entries=10)
+    texts = [f"text {i}" for i in range(11)]
+    for text in texts:
+        cache.encode([text], enc)
+
+    assert len(cache.disk) == 5
+    cache.clear()
+    enc.calls.clear()
+    cache.encode(texts[-5:], enc)
+    assert enc.calls == []
+    cache.encode(texts[:1], enc)
+    assert enc.calls == [texts[:1]]
+
+
+def test_compaction_by_another_process_is_picked_up(tmp_path, counting_encoder):
+    enc = counting_encoder(dim=8)
+    reader = EmbeddingCache("model", 8, disk_dir=str(tmp_path))
+    writer = EmbeddingCache("model", 8, disk_dir=str(tmp_path), max_disk_entries=4)
+    writer.encode(["a", "b", "c"], enc)
+    writer.encode(["d", "e"], enc)  # 5 записей > 4: остаются две новейшие
+
+    enc.calls.clear()
+    assert np.array_equal(reader.encode(["e"], enc), enc.vectors(["e"]))
+    assert enc.calls == [] and len(reader.disk) == 2
+
+
+def test_refresh_rereads_only_changed_file(tmp_path, monkeypatch, counting_encoder):
+    from secure_prompt.guards import embedding_cache
+
+    enc = counting_encoder(dim=8)
+    cache = EmbeddingCache("model", 8, disk_dir=str(tmp_path))
+    cache.encode(["x"], enc)
+    cache.disk.refresh()
+
+    maps = []
+    memmap = np.memmap
+    monkeypatch.setattr(embedding_cache.np, "memmap", lambda *args, **kwargs: maps.append(1) or memmap(*args, **kwargs))
+    cache.encode(["y", "z"], enc)
+    cache.disk.refresh()
+    cache.disk.refresh()
+    assert len(maps) == 1
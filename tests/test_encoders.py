@@ -0,0 +1,176 @@
+import numpy as np
+import pytest
+
+from secure_prompt.guards.encoders import (
+    BatchedEncoder, OnnxEncoder, create_encoder, encoder_cache_id, plan_batches
+)
+
+
+def test_cache_id_separates_quantized_encoders():
+    assert encoder_cache_id("m", "sentence_transformers") == "m"
+    assert encoder_cache_id("m", "torch", {"num_threads": 4}) == "m"
+    ids = {
+        encoder_cache_id("m", "torch", {"quantize": True}),
+        encoder_cache_id("m", "onnx"),
+        encoder_cache_id("m", "onnx", {"quantize": False}),
+    }
+    assert len(ids) == 3 and "m" not in ids
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_encoder("m", "tensorrt")
+
+
+def test_plan_batches_respects_token_budget():
+    lengths = [512] + [8] * 31 + [40, 300]
+    batches = plan_batches(lengths, max_tokens=1024)
+
+    covered = np.concatenate(batches)
+    assert sorted(covered.tolist()) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) == 1 or len(batch) * max(lengths[i] for i in batch) <= 1024
+    # короткие тексты не дополняются до длины 512-токенного
+    assert not any(0 in batch and len(batch) > 1 for batch in batches)
+
+    fixed = plan_batches(lengths, batch_size=32)
+    assert [len(batch) for batch in fixed] == [32, 2]
+
+
+class LengthEncoder(BatchedEncoder):
+    dim = 2
+    max_seq_length = 128
+
+    def __init__(self):
+        self.batches = []
+
+    def _encode_batch(self, texts):
+        self.batches.append(texts)
+        lengths = np.array([len(t) for t in texts], dtype=np.float32)
+        return np.stack([lengths, np.ones_like(lengths)], axis=1)
+
+
+def test_batched_encoder_keeps_input_order():
+    texts = ["x" * 400, "a", "bb", "x" * 200, "ccc"]
+    encoder = LengthEncoder()
+    out = encoder.encode(texts, max_tokens=128)
+
+    np.testing.assert_array_equal(out[:, 0], [len(t) for t in texts])
+    assert encoder.batches[0] == ["a", "bb", "ccc"]
+    assert all(len(batch) == 1 for batch in encoder.batches[1:])
+
+
+def onnx_pooler(pooling):
+    # пулинг проверяется без onnxruntime: сессия не нужна
+    encoder = object.__new__(OnnxEncoder)
+    encoder.pooling = pooling
+    return encoder
+
+
+@pytest.mark.parametrize("pooling", ["mean", "cls", "max"])
+def test_onnx_pooling_ignores_padding(pooling):
+    rng = np.random.default_rng(0)
+    hidden = rng.normal(size=(2, 5, 8)).astype(np.float32)
+    mask = np.array([[1, 1, 1, 0, 0], [1, 1, 1, 1, 1]], dtype=np.float32)
+
+    pooled = onnx_pooler(pooling)._pool(hidden, mask)
+    short = onnx_pooler(pooling)._pool(hidden[:1, :3], mask[:1, :3])
+
+    np.testing.assert_allclose(pooled[0], short[0], rtol=1e-5)
+    np.testing.assert_allclose(np.linalg.norm(pooled, axis=1), 1.0, rtol=1e-5)
+
+
+class FakeTokenizer:
+    """Токен - слово; id - номер в словаре; [CLS] = 1 в начале, паддинг id 0 справа"""
+
+    def __init__(self):
+        self.vocab = {}
+        self.calls = []
+
+    def __call__(self, texts, add_special_tokens=True, truncation=False, max_length=None, padding=False, return_tensors=None):
+        self.calls.append({"truncation": truncation, "max_length": max_length})
+        ids = [[self.vocab.setdefault(word, len(self.vocab) + 2) for word in text.split()] for text in texts]
+        if add_special_tokens:
+            ids = [[1] + row for row in ids]
+        if truncation:
+            ids = [row[:max_length] for row in ids]
+        if not padding:
+            return {"input_ids": ids}
+        width = max(len(row) for row in ids)
+        return {
+            "input_ids": np.array([row + [0] * (width - len(row)) for row in ids], dtype=np.int32),
+            "attention_mask": np.array([[1] * len(row) + [0] * (width - len(row)) for row in ids], dtype=np.int32),
+            "token_type_ids": np.zeros((len(ids), width), dtype=np.int32),
+        }
+
+
+class FakeSession:
+    """Скрытое состояние токена - строка таблицы по id; паддинг заполнен большими значениями"""
+
+    def __init__(self, dim=8):
+        self.table = np.random.default_rng(1).normal(size=(100, dim)).astype(np.float32)
+        self.table[0] = 1e3
+        self.feeds = []
+
+    def run(self, outputs, feeds):
+        self.feeds.append(feeds)
+        return [self.table[feeds["input_ids"]]]
+
+
+def onnx_encoder(pooling, max_seq_length=16):
+    encoder = object.__new__(OnnxEncoder)
+    encoder.pooling = pooling
+    encoder.max_seq_length = max_seq_length
+    encoder.dim = 8
+    encoder.session = FakeSession()
+    encoder.input_names = {"input_ids", "attention_mask"}
+    encoder.tokenizer = FakeTokenizer()
+    return encoder
+
+
+def expected_embedding(encoder, text, pooling):
+    ids = [1] + [encoder.tokenizer.vocab[word] for word in text.split()]
+    ids = ids[:encoder.max_seq_length]
+    hidden = encoder.session.table[ids]
+    pooled = {"mean": hidden.mean(axis=0), "cls": hidden[0], "max": hidden.max(axis=0)}[pooling]
+    return pooled / np.linalg.norm(pooled)
+
+
+@pytest.mark.parametrize("pooling", ["mean", "cls", "max"])
+def test_onnx_encoder_with_fake_session(pooling):
+    encoder = onnx_encoder(pooling)
+    texts = ["one two three four five six", "short", "one two", "a much longer text " * 5]
+
+    out = encoder.encode(texts, batch_size=2)
+
+    assert out.shape == (len(texts), 8) and out.dtype == np.float32
+    for text, row in zip(texts, out):
+        np.testing.assert_allclose(row, expected_embedding(encoder, text, pooling), rtol=1e-5, atol=1e-6)
+    # в сессию уходят только её входы, в int64; длинный текст усечён до max_seq_length
+    for feeds in encoder.session.feeds:
+        assert set(feeds) == {"input_ids", "attention_mask"}
+        assert all(value.dtype == np.int64 for value in feeds.values())
+        assert feeds["input_ids"].shape[1] <= encoder.max_seq_length
+    assert all(call["truncation"] and call["max_length"] == 16 for call in encoder.tokenizer.calls[1:])
+
+
+def test_onnx_count_tokens_uses_tokenizer():
+    encoder = onnx_encoder("mean", max_seq_length=4)
+    text = "a b c d e f g"
+    assert encoder.count_tokens([text, "x"]) == [7, 1]
+    assert encoder.token_lengths([text, "x"]).tolist() == [4, 2]
+
+
+def test_calibration_reports():
+    from ML.calibrate_encoder import cosine_drift, parse_options, verdict_changes
+
+    assert parse_options(["quantize=true", "num_threads=4", "onnx_dir=/tmp/x"]) == {
+        "quantize": True, "num_threads": 4, "onnx_dir": "/tmp/x"
+    }
+
+    reference = np.eye(4, dtype=np.float32)
+    assert cosine_drift(reference, reference)["max"] == pytest.approx(0.0)
+    assert cosine_drift(reference, reference[::-1])["mean"] == pytest.approx(1.0)
+
+    changes = verdict_changes(np.array([True, True, False, False]), np.array([True, False, True, True]))
+    assert changes == {"blocked_reference": 2, "blocked_candidate": 3, "allow_to_block": 2, "block_to_allow": 1}
@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+
+from ML import dataset
+from ML.dataset import FeatureExtractor
+from secure_prompt.guards.linear_model import LinearScorer
+from secure_prompt.guards.ml_guard import MLGuard
+from secure_prompt.guards.templates import TemplateBank, TemplateSet
+from secure_prompt.guards.vector_features import VectorFeatureExtractor
+
+
+def unit(seed, dim=8):
+    v = np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def vector_extractor(search_k=None):
+    extractor = object.__new__(VectorFeatureExtractor)
+    extractor.bank = TemplateBank(TemplateSet(
+        embeddings=np.stack([unit(i) for i in range(4)]),
+        texts=["t0", "t1", "t2", "t3"],
+        categories=["a", "a", "b", "b"],
+        weights=[1.0, 1.0, 1.0, 1.0],
+    ))
+    extractor.feature_config = {
+        'include_template_scores': search_k is None,
+        'include_stats': True,
+        'include_top_k': True,
+        'include_category_scores': True
+    }
+    extractor.search_k = search_k
+    extractor.chunk_config = None
+    extractor.get_text_embeddings = lambda texts, *args: np.stack([unit(100 + len(t)) for t in texts])
+    return extractor
+
+
+@pytest.fixture
+def static(monkeypatch):
+    n = dataset._static_extractor.n_features
+
+    def extract_into(texts, out):
+        out[:] = [[float(len(text))] * n for text in texts]
+
+    monkeypatch.setattr(dataset._static_extractor, "extract_into", extract_into)
+    return n
+
+
+def test_static_and_vector_blocks_share_one_matrix(static):
+    vector = vector_extractor()
+    extractor = FeatureExtractor(init_vector=False)
+    extractor.vector_feats_extractor = vector
+    texts = ["a", "bb", "ccc"]
+
+    features = extractor.extract_features(texts, use_vector=True)
+
+    assert features.dtype == np.float32
+    assert features.shape == (3, static + vector.feature_dim)
+    np.testing.assert_array_equal(features[:, 0], [1.0, 2.0, 3.0])
+    np.testing.assert_array_equal(features[:, static:], vector.extract_features_batch(texts))
+    assert extractor.extract_features(texts).shape == (3, static)
+
+
+@pytest.mark.parametrize("search_k", [None, 2])
+def test_vector_features_are_written_into_out(search_k):
+    extractor = vector_extractor(search_k)
+    if search_k is not None:
+        state = extractor.bank.state
+
+        def search(config, x, k):
+            scores = x @ state.embeddings.T
+            ids = np.argsort(-scores, axis=1)[:, :k]
+            return state, np.take_along_axis(scores, ids, axis=1), ids
+
+        extractor.bank.search = search
+        extractor.index_config = None
+    matrix = np.full((2, extractor.feature_dim + 3), -1.0, dtype=np.float32)
+
+    result = extractor.extract_features_batch(["x", "yy"], out=matrix[:, 3:])
+
+    assert np.shares_memory(result, matrix)
+    np.testing.assert_array_equal(matrix[:, :3], -1.0)
+    np.testing.assert_array_equal(matrix[:, 3:], extractor.extract_features_batch(["x", "yy"]))
+
+
+def test_out_shape_is_checked():
+    extractor = vector_extractor()
+    with pytest.raises(ValueError):
+        extractor.extract_features_batch(["x"], out=np.empty((1, extractor.feature_dim + 1), dtype=np.float32))
+    with pytest.raises(ValueError):
+        extractor.extract_features_batch(["x"], out=np.empty((1, extractor.feature_dim)))
+
+
+def test_ml_results_hold_row_views(static):
+    guard = object.__new__(MLGuard)
+    guard.use_vector = False
+    guard.threshold = 1.0
+    guard.model = LinearScorer(np.full(static, 0.1), -0.5, np.array([0, 1]))
+    guard.feature_extractor = FeatureExtractor(init_vector=False)
+
+    results = guard.detect(["short", "a much longer prompt"])
+
+    assert results[0].features.base is results[1].features.base
+    assert results[1].features[0] == len("a much longer prompt")
+    assert results[1].score > results[0].score
+
+
+def test_concurrent_template_swap_uses_one_snapshot(static):
+    vector = vector_extractor()
+    extractor = FeatureExtractor(init_vector=False)
+    extractor.vector_feats_extractor = vector
+    before = vector.bank.state
+    encode = vector.get_text_embeddings
+
+    def encode_during_update(texts, *args):
+        # шаблон добавлен другим потоком, пока батч кодируется
+        vector.bank.state = TemplateSet(
+            embeddings=np.vstack([before.embeddings, unit(50)]),
+            texts=before.texts + ["t4"],
+            categories=before.categories + ["c"],
+            weights=before.weights + [1.0],
+            version=before.version + 1,
+        )
+        return encode(texts)
+
+    vector.get_text_embeddings = encode_during_update
+    features = extractor.extract_features(["a", "bb"], use_vector=True)
+
+    assert features.shape == (2, static + vector._compute_feature_dim(before))
+    vector.bank.state = before
+    vector.get_text_embeddings = encode
+    np.testing.assert_array_equal(features[:, static:], vector.extract_features_batch(["a", "bb"]))
+
+
+def test_precomputed_static_block_is_reused(static, monkeypatch):
+    vector = vector_extractor()
+    extractor = FeatureExtractor(init_vector=False)
+    extractor.vector_feats_extractor = vector
+    texts = ["a", "bb"]
+    lexical = extractor.extract_features(texts)
+
+    monkeypatch.setattr(dataset._static_extractor, "extract_into", lambda texts, out: pytest.fail("static features recomputed"))
+    features = extractor.extract_features(texts, use_vector=True, static=lexical)
+
+    np.testing.assert_array_equal(features[:, :static], lexical)
+    np.testing.assert_array_equal(features[:, static:], vector.extract_features_batch(texts))
+    with pytest.raises(ValueError):
+        extractor.extract_features(texts, use_vector=True, static=lexical[:1])
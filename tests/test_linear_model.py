@@ -0,0 +1,71 @@
+import math
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.svm import LinearSVC
+from sklearn.tree import DecisionTreeClassifier
+
+from secure_prompt.guards.linear_model import LinearScorer, export_linear_model
+from secure_prompt.guards.ml_guard import resolve_model_path
+
+
+def dataset(n_features=18):
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(200, n_features)) * 3
+    y = x[:, 0] + x[:, 1] > 0
+    return x, y
+
+
+def test_scorer_matches_sklearn(tmp_path):
+    x, y = dataset()
+    model = LogisticRegression(max_iter=1000, class_weight="balanced").fit(x, y)
+    path = tmp_path / "model.npz"
+    assert export_linear_model(model, path)
+
+    scorer = LinearScorer.load(path)
+    assert scorer.n_features_in_ == 18
+    assert np.allclose(scorer.predict_proba(x), model.predict_proba(x), rtol=1e-12, atol=1e-15)
+
+    probability, score = scorer.score_batch(x)
+    expected = [-math.log(1 - p + 1e-6) for p in model.predict_proba(x)[:, 1]]
+    assert np.allclose(score, expected, rtol=1e-12)
+    assert np.allclose(probability, model.predict_proba(x)[:, 1])
+
+
+@pytest.mark.parametrize("model", [DecisionTreeClassifier(max_depth=3), LinearSVC()])
+def test_non_logistic_models_are_not_exported(tmp_path, model):
+    x, y = dataset()
+    model.fit(x, y)
+    assert not export_linear_model(model, tmp_path / "model.npz")
+    assert not (tmp_path / "model.npz").exists()
+
+
+def test_npz_preferred_only_when_not_stale(tmp_path):
+    pkl, npz = tmp_path / "model.pkl", tmp_path / "model.npz"
+    pkl.write_bytes(b"")
+    assert resolve_model_path(pkl) == pkl.resolve()
+
+    npz.write_bytes(b"")
+    os.utime(pkl, ns=(0, 1_000))
+    os.utime(npz, ns=(0, 2_000))
+    assert resolve_model_path(pkl) == npz.resolve()
+
+    os.utime(pkl, ns=(0, 3_000))
+    assert resolve_model_path(pkl) == pkl.resolve()
+
+
+def test_npz_loads_without_sklearn(tmp_path):
+    x, y = dataset()
+    path = tmp_path / "model.npz"
+    export_linear_model(LogisticRegression().fit(x, y), path)
+    code = (
+        "import sys; from secure_prompt.guards.resources import load_model; "
+        f"m = load_model({str(path)!r}); m.predict_proba([[0.0] * 18]); "
+        "assert 'sklearn' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=Path(__file__).resolve().parents[1])
@@ -0,0 +1,103 @@
+import types
+
+import numpy as np
+import pytest
+
+from secure_prompt.audit.logger import SecurityLogger
+from secure_prompt.core import decision, metrics
+from secure_prompt.core.cache import VerdictCache
+
+
+@pytest.fixture
+def collector():
+    hook = metrics.InMemoryMetrics()
+    previous = metrics.set_metrics(hook)
+    yield hook
+    metrics.set_metrics(previous)
+
+
+def test_disabled_hook_is_a_shared_noop():
+    assert not metrics.get_metrics().enabled
+    assert metrics.stage("a", 3) is metrics.stage("b")
+    with metrics.stage("a"):
+        pass
+    metrics.count("c")
+
+
+def test_histogram_and_prometheus_text(collector):
+    collector.observe("encode", 0.003, 8)
+    collector.observe("encode", 0.2, 4)
+    collector.observe("encode", 60.0, 1)
+    collector.count("embedding_cache.misses", 5)
+
+    snapshot = collector.snapshot()["stages"]["encode"]
+    assert snapshot["count"] == 3 and snapshot["items"] == 13
+    assert sum(snapshot["buckets"]) == 3 and snapshot["buckets"][-1] == 1
+
+    text = collector.to_prometheus()
+    assert '# TYPE secure_prompt_stage_seconds histogram' in text
+    assert 'secure_prompt_stage_seconds_bucket{stage="encode",le="0.005"} 1' in text
+    assert 'secure_prompt_stage_seconds_bucket{stage="encode",le="0.25"} 2' in text
+    assert 'secure_prompt_stage_seconds_bucket{stage="encode",le="+Inf"} 3' in text
+    assert 'secure_prompt_stage_seconds_count{stage="encode"} 3' in text
+    assert 'secure_prompt_stage_items_total{stage="encode"} 13' in text
+    assert 'secure_prompt_embedding_cache_misses_total 5' in text
+
+    collector.reset()
+    assert collector.to_prometheus() == ""
+
+
+def test_write_prometheus(collector, tmp_path):
+    collector.observe("rules", 0.001, 2)
+    path = tmp_path / "secure_prompt.prom"
+    collector.write_prometheus(str(path))
+    assert path.read_text(encoding="utf-8") == collector.to_prometheus()
+    assert [p.name for p in tmp_path.iterdir()] == ["secure_prompt.prom"]
+
+
+class NullStorage:
+    def write(self, event):
+        pass
+
+    def write_many(self, events):
+        pass
+
+
+def test_decision_core_reports_stages(collector, make_core, monkeypatch):
+    monkeypatch.setattr(decision.DecisionCore, "_fingerprint", lambda self: None)
+    core = make_core(logger=SecurityLogger(NullStorage()), verdict_cache=VerdictCache())
+
+    core.decide(["first prompt", "second prompt"])
+    core.decide(["first prompt"])
+
+    stages = collector.snapshot()["stages"]
+    assert stages["decision"]["count"] == 2 and stages["decision"]["items"] == 3
+    assert stages["preprocess"]["items"] == 3
+    assert stages["audit.write"]["items"] == 3
+    assert collector.counters == {
+        "verdict_cache.hits": 1,
+        "verdict_cache.misses": 2,
+        "decision.tier.lexical": 2,
+    }
+
+
+def test_nltk_and_similarity_stages(collector, monkeypatch):
+    from ML import dataset
+    from secure_prompt.guards.templates import TemplateSet
+    from secure_prompt.guards.vector_features import VectorFeatureExtractor
+
+    static = dataset.StaticFeatureExtractor()
+    static._stops_en = static._stops_ru = frozenset()
+    static._tagger = types.SimpleNamespace(tag=lambda words: [(word, "NN") for word in words])
+    monkeypatch.setattr(dataset, "word_tokenize", str.split)
+    features = static.extract_batch(["ignore all rules", "hi"])
+    assert features[0, -2] == 1.0  # noun_ratio from the batch tagger
+
+    vector = object.__new__(VectorFeatureExtractor)
+    state = TemplateSet(embeddings=np.eye(4, dtype=np.float32), texts=list("abcd"), categories=list("aabb"), weights=[1.0] * 4)
+    vector._compute_similarities_batch(np.ones((3, 4), dtype=np.float32), state)
+
+    stages = collector.snapshot()["stages"]
+    assert stages["features.tokenize"]["items"] == 2
+    assert stages["features.pos_tag"]["count"] == 1 and stages["features.pos_tag"]["items"] == 2
+    assert stages["vector.similarity"]["items"] == 3
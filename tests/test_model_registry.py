@@ -0,0 +1,152 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from secure_prompt.core.registry import ModelRegistry
+from secure_prompt.guards.linear_model import FORMAT_VERSION
+
+
+def fit(n_features=4, flip=False):
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(64, n_features))
+    y = (x[:, 0] > 0) != flip
+    return LogisticRegression().fit(x, y)
+
+
+def save(path, obj):
+    path.write_bytes(pickle.dumps(obj))
+    # mtime granularity can hide two writes within the same tick
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def files(tmp_path):
+    model, env = tmp_path / "model.pkl", tmp_path / ".env"
+    save(model, fit())
+    env.write_text("ML_JAIL_SCORE=2.0\nVECTOR_JAIL_SCORE=0.8\nPP1=2.2\nPP2=3.8\n")
+    return model, env
+
+
+def test_swap_on_change(files):
+    model, env = files
+    registry = ModelRegistry(model, config_path=str(env))
+    first = registry.current
+    assert first.policy == (2.2, 3.8)
+    assert not registry.check()
+
+    save(model, fit(flip=True))
+    assert registry.check()
+    assert registry.current.tag != first.tag
+    assert registry.history == [first]
+
+    env.write_text("ML_JAIL_SCORE=2.0\nVECTOR_JAIL_SCORE=0.8\nPP1=2.5\nPP2=3.8\n")
+    os.utime(env, ns=(0, 1))
+    assert registry.check()
+    assert registry.current.policy == (2.5, 3.8)
+    assert registry.current.tag.split(".")[0] == registry.history[-1].tag.split(".")[0]
+
+
+@pytest.mark.parametrize("bad", [b"not a pickle", pickle.dumps({"weights": [1, 2]}), pickle.dumps(fit(n_features=5))])
+def test_invalid_version_is_rejected(files, bad):
+    model, env = files
+    registry = ModelRegistry(model, config_path=str(env))
+    tag = registry.current.tag
+    model.write_bytes(bad)
+    os.utime(model, ns=(0, 1))
+    assert not registry.check()
+    assert registry.current.tag == tag
+    assert registry.rejected == 1
+    # not retried until the file changes again
+    assert not registry.check()
+    assert registry.rejected == 1
+
+
+def test_newer_npz_export_wins_over_pickle(files):
+    model, env = files
+    npz = model.with_suffix(".npz")
+    np.savez(npz, format_version=FORMAT_VERSION, coef=np.ones(4), intercept=0.0, classes=np.array([0, 1]))
+    stat = os.stat(model)
+    os.utime(npz, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    registry = ModelRegistry(model, config_path=str(env))
+    assert registry.current.model_path == str(npz)
+    np.testing.assert_array_equal(registry.current.model.coef, np.ones(4))
+
+    # a retrained pickle is newer than the export again
+    save(model, fit(flip=True))
+    assert registry.check()
+    assert registry.current.model_path == str(model)
+
+
+def test_rollback_ignores_file_until_it_changes(files):
+    model, env = files
+    registry = ModelRegistry(model, config_path=str(env))
+    first = registry.current
+    save(model, fit(flip=True))
+    registry.check()
+
+    assert registry.rollback() is first
+    assert registry.current is first
+    assert not registry.check()
+    with pytest.raises(RuntimeError):
+        registry.rollback()
+
+
+def test_pickled_registry_reloads_from_files(files):
+    model, env = files
+    registry = ModelRegistry(model, config_path=str(env), poll_interval=0.01).start()
+    try:
+        restored = pickle.loads(pickle.dumps(registry))
+        assert restored.current.tag == registry.current.tag
+        assert restored._thread is not None
+        restored.stop()
+    finally:
+        registry.stop()
+
+
+@pytest.fixture
+def model_guard(stub_guard):
+    # scores come from the model the registry activated
+    def score(self, text):
+        p = self.model.predict_proba(np.ones((1, 4)))[0, 1]
+        return -np.log(1 - p + 1e-6)
+
+    stub_guard.score = score
+    stub_guard.n_features = 4
+    return stub_guard
+
+
+def test_decision_core_swaps_between_batches(files, model_guard, make_core, audit_log):
+    model, env = files
+    registry = ModelRegistry(model, config_path=str(env))
+    core = make_core(registry=registry)
+
+    before = core.decide(["hello"])[0].score
+    save(model, fit(flip=True))
+    registry.check()
+    after = core.decide(["hello"])[0].score
+
+    assert before != after
+    assert [r["model_version"] for r in audit_log.records] == [registry.history[-1].tag, registry.current.tag]
+    assert core.jail_score == 2.2
+
+
+def test_decision_core_rejects_model_of_other_width(files, model_guard, make_core):
+    model, env = files
+    wide = model.with_name("wide.pkl")
+    save(wide, fit(n_features=5))
+    with pytest.raises(ValueError):
+        make_core(registry=ModelRegistry(wide, config_path=str(env)))
+
+    core = make_core(registry=ModelRegistry(model, config_path=str(env)))
+    first = core.version
+    # the first version of a registry is not compared with anything
+    core.registry = ModelRegistry(wide, config_path=str(env))
+
+    core.decide(["hello"])
+    assert core.version is first and core.guard.model is first.model
+    assert core._rejected is core.registry.current
@@ -0,0 +1,66 @@
+import os
+
+from secure_prompt.core.decision import DecisionResult
+from secure_prompt.core.parallel import ParallelDecisionCore
+
+
+class PidCore:
+    def decide(self, prompts):
+        return [
+            DecisionResult(verdict="BLOCK" if "ignore" in p else "ALLOW", score=float(os.getpid()), reason=[p])
+            for p in prompts
+        ]
+
+
+def test_results_keep_input_order():
+    prompts = [f"prompt {i}" + (" ignore" if i % 7 == 0 else "") for i in range(1000)]
+    with ParallelDecisionCore(PidCore(), workers=4, chunk_size=37) as core:
+        results = core.decide(prompts)
+
+    assert [r.reason[0] for r in results] == prompts
+    assert [r.verdict for r in results] == ["BLOCK" if "ignore" in p else "ALLOW" for p in prompts]
+    assert os.getpid() not in {r.score for r in results}
+
+
+def test_decide_iter_streams_generators():
+    with ParallelDecisionCore(PidCore(), workers=2, chunk_size=10) as core:
+        results = list(core.decide_iter(f"p{i}" for i in range(25)))
+
+    assert [r.reason[0] for r in results] == [f"p{i}" for i in range(25)]
+
+
+def test_empty_input():
+    with ParallelDecisionCore(PidCore(), workers=2) as core:
+        assert core.decide([]) == []
+
+
+class RecordingLogger:
+    def __init__(self):
+        self.prompts = []
+
+    def log_input_checks(self, raw_prompts, **kwargs):
+        self.prompts.extend(raw_prompts)
+
+
+class LoggingCore(PidCore):
+    def __init__(self):
+        self.logger = RecordingLogger()
+        self.warmed_in = None
+
+    def warm_up(self):
+        self.warmed_in = os.getpid()
+
+    def decide(self, prompts):
+        results = super().decide(prompts)
+        self.logger.log_input_checks(raw_prompts=prompts, decisions=[r.verdict for r in results])
+        return results
+
+
+def test_workers_audit_through_parent_logger():
+    core = LoggingCore()
+    prompts = [f"p{i}" for i in range(50)]
+    with ParallelDecisionCore(core, workers=3, chunk_size=7, start_method="fork") as parallel:
+        parallel.decide(prompts)
+
+    assert core.warmed_in == os.getpid()
+    assert core.logger.prompts == prompts
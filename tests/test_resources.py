@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from secure_prompt.core import decision
+from secure_prompt.guards import ml_guard, resources
+from secure_prompt.guards.linear_model import FORMAT_VERSION
+from secure_prompt.guards.ml_guard import MLGuard
+from secure_prompt.guards.templates import TemplateBank
+
+SINGLETONS = (resources.get_encoder, resources.get_template_bank, resources.get_embedding_cache, resources._load_model_file)
+
+
+@pytest.fixture
+def calls(tmp_path, monkeypatch):
+    # empty per-process singletons for the test, restored afterwards
+    saved = [dict(get.cache) for get in SINGLETONS]
+    for get in SINGLETONS:
+        get.cache.clear()
+    monkeypatch.chdir(tmp_path)
+
+    model_file = tmp_path / "model.npz"
+    np.savez(model_file, format_version=FORMAT_VERSION, coef=np.zeros(4), intercept=0.0, classes=np.array([0, 1]))
+    monkeypatch.setattr(ml_guard, "resolve_model_path", lambda path: model_file)
+
+    counts = {"model": 0, "encoder": 0, "bank": 0}
+
+    def counted(name, func):
+        def wrapper(*args, **kwargs):
+            counts[name] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(resources, "parse_model", counted("model", resources.parse_model))
+    monkeypatch.setattr(resources, "create_encoder", counted("encoder", resources.create_encoder))
+    monkeypatch.setattr(TemplateBank, "load", classmethod(counted("bank", TemplateBank.load.__func__)))
+    yield counts
+
+    for get, cache in zip(SINGLETONS, saved):
+        get.cache.clear()
+        get.cache.update(cache)
+
+
+def test_guards_load_no_encoder_or_templates_until_used(calls, audit_log):
+    guard = MLGuard(use_vector=True)
+    core = decision.DecisionCore(use_vector=True, logger=audit_log)
+
+    assert calls == {"model": 1, "encoder": 0, "bank": 0}
+    assert core.guard.model is guard.model
+
+
+def test_extractors_share_process_singletons(calls, audit_log):
+    guard = MLGuard(use_vector=True)
+    core = decision.DecisionCore(use_vector=True, logger=audit_log)
+
+    first = guard.feature_extractor.get_vector_extractor()
+    second = core.guard.feature_extractor.get_vector_extractor()
+
+    assert first is not second
+    assert first.bank is second.bank
+    assert first.embedding_cache is second.embedding_cache
+    assert first.model is second.model
+    assert calls == {"model": 1, "encoder": 1, "bank": 1}
+
+
+def test_retrained_model_is_reloaded(calls, tmp_path):
+    first = MLGuard(use_vector=False)
+    assert MLGuard(use_vector=False).model is first.model
+
+    # train.py атомарно заменяет файл модели
+    np.savez(tmp_path / "new.npz", format_version=FORMAT_VERSION, coef=np.ones(4), intercept=0.0, classes=np.array([0, 1]))
+    (tmp_path / "new.npz").replace(tmp_path / "model.npz")
+
+    second = MLGuard(use_vector=False)
+    assert second.model is not first.model
+    np.testing.assert_array_equal(second.model.coef, np.ones(4))
+    assert calls["model"] == 2
+    assert len(resources._load_model_file.cache) == 1
@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+
+from secure_prompt.guards.index import normalize_index_config
+from secure_prompt.guards.templates import TemplateBank
+
+
+def _templates(n, prefix="t"):
+    return [(f"{prefix}{i}", "abc"[i % 3], 1.0 + i % 2) for i in range(n)]
+
+
+def test_only_new_templates_are_encoded(tmp_path, counting_encoder):
+    enc = counting_encoder()
+    TemplateBank.load(_templates(10), enc, str(tmp_path), "model")
+    assert enc.calls == [[f"t{i}" for i in range(10)]]
+
+    enc.calls.clear()
+    bank = TemplateBank.load(_templates(12), enc, str(tmp_path), "model")
+    assert enc.calls == [["t10", "t11"]]
+    assert bank.state.embeddings.shape == (12, 16)
+
+    enc.calls.clear()
+    TemplateBank.load(_templates(12), enc, str(tmp_path), "other-model")
+    assert len(enc.calls) == 1
+
+
+def test_runtime_updates_keep_arrays_consistent(tmp_path, counting_encoder):
+    enc = counting_encoder()
+    bank = TemplateBank.load(_templates(6), enc, str(tmp_path), "model")
+    before = bank.state
+
+    bank.add_templates([("t1", "z", 3.0), ("new", "z", 2.0)])
+    bank.remove_templates(["t0"])
+    state = bank.state
+    assert state.version == before.version + 2
+    assert state.texts == ["t1", "t2", "t3", "t4", "t5", "new"]
+    assert state.unique_categories == ["a", "b", "c", "z"]
+    assert state.weight_array[0] == 3.0
+    assert enc.calls[-1] == ["new"]
+    assert np.array_equal(state.embeddings[:5], before.embeddings[1:])
+
+    # снимок не меняется после обновления
+    assert before.texts[0] == "t0"
+    assert bank.sync_templates(state.entries) is state
+
+
+def test_synced_bank_matches_fresh_load(tmp_path, counting_encoder):
+    enc = counting_encoder()
+    bank = TemplateBank.load(_templates(8), enc, str(tmp_path), "model")
+    target = _templates(8)[::-2] + _templates(3, prefix="n")
+    bank.sync_templates(target)
+
+    fresh = TemplateBank.load(target, counting_encoder(), str(tmp_path), "model")
+    assert fresh.store.encoded == 0
+    assert fresh.state.digest == bank.state.digest
+    assert np.array_equal(fresh.state.embeddings, bank.state.embeddings)
+
+
+@pytest.mark.parametrize("index_config", [
+    {"use_faiss": False},
+    {"type": "flat"},
+    {"type": "ivf", "nlist": 4, "nprobe": 4},
+    {"type": "hnsw", "ef_search": 512},
+])
+def test_index_follows_updates(tmp_path, index_config, counting_encoder):
+    if index_config.get("use_faiss", True):
+        pytest.importorskip("faiss")
+    enc = counting_encoder()
+    bank = TemplateBank.load(_templates(200), enc, str(tmp_path), "model")
+    config = normalize_index_config(index_config)
+    queries = enc(["q1", "q2", "q3"])
+    bank.search(config, queries, 5)
+
+    bank.add_templates(_templates(20, prefix="n"))
+    bank.remove_templates([f"t{i}" for i in range(0, 200, 3)])
+    state, scores, ids = bank.search(config, queries, 5)
+
+    expected = np.argsort(-(queries @ state.embeddings.T), axis=1)[:, :5]
+    assert state is bank.state
+    assert np.array_equal(ids, expected)
+
+
+def _guard(extractor, monkeypatch):
+    from ML import dataset
+    from ML.dataset import FeatureExtractor
+    from secure_prompt.guards.linear_model import LinearScorer
+    from secure_prompt.guards.ml_guard import MLGuard
+
+    n_static = dataset._static_extractor.n_features
+    monkeypatch.setattr(dataset._static_extractor, "extract_into", lambda texts, out: out.fill(0.0))
+    guard = object.__new__(MLGuard)
+    guard.use_vector = True
+    guard.threshold = 1.0
+    guard.model = LinearScorer(np.full(n_static + extractor.feature_dim, 0.1), 0.0, np.array([0, 1]))
+    guard.feature_extractor = FeatureExtractor(init_vector=False)
+    guard.feature_extractor.vector_feats_extractor = extractor
+    return guard
+
+
+TEMPLATE_DICTS = [{"text": f"t{i}", "category": "ab"[i % 2]} for i in range(4)]
+
+
+def test_width_changing_update_is_rejected(tmp_path, monkeypatch):
+    from secure_prompt.guards.vector_features import VectorFeatureExtractor
+
+    extractor = VectorFeatureExtractor(templates=TEMPLATE_DICTS, cache_dir=str(tmp_path))
+    guard = _guard(extractor, monkeypatch)
+
+    with pytest.raises(ValueError):
+        extractor.bank.add_templates([("new", "a", 1.0)])
+    with pytest.raises(ValueError):
+        extractor.bank.sync_templates([("t0", "a", 1.0), ("t1", "b", 1.0), ("t2", "a", 1.0), ("x", "b", 1.0)])
+    extractor.bank.add_templates([("t1", "b", 2.0)])  # вес столбца не меняет раскладку
+    assert guard.detect(["some prompt"])[0].features.shape == (guard.model.n_features_in_,)
+
+
+def test_category_only_layout_accepts_new_templates(tmp_path, monkeypatch):
+    from secure_prompt.guards.vector_features import VectorFeatureExtractor
+
+    extractor = VectorFeatureExtractor(
+        templates=TEMPLATE_DICTS,
+        cache_dir=str(tmp_path),
+        feature_config={'include_template_scores': False, 'include_stats': True,
+                        'include_top_k': True, 'include_category_scores': True},
+    )
+    guard = _guard(extractor, monkeypatch)
+
+    extractor.bank.add_templates([("new", "a", 1.0)])
+    assert guard.detect(["some prompt"])[0].features.shape == (guard.model.n_features_in_,)
+    with pytest.raises(ValueError):
+        extractor.bank.add_templates([("other", "c", 1.0)])
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from secure_prompt.guards.index import TemplateIndex, normalize_index_config
+
+
+def _embeddings(n=200, dim=16, seed=0):
+    emb = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return emb / np.linalg.norm(emb, axis=1, keepdims=True)
+
+
+def test_normalize_index_config_rejects_unknown():
+    with pytest.raises(ValueError):
+        normalize_index_config({"type": "lsh"})
+    with pytest.raises(ValueError):
+        normalize_index_config({"nprob": 4})
+    assert normalize_index_config({"type": "ivf"}) == normalize_index_config({"type": "ivf", "nprobe": 16})
+
+
+def test_numpy_flat_matches_exact_topk():
+    emb = _embeddings()
+    queries = _embeddings(5, seed=1)
+    index = TemplateIndex(emb, normalize_index_config({"use_faiss": False}))
+    scores, ids = index.search(queries, 10)
+
+    sims = queries @ emb.T
+    expected = np.argsort(-sims, axis=1)[:, :10]
+    assert np.array_equal(ids, expected)
+    assert np.allclose(scores, np.take_along_axis(sims, expected, axis=1))
+
+
+def test_trained_index_persists(tmp_path):
+    pytest.importorskip("faiss")
+    emb = _embeddings(400)
+    config = normalize_index_config({"type": "ivf", "nprobe": 64})
+    first = TemplateIndex(emb, config, cache_dir=str(tmp_path))
+    assert len(list(tmp_path.glob("index_ivf_*.faiss"))) == 1
+
+    second = TemplateIndex(emb, config, cache_dir=str(tmp_path))
+    queries = _embeddings(3, seed=2)
+    assert np.array_equal(first.search(queries, 5)[1], second.search(queries, 5)[1])
+
+
+def _extractor(bank, feature_config, search_k=None, index_config=None):
+    from secure_prompt.guards.vector_features import VectorFeatureExtractor
+
+    extractor = object.__new__(VectorFeatureExtractor)
+    extractor.bank = bank
+    extractor.feature_config = feature_config
+    extractor.search_k = search_k
+    extractor.index_config = index_config
+    extractor.chunk_config = None
+    extractor.get_text_embeddings = lambda texts, *args: _embeddings(len(texts), seed=3)
+    return extractor
+
+
+@pytest.mark.parametrize("category_agg", ["mean", "max"])
+@pytest.mark.parametrize("use_faiss", [False, True])
+def test_search_k_over_all_templates_matches_dense_features(category_agg, use_faiss):
+    if use_faiss:
+        pytest.importorskip("faiss")
+    from secure_prompt.guards.templates import TemplateBank, TemplateSet
+
+    n = 40
+    bank = TemplateBank(TemplateSet(
+        embeddings=_embeddings(n),
+        texts=[f"t{i}" for i in range(n)],
+        categories=[("override", "roleplay", "system")[i % 3] for i in range(n)],
+        weights=[0.5 + (i % 4) * 0.25 for i in range(n)],
+    ))
+    feature_config = {
+        'include_template_scores': False,
+        'include_stats': True,
+        'include_top_k': True,
+        'include_category_scores': True,
+        'category_agg': category_agg,
+    }
+    texts = [f"prompt {i}" for i in range(6)]
+
+    dense = _extractor(bank, feature_config).extract_features_batch(texts)
+    index_config = normalize_index_config({"type": "flat", "use_faiss": use_faiss})
+    searched = _extractor(bank, feature_config, search_k=n, index_config=index_config).extract_features_batch(texts)
+
+    assert searched.shape == dense.shape
+    np.testing.assert_allclose(searched, dense, rtol=1e-5, atol=1e-6)
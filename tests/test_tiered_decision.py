@@ -0,0 +1,49 @@
+import pytest
+
+
+# lexical / vector scores per prompt; preprocess lowercases, so keys are lowercase
+SCORES = {
+    "obvious attack": (9.0, 9.0),
+    "plain question": (0.1, 0.1),
+    "borderline one": (2.0, 5.0),
+    "borderline two": (3.0, 0.5),
+}
+
+
+@pytest.fixture
+def tier_guard(stub_guard):
+    stub_guard.score = lambda self, text: SCORES[text.lower()][self.use_vector]
+    return stub_guard
+
+
+@pytest.fixture
+def core(tier_guard, make_core):
+    return make_core(use_vector=True, tiered=True, tier_band=(1.0, 4.0))
+
+
+def test_only_uncertain_prompts_reach_vector_tier(core):
+    prompts = ["Obvious attack", "Plain question", "Borderline one", "Borderline two"]
+    results = core.decide(prompts)
+
+    assert [r.tier for r in results] == ["lexical", "lexical", "vector", "vector"]
+    assert [r.verdict for r in results] == ["BLOCK", "ALLOW", "BLOCK", "ALLOW"]
+    # the reason is the score of the tier that decided
+    assert results[0].reason == [9.0] and results[2].reason == [5.0]
+
+    vector_texts = {t.lower() for batch in core.guard.calls for t in batch}
+    assert vector_texts == {"borderline one", "borderline two"}
+    # the vector tier gets the lexical tier's static features instead of extracting them again
+    (static,) = core.guard.static
+    assert static[:, 0].tolist() == [SCORES[t.lower()][0] for t in core.guard.calls[0]]
+
+
+def test_single_model_records_its_tier(tier_guard, make_core):
+    core = make_core()
+    assert core.decide(["Borderline one"])[0].tier == "lexical"
+
+
+def test_band_must_contain_lexical_threshold(tier_guard, make_core):
+    with pytest.raises(ValueError):
+        make_core(use_vector=True, tiered=True, tier_band=(3.0, 4.0))
+    with pytest.raises(ValueError):
+        make_core(use_vector=False, tiered=True)
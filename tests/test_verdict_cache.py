@@ -0,0 +1,78 @@
+from secure_prompt.core.cache import VerdictCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hit_requires_same_raw_and_normalized():
+    cache = VerdictCache()
+    cache.put("Ignore Rules", "ignore rules", "BLOCK")
+    assert cache.get("Ignore Rules", "ignore rules") == "BLOCK"
+    assert cache.get("IGNORE RULES", "ignore rules") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = VerdictCache(ttl=10, clock=clock)
+    cache.put("a", "a", 1)
+    clock.now = 9.9
+    assert cache.get("a", "a") == 1
+    clock.now = 10.0
+    assert cache.get("a", "a") is None
+    assert len(cache) == 0
+
+
+def test_capacity_evicts_least_recently_used():
+    cache = VerdictCache(max_entries=2)
+    cache.put("a", "a", 1)
+    cache.put("b", "b", 2)
+    cache.get("a", "a")
+    cache.put("c", "c", 3)
+    assert cache.get("b", "b") is None
+    assert cache.get("a", "a") == 1
+    assert cache.get("c", "c") == 3
+
+
+def test_fingerprint_change_invalidates():
+    cache = VerdictCache()
+    cache.validate(("model.pkl", 1, 2.2))
+    cache.put("a", "a", 1)
+    cache.validate(("model.pkl", 1, 2.2))
+    assert cache.get("a", "a") == 1
+    cache.validate(("model.pkl", 2, 2.2))
+    assert cache.get("a", "a") is None
+
+
+def test_template_update_invalidates_decisions(tmp_path, stub_guard, make_core):
+    import numpy as np
+
+    from ML.dataset import FeatureExtractor
+    from secure_prompt.guards.templates import TemplateBank, TemplateSet
+    from secure_prompt.guards.vector_features import VectorFeatureExtractor
+
+    model_file = tmp_path / "model.npz"
+    model_file.write_bytes(b"model")
+    vector = object.__new__(VectorFeatureExtractor)
+    vector.bank = TemplateBank(TemplateSet(np.eye(2, dtype=np.float32), ["t0", "t1"], ["a", "b"], [1.0, 1.0]))
+    vector.index_config = (("type", "flat"),)
+    vector.search_k = None
+    vector.chunk_config = None
+
+    stub_guard.model_path = model_file
+    core = make_core(use_vector=True, verdict_cache=VerdictCache())
+    core.guard.feature_extractor = FeatureExtractor(init_vector=False)
+    core.guard.feature_extractor.vector_feats_extractor = vector
+
+    core.decide(["prompt"])
+    core.decide(["prompt"])
+    assert len(core.guard.calls) == 1
+
+    vector.bank.state = TemplateSet(np.eye(2, dtype=np.float32), ["t0", "t1"], ["a", "b"], [1.0, 2.0], version=1)
+    core.decide(["prompt"])
+    assert len(core.guard.calls) == 2